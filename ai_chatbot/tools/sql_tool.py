@@ -64,6 +64,7 @@ Available Spotify Tables in RAW Schema:
    - DAYS_PLAYED (Number): Number of days played
    - DURATION_SECONDS (Number): Duration in seconds
    - ENGAGEMENT_TIER (Varchar): Engagement tier
+   - IN_CATALOG (Boolean): Whether the track is in the current crawl (track/artist columns are NULL otherwise)
    - IS_EXPLICIT (Boolean): Whether track is explicit
    - LANGUAGE_POPULARITY_RANK (Number): Language popularity rank
    - POPULARITY_RANGE (Varchar): Popularity range category
@@ -76,13 +77,60 @@ Available Spotify Tables in RAW Schema:
    - TRACK_POPULARITY (Number): Track popularity score
    - UNIQUE_LISTENERS (Number): Number of unique listeners
 
+4. MART_DAILY_PLAYS (in RAW schema) - one row per PLAY_DATE, USER_ID, TRACK_ID
+   - PLAY_DATE (Date): Date of the plays (clustered; always filter on it for time ranges)
+   - USER_ID (Varchar): User identifier
+   - TRACK_ID (Varchar): Spotify track ID
+   - ARTIST_ID (Varchar): Spotify artist ID
+   - PLAYS (Number): Plays on that date
+   - SKIPS (Number): Skipped plays on that date
+   - LISTEN_SECONDS (Number): Seconds listened on that date
+   - FIRST_PLAY_TS (Timestamp): First play of the day
+   - LAST_PLAY_TS (Timestamp): Last play of the day
+
+5. MART_GENRE_SUMMARY (in RAW schema) - one row per GENRE (lower-case)
+   - GENRE (Varchar): Spotify genre, e.g. 'k-pop', 'indie rock'
+   - NUM_ARTISTS (Number): Artists tagged with the genre
+   - AVG_ARTIST_POPULARITY (Number): Average artist popularity
+   - TOTAL_FOLLOWERS (Number): Summed artist followers
+   - NUM_TRACKS (Number): Tracks by the genre's artists
+   - AVG_TRACK_POPULARITY (Number): Average track popularity
+   - TOTAL_PLAYS (Number): Plays of the genre's tracks
+   - TOTAL_SKIPS (Number): Skipped plays
+   - UNIQUE_LISTENERS (Number): Distinct listeners (approximate)
+   - SKIP_RATE_PERCENT (Float): Skip rate percentage
+   - PLAY_RANK (Number): Rank by total plays
+
+6. INT_ARTIST_GENRES (in RAW schema) - one row per ARTIST_ID, GENRE; join to MART_ARTIST_SUMMARY on ARTIST_ID
+
+7. MART_POPULARITY_HISTORY (in RAW schema) - one row per change of an artist's/track's popularity
+   - ENTITY_TYPE (Varchar): 'artist' or 'track'
+   - ENTITY_ID (Varchar): Spotify artist or track ID
+   - ENTITY_NAME (Varchar): Artist or track name
+   - POPULARITY (Number): Popularity score from VALID_FROM until VALID_TO
+   - FOLLOWERS (Number): Artist followers (null for tracks)
+   - POPULARITY_CHANGE (Number): Change vs the previous version
+   - FOLLOWERS_CHANGE (Number): Change vs the previous version
+   - VALID_FROM (Timestamp), VALID_TO (Timestamp, 9999-12-31 while current), IS_CURRENT (Boolean)
+   - Value as of a date: WHERE VALID_FROM <= '<date>' AND VALID_TO > '<date>'
+
+8. MART_PLAY_WINDOWS (in RAW schema) - one row per closed streaming window, DIMENSION and DIM_KEY
+   - WINDOW_NAME (Varchar): '1m' and '1h' (tumbling), '15m_by_1m' (last 15 minutes, every minute)
+   - WINDOW_START (Timestamp), WINDOW_END (Timestamp): Window bounds (clustered with WINDOW_NAME)
+   - DIMENSION (Varchar): 'track', 'artist' or 'user'
+   - DIM_KEY (Varchar): Track, artist or user ID
+   - DIM_NAME (Varchar): Track name, artist name or user ID
+   - TRACK_ARTIST_NAME (Varchar): Primary artist of a track window
+   - PLAYS (Number), SKIPS (Number), SKIP_RATE_PERCENT (Float), LISTEN_SECONDS (Number), LISTENERS (Number)
+   - Latest window: WHERE WINDOW_NAME = '1h' AND WINDOW_START = (SELECT MAX(WINDOW_START) FROM ... WHERE WINDOW_NAME = '1h')
+
 Fallback tables (basic data):
 - RAW_TOP_ARTISTS: Basic artist info
 - RAW_TOP_TRACKS: Basic track info  
 - RAW_LISTENING_HISTORY: Basic listening data
 
 Important Notes:
-- Use table names without RAW prefix: MART_ARTIST_SUMMARY, MART_TOP_TRACKS, MART_USER_DAILY_PLAYS
+- Use table names without RAW prefix: MART_ARTIST_SUMMARY, MART_TOP_TRACKS, MART_USER_DAILY_PLAYS, MART_DAILY_PLAYS, MART_GENRE_SUMMARY, INT_ARTIST_GENRES, MART_POPULARITY_HISTORY, MART_PLAY_WINDOWS
 - MART tables contain clean, aggregated data perfect for analysis
 - Use ARTIST_NAME and TRACK_NAME for searches (case-insensitive with ILIKE)
 - Join tables using ARTIST_ID and TRACK_ID
@@ -103,12 +151,16 @@ Convert this question into a valid Snowflake SQL query:
 
 Rules:
 1. Return a valid SQL query that best answers the user's question
-2. Use full table names: DBT_SPOTIFY.RAW.MART_ARTIST_SUMMARY, DBT_SPOTIFY.RAW.MART_TOP_TRACKS, DBT_SPOTIFY.RAW.MART_USER_DAILY_PLAYS
+2. Use full table names: DBT_SPOTIFY.RAW.MART_ARTIST_SUMMARY, DBT_SPOTIFY.RAW.MART_TOP_TRACKS, DBT_SPOTIFY.RAW.MART_USER_DAILY_PLAYS, DBT_SPOTIFY.RAW.MART_DAILY_PLAYS, DBT_SPOTIFY.RAW.MART_GENRE_SUMMARY, DBT_SPOTIFY.RAW.MART_POPULARITY_HISTORY, DBT_SPOTIFY.RAW.MART_PLAY_WINDOWS
 3. Use ILIKE for case-insensitive text searches on names
 4. Interpret user questions flexibly - they won't use exact column names
 5. For artist questions, use DBT_SPOTIFY.RAW.MART_ARTIST_SUMMARY for comprehensive info
 6. For track questions, use DBT_SPOTIFY.RAW.MART_TOP_TRACKS or DBT_SPOTIFY.RAW.MART_USER_DAILY_PLAYS
 7. For engagement/listening questions, use DBT_SPOTIFY.RAW.MART_USER_DAILY_PLAYS
+   For time-windowed questions ("last 7 days", "yesterday"), use DBT_SPOTIFY.RAW.MART_DAILY_PLAYS with a PLAY_DATE filter
+   For genre questions, use DBT_SPOTIFY.RAW.MART_GENRE_SUMMARY (or DBT_SPOTIFY.RAW.INT_ARTIST_GENRES for artists in a genre); never parse genre JSON
+   For popularity trends or past popularity, use DBT_SPOTIFY.RAW.MART_POPULARITY_HISTORY
+   For "right now", "trending" or "last hour" questions, use DBT_SPOTIFY.RAW.MART_PLAY_WINDOWS filtered on WINDOW_NAME
 8. Join tables when needed to provide complete answers
 9. Limit results to 10 unless user asks for more
 10. Use meaningful column aliases that make sense to users
@@ -120,6 +172,10 @@ Example question interpretations:
 - "which artists have most followers" → SELECT ARTIST_NAME, ARTIST_FOLLOWERS FROM DBT_SPOTIFY.RAW.MART_ARTIST_SUMMARY ORDER BY ARTIST_FOLLOWERS DESC LIMIT 10
 - "what languages do I listen to" → SELECT TRACK_LANGUAGE, COUNT(*) as track_count FROM DBT_SPOTIFY.RAW.MART_USER_DAILY_PLAYS GROUP BY TRACK_LANGUAGE ORDER BY track_count DESC
 - "songs I skip a lot" → SELECT TRACK_NAME, SKIP_RATE_PERCENT FROM DBT_SPOTIFY.RAW.MART_USER_DAILY_PLAYS WHERE SKIP_RATE_PERCENT > 30 ORDER BY SKIP_RATE_PERCENT DESC
+- "what did I play most last week" → SELECT t.TRACK_NAME, SUM(d.PLAYS) AS plays FROM DBT_SPOTIFY.RAW.MART_DAILY_PLAYS d JOIN DBT_SPOTIFY.RAW.MART_USER_DAILY_PLAYS t ON d.TRACK_ID = t.TRACK_ID WHERE d.PLAY_DATE >= DATEADD(day, -7, CURRENT_DATE) GROUP BY t.TRACK_NAME ORDER BY plays DESC LIMIT 10
+- "which genres do I play most" → SELECT GENRE, TOTAL_PLAYS, UNIQUE_LISTENERS FROM DBT_SPOTIFY.RAW.MART_GENRE_SUMMARY ORDER BY TOTAL_PLAYS DESC LIMIT 10
+- "how has Dua Lipa's popularity changed" → SELECT VALID_FROM, POPULARITY, FOLLOWERS, POPULARITY_CHANGE FROM DBT_SPOTIFY.RAW.MART_POPULARITY_HISTORY WHERE ENTITY_TYPE = 'artist' AND ENTITY_NAME ILIKE '%dua lipa%' ORDER BY VALID_FROM
+- "what's trending right now" → SELECT DIM_NAME AS track, TRACK_ARTIST_NAME AS artist, PLAYS, LISTENERS FROM DBT_SPOTIFY.RAW.MART_PLAY_WINDOWS WHERE WINDOW_NAME = '1h' AND DIMENSION = 'track' AND WINDOW_START = (SELECT MAX(WINDOW_START) FROM DBT_SPOTIFY.RAW.MART_PLAY_WINDOWS WHERE WINDOW_NAME = '1h') ORDER BY PLAYS DESC LIMIT 10
 """
     
     try:
@@ -1,28 +1,36 @@
 # ai_chatbot/utils/snowflake_utils.py
 """
 Snowflake connection utilities
+
+Connections go through ingestion.warehouse, so setting
+WAREHOUSE_BACKEND=duckdb points the chatbot at the local
+embedded warehouse instead of Snowflake.
 """
 
-import snowflake.connector as sf
 from dotenv import load_dotenv
 import os
 import logging
 from typing import Optional, Dict, List, Any
 
+from ingestion.warehouse import get_warehouse
+
 logger = logging.getLogger(__name__)
 load_dotenv()
 
+# Tags chatbot sessions so dbt/analyses/chatbot_query_pruning.sql can find their queries
+QUERY_TAG = os.getenv("CHATBOT_QUERY_TAG", "spotify-chatbot")
+
 # Connection pool for reuse
 _connection_pool = []
 
 def get_snowflake_connection():
-    """Get a Snowflake connection from pool or create new one"""
+    """Get a warehouse connection from pool or create new one"""
     # Try to reuse connection from pool
     if _connection_pool:
         conn = _connection_pool.pop()
         try:
             # Test if connection is still valid
-            conn.cursor().execute("SELECT 1")
+            conn.query("SELECT 1")
             return conn
         except:
             # Connection is dead, create new one
@@ -30,15 +38,11 @@ def get_snowflake_connection():
     
     # Create new connection
     try:
-        conn = sf.connect(
-            user=os.getenv("SNOWFLAKE_USER"),
-            password=os.getenv("SNOWFLAKE_PASSWORD"),
-            account=os.getenv("SNOWFLAKE_ACCOUNT"),
-            warehouse=os.getenv("SNOWFLAKE_WAREHOUSE"),
-            database=os.getenv("SNOWFLAKE_DATABASE"),
-            schema=os.getenv("SNOWFLAKE_SCHEMA", "RAW")
-        )
-        logger.info("Created new Snowflake connection")
+        conn = get_warehouse()
+        conn.connect()
+        if conn.name == "snowflake" and QUERY_TAG:
+            conn.execute(f"ALTER SESSION SET QUERY_TAG = '{QUERY_TAG}'")
+        logger.info(f"Created new {conn.name} connection")
         return conn
     except Exception as e:
         logger.error(f"Failed to connect to Snowflake: {e}")
@@ -55,12 +59,9 @@ def test_connection() -> bool:
     """Test if Snowflake connection works"""
     try:
         conn = get_snowflake_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT CURRENT_TIMESTAMP()")
-        result = cursor.fetchone()
-        cursor.close()
+        result = conn.query("SELECT CURRENT_TIMESTAMP AS NOW")
         return_connection(conn)
-        logger.info(f"Snowflake connection test successful: {result[0]}")
+        logger.info(f"Snowflake connection test successful: {result[0]['NOW']}")
         return True
     except Exception as e:
         logger.error(f"Snowflake connection test failed: {e}")
@@ -70,22 +71,10 @@ def execute_query(sql: str) -> List[Dict[str, Any]]:
     """Execute a SQL query and return results as list of dictionaries"""
     try:
         conn = get_snowflake_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute(sql)
-        
-        # Get column names
-        columns = [desc[0] for desc in cursor.description]
-        
-        # Fetch all results
-        rows = cursor.fetchall()
         
-        # Convert to list of dictionaries
-        results = []
-        for row in rows:
-            results.append(dict(zip(columns, row)))
+        # Rows come back as a list of dictionaries keyed by column name
+        results = conn.query(sql)
         
-        cursor.close()
         return_connection(conn)
         
         return results
@@ -98,17 +87,13 @@ def get_table_info(table_name: str) -> Optional[Dict]:
     """Get information about a table"""
     try:
         conn = get_snowflake_connection()
-        cursor = conn.cursor()
         
         # Get columns
-        cursor.execute(f"DESCRIBE TABLE {table_name}")
-        columns = cursor.fetchall()
+        columns = conn.describe_table(table_name)
         
         # Get row count
-        cursor.execute(f"SELECT COUNT(*) FROM {table_name}")
-        row_count = cursor.fetchone()[0]
+        row_count = conn.query(f"SELECT COUNT(*) AS ROW_COUNT FROM {table_name}")[0]['ROW_COUNT']
         
-        cursor.close()
         return_connection(conn)
         
         return {
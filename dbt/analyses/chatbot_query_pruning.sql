@@ -0,0 +1,36 @@
+-- Micro-partition pruning for the chatbot's generated queries, per mart.
+-- The chatbot tags its Snowflake session with var('chatbot_query_tag')
+-- (ai_chatbot/utils/snowflake_utils.py). A pruning_ratio near 1 means the
+-- cluster keys / search optimization are doing their job; full_scans counts
+-- queries that read every partition of the table.
+-- Compile with `dbt compile -s chatbot_query_pruning` and run the SQL under
+-- target/compiled/. ACCOUNT_USAGE lags up to ~45 minutes.
+
+with chatbot_queries as (
+    select
+        query_id,
+        coalesce(regexp_substr(upper(query_text), 'MART_[A-Z_]+'), 'OTHER') as mart,
+        total_elapsed_time,
+        bytes_scanned,
+        partitions_scanned,
+        partitions_total
+    from snowflake.account_usage.query_history
+    where query_tag = '{{ var("chatbot_query_tag") }}'
+      and query_type = 'SELECT'
+      and execution_status = 'SUCCESS'
+      and start_time >= dateadd(day, -{{ var("chatbot_pruning_lookback_days") }}, current_timestamp())
+)
+
+select
+    mart,
+    count(*) as queries,
+    median(total_elapsed_time) as p50_elapsed_ms,
+    approx_percentile(total_elapsed_time, 0.95) as p95_elapsed_ms,
+    sum(bytes_scanned) as bytes_scanned,
+    sum(partitions_scanned) as partitions_scanned,
+    sum(partitions_total) as partitions_total,
+    round(1 - sum(partitions_scanned) / nullif(sum(partitions_total), 0), 3) as pruning_ratio,
+    count_if(partitions_total > 1 and partitions_scanned = partitions_total) as full_scans
+from chatbot_queries
+group by mart
+order by queries desc
@@ -0,0 +1,67 @@
+-- macros/cross_database.sql
+-- Adapter-portable building blocks so the project builds on Snowflake and on
+-- the local DuckDB profile (dbt/profiles/duckdb). Casts use dbt's own type
+-- macros (dbt.type_string(), dbt.type_int(), ...); the constructs below have
+-- no common spelling. As in running_aggregates.sql, default__ is the
+-- Snowflake form and duckdb__ overrides it where DuckDB differs.
+
+{# Date part of a timestamp #}
+{% macro to_date(expression) %}
+    {{ return(adapter.dispatch('to_date', 'spotify')(expression)) }}
+{% endmacro %}
+
+{% macro default__to_date(expression) -%}
+    to_date({{ expression }})
+{%- endmacro %}
+
+{% macro duckdb__to_date(expression) -%}
+    cast({{ expression }} as date)
+{%- endmacro %}
+
+{# Sample standard deviation #}
+{% macro stddev(expression) %}
+    {{ return(adapter.dispatch('stddev', 'spotify')(expression)) }}
+{% endmacro %}
+
+{% macro default__stddev(expression) -%}
+    stddev({{ expression }})
+{%- endmacro %}
+
+{% macro duckdb__stddev(expression) -%}
+    stddev_samp({{ expression }})
+{%- endmacro %}
+
+{# Keep one row per partition: the first by order_by (QUALIFY works on both adapters) #}
+{% macro latest_by(relation, partition_by, order_by) %}
+    {{ return(adapter.dispatch('latest_by', 'spotify')(relation, partition_by, order_by)) }}
+{% endmacro %}
+
+{% macro default__latest_by(relation, partition_by, order_by) %}
+    select *
+    from {{ relation }}
+    qualify row_number() over (
+        partition by {{ partition_by }}
+        order by {{ order_by }}
+    ) = 1
+{% endmacro %}
+
+{# One row per element of a JSON array column: (key_column, value_name) #}
+{% macro unnest_json_array(relation, key_column, array_column, value_name) %}
+    {{ return(adapter.dispatch('unnest_json_array', 'spotify')(relation, key_column, array_column, value_name)) }}
+{% endmacro %}
+
+{% macro default__unnest_json_array(relation, key_column, array_column, value_name) %}
+    select
+        r.{{ key_column }},
+        f.value::string as {{ value_name }}
+    from {{ relation }} r,
+        lateral flatten(input => try_parse_json(r.{{ array_column }})) f
+{% endmacro %}
+
+{% macro duckdb__unnest_json_array(relation, key_column, array_column, value_name) %}
+    select
+        {{ key_column }},
+        unnest(from_json({{ array_column }}, '["VARCHAR"]')) as {{ value_name }}
+    from {{ relation }}
+    where json_valid({{ array_column }})
+{% endmacro %}
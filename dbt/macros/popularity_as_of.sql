@@ -0,0 +1,17 @@
+-- macros/popularity_as_of.sql
+-- Popularity of every artist or track as of a timestamp expression, from
+-- mart_popularity_history (one version per entity matches the range).
+-- Usage: {{ popularity_as_of("cast('2025-06-01' as timestamp)", 'artist') }}
+
+{% macro popularity_as_of(as_of, entity_type='artist') %}
+    select
+        entity_id,
+        entity_name,
+        popularity,
+        followers,
+        valid_from
+    from {{ ref('mart_popularity_history') }}
+    where entity_type = '{{ entity_type }}'
+      and valid_from <= {{ as_of }}
+      and valid_to > {{ as_of }}
+{% endmacro %}
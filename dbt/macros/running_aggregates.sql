@@ -0,0 +1,81 @@
+-- macros/running_aggregates.sql
+-- Mergeable aggregate states for incremental marts that fold new events
+-- into stored running totals instead of re-aggregating the full history.
+--   sketch_*: approximate distinct counts (HyperLogLog state)
+--   set_*:    exact distinct sets for low-cardinality values (e.g. dates)
+-- default__ is Snowflake. DuckDB has no exportable HLL state, so its
+-- sketches are exact distinct lists (fine for local builds and benchmarks).
+
+{% macro sketch_accumulate(column) %}
+    {{ return(adapter.dispatch('sketch_accumulate', 'spotify')(column)) }}
+{% endmacro %}
+
+{% macro default__sketch_accumulate(column) %}
+    hll_export(hll_accumulate({{ column }}))
+{% endmacro %}
+
+{% macro duckdb__sketch_accumulate(column) %}
+    list(distinct {{ column }})
+{% endmacro %}
+
+{# Aggregate: merge sketch states from several rows #}
+{% macro sketch_combine(column) %}
+    {{ return(adapter.dispatch('sketch_combine', 'spotify')(column)) }}
+{% endmacro %}
+
+{% macro default__sketch_combine(column) %}
+    hll_export(hll_combine(hll_import({{ column }})))
+{% endmacro %}
+
+{% macro duckdb__sketch_combine(column) %}
+    list_distinct(flatten(list({{ column }})))
+{% endmacro %}
+
+{% macro sketch_estimate(column) %}
+    {{ return(adapter.dispatch('sketch_estimate', 'spotify')(column)) }}
+{% endmacro %}
+
+{% macro default__sketch_estimate(column) %}
+    hll_estimate(hll_import({{ column }}))
+{% endmacro %}
+
+{% macro duckdb__sketch_estimate(column) %}
+    len({{ column }})
+{% endmacro %}
+
+{% macro set_agg(expression) %}
+    {{ return(adapter.dispatch('set_agg', 'spotify')(expression)) }}
+{% endmacro %}
+
+{% macro default__set_agg(expression) %}
+    array_agg(distinct {{ expression }})
+{% endmacro %}
+
+{% macro duckdb__set_agg(expression) %}
+    list(distinct {{ expression }})
+{% endmacro %}
+
+{# Aggregate: union of set states from several rows #}
+{% macro set_union_agg(column) %}
+    {{ return(adapter.dispatch('set_union_agg', 'spotify')(column)) }}
+{% endmacro %}
+
+{% macro default__set_union_agg(column) %}
+    array_union_agg({{ column }})
+{% endmacro %}
+
+{% macro duckdb__set_union_agg(column) %}
+    list_distinct(flatten(list({{ column }})))
+{% endmacro %}
+
+{% macro set_size(column) %}
+    {{ return(adapter.dispatch('set_size', 'spotify')(column)) }}
+{% endmacro %}
+
+{% macro default__set_size(column) %}
+    coalesce(array_size({{ column }}), 0)
+{% endmacro %}
+
+{% macro duckdb__set_size(column) %}
+    coalesce(len({{ column }}), 0)
+{% endmacro %}
@@ -0,0 +1,12 @@
+-- macros/search_optimization.sql
+-- Post-hook that adds Snowflake search optimization to a model, driven by the
+-- model's `search_optimization` config (a list of search methods, e.g.
+-- "substring(artist_name)"), which is set per model in dbt_project.yml.
+-- Renders nothing for other adapters, views/ephemerals or unconfigured models.
+
+{% macro apply_search_optimization() %}
+    {%- set methods = config.get('search_optimization') -%}
+    {%- if methods and target.type == 'snowflake' and config.get('materialized') in ('table', 'incremental') -%}
+        alter table {{ this }} add search optimization on {{ methods | join(', ') }}
+    {%- endif -%}
+{% endmacro %}
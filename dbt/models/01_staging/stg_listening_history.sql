@@ -1,5 +1,16 @@
 {{ config(materialized='view') }}
 
+{#- Columns stamped in-stream by kafka/enrichment.py; they only exist once the consumer has run -#}
+{%- set enriched_columns = [
+    ('TRACK_NAME', dbt.type_string()),
+    ('TRACK_POPULARITY', dbt.type_int()),
+    ('DURATION_SECONDS', dbt.type_float()),
+    ('ARTIST_NAME', dbt.type_string()),
+    ('ARTIST_POPULARITY', dbt.type_int()),
+    ('ARTIST_GENRES', dbt.type_string()),
+] -%}
+{%- set source_columns = adapter.get_columns_in_relation(source('raw', 'RAW_LISTENING_HISTORY')) | map(attribute='name') | map('upper') | list -%}
+
 with source as (
     select *
     from {{ source('raw', 'RAW_LISTENING_HISTORY') }}
@@ -8,16 +19,22 @@ with source as (
 
 cleaned as (
     select
-        PLAY_ID::string as play_id,
-        USER_ID::string as user_id,
-        TRACK_ID::string as track_id,
-        ARTIST_ID::string as artist_id,
-        PLAY_TS::timestamp_ntz as play_ts,
-        TRACK_LANGUAGE::string as track_language,
-        DEVICE::string as device,
-        PLAY_DURATION_SECONDS::number as play_duration_seconds,
-        SKIPPED::boolean as skipped
+        cast(PLAY_ID as {{ dbt.type_string() }}) as play_id,
+        cast(USER_ID as {{ dbt.type_string() }}) as user_id,
+        cast(TRACK_ID as {{ dbt.type_string() }}) as track_id,
+        cast(ARTIST_ID as {{ dbt.type_string() }}) as artist_id,
+        cast(PLAY_TS as {{ dbt.type_timestamp() }}) as play_ts,
+        cast(TRACK_LANGUAGE as {{ dbt.type_string() }}) as track_language,
+        cast(DEVICE as {{ dbt.type_string() }}) as device,
+        cast(PLAY_DURATION_SECONDS as {{ dbt.type_int() }}) as play_duration_seconds,
+        cast(SKIPPED as {{ dbt.type_boolean() }}) as skipped,
+        cast(INGESTED_AT as {{ dbt.type_timestamp() }}) as ingested_at,
+
+        -- Enriched in-stream (null for rows loaded in batch)
+        {%- for column, data_type in enriched_columns %}
+        cast({% if column in source_columns %}{{ column }}{% else %}null{% endif %} as {{ data_type }}) as {{ column | lower }}{{ "," if not loop.last }}
+        {%- endfor %}
     from source
 )
 
-select * from cleaned
\ No newline at end of file
+select * from cleaned
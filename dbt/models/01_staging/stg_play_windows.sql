@@ -0,0 +1,25 @@
+{{ config(materialized='view') }}
+
+with source as (
+    select *
+    from {{ source('raw', 'RAW_PLAY_WINDOWS') }}
+),
+
+cleaned as (
+    select
+        cast(AGG_ID as {{ dbt.type_string() }}) as agg_id,
+        cast(WINDOW_NAME as {{ dbt.type_string() }}) as window_name,
+        cast(WINDOW_START as {{ dbt.type_timestamp() }}) as window_start,
+        cast(WINDOW_END as {{ dbt.type_timestamp() }}) as window_end,
+        cast(DIMENSION as {{ dbt.type_string() }}) as dimension,
+        cast(DIM_KEY as {{ dbt.type_string() }}) as dim_key,
+        cast(PLAYS as {{ dbt.type_int() }}) as plays,
+        cast(SKIPS as {{ dbt.type_int() }}) as skips,
+        cast(LISTEN_SECONDS as {{ dbt.type_bigint() }}) as listen_seconds,
+        cast(AVG_LISTEN_SECONDS as {{ dbt.type_float() }}) as avg_listen_seconds,
+        cast(LISTENERS as {{ dbt.type_int() }}) as listeners,
+        cast(INGESTED_AT as {{ dbt.type_timestamp() }}) as ingested_at
+    from source
+)
+
+select * from cleaned
@@ -7,10 +7,10 @@ with source as (
 
 cleaned as (
     select
-        ID::string as artist_id,
-        NAME::string as artist_name,
-        POPULARITY::number as artist_popularity,
-        FOLLOWERS::number as artist_followers,
+        cast(ID as {{ dbt.type_string() }}) as artist_id,
+        cast(NAME as {{ dbt.type_string() }}) as artist_name,
+        cast(POPULARITY as {{ dbt.type_int() }}) as artist_popularity,
+        cast(FOLLOWERS as {{ dbt.type_bigint() }}) as artist_followers,
         GENRES as artist_genres
     from source
 )
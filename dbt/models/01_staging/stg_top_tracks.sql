@@ -7,13 +7,13 @@ with source as (
 
 cleaned as (
     select
-        ID::string as track_id,
-        NAME::string as track_name,
-        POPULARITY::number as track_popularity,
-        ARTIST_ID::string as artist_id,
-        DURATION_MS::number / 1000.0 as duration_seconds,
-        EXPLICIT::boolean as is_explicit,
-        TRACK_LANGUAGE::string as track_language
+        cast(ID as {{ dbt.type_string() }}) as track_id,
+        cast(NAME as {{ dbt.type_string() }}) as track_name,
+        cast(POPULARITY as {{ dbt.type_int() }}) as track_popularity,
+        cast(ARTIST_ID as {{ dbt.type_string() }}) as artist_id,
+        cast(DURATION_MS as {{ dbt.type_int() }}) / 1000.0 as duration_seconds,
+        cast(EXPLICIT as {{ dbt.type_boolean() }}) as is_explicit,
+        cast(TRACK_LANGUAGE as {{ dbt.type_string() }}) as track_language
     from source
 )
 
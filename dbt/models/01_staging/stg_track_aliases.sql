@@ -0,0 +1,16 @@
+{{ config(materialized='view') }}
+
+with source as (
+    select *
+    from {{ source('raw', 'RAW_TRACK_ALIASES') }}
+),
+
+cleaned as (
+    select
+        cast(ALIAS_ID as {{ dbt.type_string() }}) as alias_track_id,
+        cast(CANONICAL_ID as {{ dbt.type_string() }}) as track_id,
+        cast(DEDUP_KEY as {{ dbt.type_string() }}) as dedup_key
+    from source
+)
+
+select * from cleaned
\ No newline at end of file
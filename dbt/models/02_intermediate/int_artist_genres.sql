@@ -0,0 +1,21 @@
+{{ config(materialized='table') }}
+
+-- Artist → genre bridge. RAW_TOP_ARTISTS.GENRES is a JSON array string; it is
+-- parsed and flattened once here (materialized as a table) so genre questions
+-- are plain lookups instead of query-time JSON parsing.
+
+with artists as (
+    select artist_id, artist_genres
+    from {{ ref('stg_top_artists') }}
+    where artist_genres is not null
+),
+
+flattened as (
+    {{ unnest_json_array('artists', 'artist_id', 'artist_genres', 'genre') }}
+)
+
+select distinct
+    artist_id,
+    lower(trim(genre)) as genre
+from flattened
+where trim(genre) <> ''
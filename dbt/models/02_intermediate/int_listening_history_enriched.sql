@@ -1,13 +1,47 @@
-{{ config(materialized='ephemeral') }}
+{{ config(
+    materialized='incremental',
+    unique_key='play_id',
+    incremental_strategy='merge',
+    on_schema_change='append_new_columns'
+) }}
+
+-- Incremental: each run only reads plays ingested after the current watermark
+-- (max ingested_at in this table) minus a lookback window for late arrivals.
+-- Duplicates are resolved inside that slice; the merge on play_id replaces
+-- any version of the play that is already in the table.
+--
+-- Every row carries two stamps of the dbt run that wrote it, which the marts
+-- use as their watermarks instead of the second-resolution INGESTED_AT:
+--   first_loaded_at  run that first inserted the play_id (kept on replays,
+--                    so delta-folding marts never count a play twice)
+--   loaded_at        run that last inserted or changed the row
+-- Full-refresh this model together with its children (`-s int_listening_history_enriched+`).
+
+{% set run_loaded_at -%}
+    cast('{{ run_started_at.strftime("%Y-%m-%d %H:%M:%S.%f") }}' as {{ dbt.type_timestamp() }})
+{%- endset %}
 
 with listening_history as (
     select * from {{ ref('stg_listening_history') }}
+    {% if is_incremental() %}
+    where ingested_at > (
+        select coalesce(
+            {{ dbt.dateadd('hour', -1 * var('listening_history_lookback_hours'), 'max(ingested_at)') }},
+            cast('1900-01-01' as {{ dbt.type_timestamp() }})
+        )
+        from {{ this }}
+    )
+    {% endif %}
 ),
 
 tracks_with_artists as (
     select * from {{ ref('int_tracks_with_artists') }}
 ),
 
+track_aliases as (
+    select * from {{ ref('stg_track_aliases') }}
+),
+
 enriched as (
     select
         -- Play event details
@@ -17,34 +51,48 @@ enriched as (
         l.device,
         l.play_duration_seconds,
         l.skipped,
+        l.ingested_at,
         
-        -- Track details
-        l.track_id,
-        t.track_name,
-        t.track_popularity,
+        -- Track details (duplicate IDs resolved to the canonical track).
+        -- Streamed plays arrive enriched; the join only fills batch-loaded rows.
+        coalesce(ta.track_id, l.track_id) as track_id,
+        coalesce(l.track_name, t.track_name) as track_name,
+        coalesce(l.track_popularity, t.track_popularity) as track_popularity,
         t.track_language,
-        t.duration_seconds,
+        coalesce(l.duration_seconds, t.duration_seconds) as duration_seconds,
         t.is_explicit,
         
         -- Artist details
         l.artist_id,
-        t.artist_name,
-        t.artist_popularity,
+        coalesce(l.artist_name, t.artist_name) as artist_name,
+        coalesce(l.artist_popularity, t.artist_popularity) as artist_popularity,
         t.artist_followers,
-        t.artist_genres
+        coalesce(l.artist_genres, t.artist_genres) as artist_genres
         
     from listening_history l
-    left join tracks_with_artists t on l.track_id = t.track_id
+    left join track_aliases ta on l.track_id = ta.alias_track_id
+    left join tracks_with_artists t on coalesce(ta.track_id, l.track_id) = t.track_id
 ),
 
--- Add deduplication for any duplicate play events
+-- Deduplicate play events within the new slice (latest ingested copy wins)
 deduped as (
-    select *
-    from enriched
-    qualify row_number() over (
-        partition by play_id 
-        order by play_ts desc
-    ) = 1
+    {{ latest_by('enriched', 'play_id', 'ingested_at desc, play_ts desc') }}
 )
 
-select * from deduped
\ No newline at end of file
+select
+    d.*,
+    {% if is_incremental() %}
+    -- Rows re-read by the lookback keep their stamps unless a newer copy landed
+    case
+        when existing.ingested_at = d.ingested_at then existing.loaded_at
+        else {{ run_loaded_at }}
+    end as loaded_at,
+    coalesce(existing.first_loaded_at, {{ run_loaded_at }}) as first_loaded_at
+    {% else %}
+    {{ run_loaded_at }} as loaded_at,
+    {{ run_loaded_at }} as first_loaded_at
+    {% endif %}
+from deduped d
+{% if is_incremental() %}
+left join {{ this }} existing on d.play_id = existing.play_id
+{% endif %}
\ No newline at end of file
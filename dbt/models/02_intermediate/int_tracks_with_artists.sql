@@ -25,14 +25,10 @@ tracks_with_artists as (
     left join artists a on t.artist_id = a.artist_id
 ),
 
--- Add deduplication in case of any duplicates from staging
+-- Ingestion dedup (ingestion/dedup.py) is an optimization, not a guarantee: the
+-- Kafka tracks topic bypasses it and a duplicated artist ID fans out the join
 deduped as (
-    select *
-    from tracks_with_artists
-    qualify row_number() over (
-        partition by track_id 
-        order by track_popularity desc
-    ) = 1
+    {{ latest_by('tracks_with_artists', 'track_id', 'track_popularity desc, artist_followers desc') }}
 )
 
 select * from deduped
\ No newline at end of file
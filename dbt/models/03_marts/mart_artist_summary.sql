@@ -21,7 +21,7 @@ with source as (
         
         -- Calculated metrics
         max(track_popularity) - min(track_popularity) as popularity_range,
-        stddev(track_popularity) as track_popularity_stddev,
+        {{ stddev('track_popularity') }} as track_popularity_stddev,
         
     from source
     group by 
@@ -0,0 +1,51 @@
+{{ config(
+    materialized='incremental',
+    unique_key='play_date',
+    incremental_strategy='delete+insert',
+    on_schema_change='fail'
+) }}
+
+-- Daily rollup at (play_date, user_id, track_id) grain for time-windowed
+-- questions ("last 7 days", "yesterday"). Clustered on play_date (see
+-- dbt_project.yml) so date-range filters prune down to a few micro-partitions.
+-- Incremental by day: every play_date touched by plays loaded into
+-- int_listening_history_enriched since the last run (its dbt-run loaded_at
+-- stamp, not the second-resolution INGESTED_AT) is rebuilt in full
+-- (delete+insert on play_date), so late arrivals and replays are rolled into
+-- the day they were played.
+
+with plays as (
+    select *
+    from {{ ref('int_listening_history_enriched') }}
+    {% if is_incremental() %}
+    where {{ to_date('play_ts') }} in (
+        select distinct {{ to_date('play_ts') }}
+        from {{ ref('int_listening_history_enriched') }}
+        where loaded_at > (
+            select coalesce(max(last_loaded_at), cast('1900-01-01' as {{ dbt.type_timestamp() }}))
+            from {{ this }}
+        )
+    )
+    {% endif %}
+),
+
+daily as (
+    select
+        {{ to_date('play_ts') }} as play_date,
+        user_id,
+        track_id,
+        max(artist_id) as artist_id,
+        count(*) as plays,
+        sum(case when skipped = true then 1 else 0 end) as skips,
+        sum(play_duration_seconds) as listen_seconds,
+        min(play_ts) as first_play_ts,
+        max(play_ts) as last_play_ts,
+        max(loaded_at) as last_loaded_at
+    from plays
+    group by 1, 2, 3
+)
+
+select
+    {{ dbt_utils.surrogate_key(['play_date', 'user_id', 'track_id']) }} as pk,
+    *
+from daily
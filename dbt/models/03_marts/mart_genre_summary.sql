@@ -0,0 +1,71 @@
+{{ config(materialized='table') }}
+
+-- Genre-level popularity and listening aggregates built on the artist/genre
+-- bridge. An artist (and its tracks) counts towards each of its genres.
+-- Distinct listeners come from merging the per-track listener sketches of
+-- mart_user_daily_plays, so the listening history is not re-read.
+
+with artist_genres as (
+    select * from {{ ref('int_artist_genres') }}
+),
+
+artists as (
+    select * from {{ ref('stg_top_artists') }}
+),
+
+track_metrics as (
+    select
+        track_id,
+        artist_id,
+        track_popularity,
+        total_plays,
+        total_skips,
+        listeners_sketch
+    from {{ ref('mart_user_daily_plays') }}
+),
+
+genre_artists as (
+    select
+        g.genre,
+        count(*) as num_artists,
+        avg(a.artist_popularity) as avg_artist_popularity,
+        sum(a.artist_followers) as total_followers
+    from artist_genres g
+    join artists a on g.artist_id = a.artist_id
+    group by g.genre
+),
+
+genre_tracks as (
+    select
+        g.genre,
+        count(*) as num_tracks,
+        avg(t.track_popularity) as avg_track_popularity,
+        sum(t.total_plays) as total_plays,
+        sum(t.total_skips) as total_skips,
+        {{ sketch_estimate(sketch_combine('t.listeners_sketch')) }} as unique_listeners
+    from artist_genres g
+    join track_metrics t on g.artist_id = t.artist_id
+    group by g.genre
+),
+
+final as (
+    select
+        a.genre,
+        a.num_artists,
+        round(a.avg_artist_popularity, 2) as avg_artist_popularity,
+        a.total_followers,
+        coalesce(t.num_tracks, 0) as num_tracks,
+        round(t.avg_track_popularity, 2) as avg_track_popularity,
+        coalesce(t.total_plays, 0) as total_plays,
+        coalesce(t.total_skips, 0) as total_skips,
+        coalesce(t.unique_listeners, 0) as unique_listeners,
+        case
+            when t.total_plays > 0 then round(cast(t.total_skips as {{ dbt.type_float() }}) / t.total_plays * 100, 2)
+            else 0
+        end as skip_rate_percent,
+        rank() over (order by coalesce(t.total_plays, 0) desc) as play_rank
+    from genre_artists a
+    left join genre_tracks t on a.genre = t.genre
+)
+
+select * from final
@@ -0,0 +1,75 @@
+{{ config(
+    materialized='incremental',
+    unique_key='agg_id',
+    incremental_strategy='merge',
+    on_schema_change='fail'
+) }}
+
+-- Closed tumbling/sliding play windows from the streaming aggregator
+-- (kafka/aggregator.py) with track/artist names attached, for "trending now"
+-- and "last hour" questions. A window re-emitted after a replay is upserted in
+-- RAW_PLAY_WINDOWS with a newer ingested_at; each run re-reads rows ingested
+-- since the watermark minus the listening-history lookback and merges them on
+-- agg_id.
+
+with windows as (
+    select *
+    from {{ ref('stg_play_windows') }}
+    {% if is_incremental() %}
+    where ingested_at > (
+        select coalesce(
+            {{ dbt.dateadd('hour', -1 * var('listening_history_lookback_hours'), 'max(ingested_at)') }},
+            cast('1900-01-01' as {{ dbt.type_timestamp() }})
+        )
+        from {{ this }}
+    )
+    {% endif %}
+),
+
+latest_windows as (
+    {{ latest_by('windows', 'agg_id', 'ingested_at desc') }}
+),
+
+track_aliases as (
+    select * from {{ ref('stg_track_aliases') }}
+),
+
+tracks as (
+    select * from {{ ref('int_tracks_with_artists') }}
+),
+
+artists as (
+    select * from {{ ref('stg_top_artists') }}
+)
+
+select
+    w.agg_id,
+    w.window_name,
+    w.window_start,
+    w.window_end,
+    w.dimension,
+    w.dim_key,
+    case w.dimension
+        when 'track' then t.track_name
+        when 'artist' then a.artist_name
+        else w.dim_key
+    end as dim_name,
+    t.artist_name as track_artist_name,
+    w.plays,
+    w.skips,
+    case
+        when w.plays > 0 then round(cast(w.skips as {{ dbt.type_float() }}) / w.plays * 100, 2)
+        else 0
+    end as skip_rate_percent,
+    w.listen_seconds,
+    w.avg_listen_seconds,
+    w.listeners,
+    w.ingested_at
+from latest_windows w
+-- Streamed plays can reference a duplicate track ID; names come from the canonical track
+left join track_aliases ta
+    on w.dimension = 'track' and w.dim_key = ta.alias_track_id
+left join tracks t
+    on w.dimension = 'track' and coalesce(ta.track_id, w.dim_key) = t.track_id
+left join artists a
+    on w.dimension = 'artist' and w.dim_key = a.artist_id
@@ -0,0 +1,74 @@
+{{ config(
+    materialized='incremental',
+    unique_key='version_id',
+    incremental_strategy='merge',
+    merge_update_columns=['valid_to', 'is_current'],
+    on_schema_change='fail'
+) }}
+
+-- Artist and track popularity as a change-only time series for "as-of" and
+-- trend queries, built from the snap_top_* snapshots. One row per version
+-- with a [valid_from, valid_to) range; current versions end at 9999-12-31 so
+-- as-of lookups are a single range predicate:
+--     where valid_from <= :ts and valid_to > :ts
+-- Clustered on (entity_type, valid_from date) in dbt_project.yml.
+-- Incremental: only versions opened or closed since the last run are read.
+-- A version and the one it replaces arrive in the same run, so the change
+-- columns are computed once on insert; merges only close versions.
+
+with versions as (
+    select
+        'artist' as entity_type,
+        artist_id as entity_id,
+        artist_name as entity_name,
+        artist_popularity as popularity,
+        artist_followers as followers,
+        dbt_scd_id as version_id,
+        dbt_valid_from as valid_from,
+        dbt_valid_to as valid_to
+    from {{ ref('snap_top_artists') }}
+
+    union all
+
+    select
+        'track' as entity_type,
+        track_id as entity_id,
+        track_name as entity_name,
+        track_popularity as popularity,
+        null as followers,
+        dbt_scd_id as version_id,
+        dbt_valid_from as valid_from,
+        dbt_valid_to as valid_to
+    from {{ ref('snap_top_tracks') }}
+),
+
+changed as (
+    select *
+    from versions
+    {% if is_incremental() %}
+    where valid_from > (select max(valid_from) from {{ this }})
+       or valid_to > (select max(valid_from) from {{ this }})
+    {% endif %}
+),
+
+final as (
+    select
+        version_id,
+        entity_type,
+        entity_id,
+        entity_name,
+        popularity,
+        followers,
+        popularity - lag(popularity) over (
+            partition by entity_type, entity_id order by valid_from
+        ) as popularity_change,
+        followers - lag(followers) over (
+            partition by entity_type, entity_id order by valid_from
+        ) as followers_change,
+        valid_from,
+        coalesce(valid_to, cast('9999-12-31' as {{ dbt.type_timestamp() }})) as valid_to,
+        valid_to is null as is_current
+    from changed
+)
+
+select * from final
@@ -5,27 +5,101 @@
     incremental_strategy='merge'
 ) }}
 
+-- Delta aggregation: per-track running aggregates (sums, a distinct-listener
+-- sketch and the set of days played) are stored in this table. Each run only
+-- aggregates plays first loaded into int_listening_history_enriched since the
+-- last run, folds them into the stored state and recomputes the derived rates,
+-- so cost follows new events and the number of tracks, not the size of the
+-- listening history. first_loaded_at is stamped once per play_id, so replayed
+-- or re-ingested plays are never folded twice.
+--
+-- The watermark moves past every new play, so state is kept for every track
+-- that has plays, not only the tracks in the current crawl (RAW_TOP_TRACKS is
+-- truncated on each crawl): a track missing from it keeps its running
+-- aggregates with NULL track attributes (in_catalog = false) and picks its
+-- attributes up again when it returns.
+
 with tracks_base as (
     select *
     from {{ ref('int_tracks_with_artists') }}
 ),
 
--- Get listening metrics from user history
-listening_metrics as (
-    select 
+new_plays as (
+    select *
+    from {{ ref('int_listening_history_enriched') }}
+    {% if is_incremental() %}
+    where first_loaded_at > (
+        select coalesce(max(last_loaded_at), cast('1900-01-01' as {{ dbt.type_timestamp() }}))
+        from {{ this }}
+    )
+    {% endif %}
+),
+
+new_aggregates as (
+    select
         track_id,
         count(*) as total_plays,
-        count(distinct user_id) as unique_listeners,
-        avg(play_duration_seconds) as avg_listen_duration,
         sum(case when skipped = true then 1 else 0 end) as total_skips,
-        count(distinct to_date(play_ts)) as days_played
-    from {{ ref('int_listening_history_enriched') }}
+        sum(play_duration_seconds) as listen_seconds_sum,
+        {{ sketch_accumulate('user_id') }} as listeners_sketch,
+        {{ set_agg(to_date('play_ts')) }} as days_played_set,
+        max(first_loaded_at) as last_loaded_at
+    from new_plays
     group by track_id
 ),
 
+all_aggregates as (
+    {% if is_incremental() %}
+    select
+        track_id,
+        total_plays,
+        total_skips,
+        listen_seconds_sum,
+        listeners_sketch,
+        days_played_set,
+        last_loaded_at
+    from {{ this }}
+    where total_plays > 0
+
+    union all
+
+    {% endif %}
+    select * from new_aggregates
+),
+
+-- Running aggregates merged per track
+running as (
+    select
+        track_id,
+        sum(total_plays) as total_plays,
+        sum(total_skips) as total_skips,
+        sum(listen_seconds_sum) as listen_seconds_sum,
+        {{ sketch_combine('listeners_sketch') }} as listeners_sketch,
+        {{ set_union_agg('days_played_set') }} as days_played_set,
+        max(last_loaded_at) as last_loaded_at
+    from all_aggregates
+    group by track_id
+),
+
+-- Get listening metrics from the running aggregates
+listening_metrics as (
+    select
+        track_id,
+        total_plays,
+        total_skips,
+        listen_seconds_sum,
+        listeners_sketch,
+        days_played_set,
+        last_loaded_at,
+        {{ sketch_estimate('listeners_sketch') }} as unique_listeners,
+        listen_seconds_sum / nullif(total_plays, 0) as avg_listen_duration,
+        {{ set_size('days_played_set') }} as days_played
+    from running
+),
+
 track_summary as (
     select
-        t.track_id,
+        coalesce(t.track_id, l.track_id) as track_id,
         t.track_name,
         t.artist_id,
         t.artist_name,
@@ -34,6 +108,7 @@ track_summary as (
         t.duration_seconds,
         t.track_language,
         t.is_explicit,
+        t.track_id is not null as in_catalog,
         
         -- Listening metrics
         coalesce(l.total_plays, 0) as total_plays,
@@ -44,22 +119,28 @@ track_summary as (
         
         -- Calculated metrics
         case 
-            when l.total_plays > 0 then round(l.total_skips::float / l.total_plays * 100, 2)
+            when l.total_plays > 0 then round(cast(l.total_skips as {{ dbt.type_float() }}) / l.total_plays * 100, 2)
             else 0 
         end as skip_rate_percent,
         
         case
-            when l.unique_listeners > 0 then round(l.total_plays::float / l.unique_listeners, 2)
+            when l.unique_listeners > 0 then round(cast(l.total_plays as {{ dbt.type_float() }}) / l.unique_listeners, 2)
             else 0
         end as avg_plays_per_listener,
         
         case
             when t.duration_seconds > 0 then round(l.avg_listen_duration / t.duration_seconds * 100, 2)
             else 0
-        end as completion_rate_percent
+        end as completion_rate_percent,
+
+        -- Running aggregate state folded into by the next incremental run
+        coalesce(l.listen_seconds_sum, 0) as listen_seconds_sum,
+        l.listeners_sketch,
+        l.days_played_set,
+        l.last_loaded_at
         
     from tracks_base t
-    left join listening_metrics l on t.track_id = l.track_id
+    full outer join listening_metrics l on t.track_id = l.track_id
 ),
 
 final as (
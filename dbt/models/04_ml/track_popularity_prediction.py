@@ -2,8 +2,9 @@ import pandas as pd
 import numpy as np
 
 def model(dbt, session):
-    # Load data directly from raw table
-    tracks_df = session.table("RAW_TOP_TRACKS").to_pandas()
+    # Load data directly from raw table (Snowpark DataFrame on Snowflake, DuckDB relation locally)
+    raw_tracks = dbt.source("raw", "RAW_TOP_TRACKS")
+    tracks_df = raw_tracks.to_pandas() if hasattr(raw_tracks, "to_pandas") else raw_tracks.df()
     
     # Clean data
     tracks_df = tracks_df.dropna(subset=['POPULARITY', 'DURATION_MS'])
@@ -0,0 +1,21 @@
+{% snapshot snap_top_artists %}
+
+{{ config(
+    target_schema=target.schema,
+    unique_key='artist_id',
+    strategy='check',
+    check_cols=['artist_name', 'artist_popularity', 'artist_followers']
+) }}
+
+-- Change-only history: a new version is recorded only when one of the
+-- check_cols differs from the current version, so re-crawls that change
+-- nothing add no rows.
+
+select
+    artist_id,
+    artist_name,
+    artist_popularity,
+    artist_followers
+from {{ ref('stg_top_artists') }}
+
+{% endsnapshot %}
@@ -0,0 +1,19 @@
+{% snapshot snap_top_tracks %}
+
+{{ config(
+    target_schema=target.schema,
+    unique_key='track_id',
+    strategy='check',
+    check_cols=['track_name', 'track_popularity']
+) }}
+
+-- Change-only history of track popularity (see snap_top_artists)
+
+select
+    track_id,
+    track_name,
+    artist_id,
+    track_popularity
+from {{ ref('stg_top_tracks') }}
+
+{% endsnapshot %}
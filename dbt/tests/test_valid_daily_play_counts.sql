@@ -1,11 +1,12 @@
--- Fail if plays < 1  OR  plays < distinct_tracks
+-- Fail if plays < 1  OR  skips > plays
 SELECT
     user_id,
     play_date,
+    track_id,
     plays,
-    distinct_tracks
-FROM {{ ref('mart_user_daily_plays') }}
+    skips
+FROM {{ ref('mart_daily_plays') }}
 WHERE plays < 1
-   OR plays < distinct_tracks
+   OR skips > plays
 
---{{ ref('…') }} gives the compiled table name so the test works in every env.
\ No newline at end of file
+--{{ ref('…') }} gives the compiled table name so the test works in every env.
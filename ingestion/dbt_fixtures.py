@@ -0,0 +1,172 @@
+"""
+ingestion/dbt_fixtures.py
+────────────────────────────────────────────────────────
+Raw-table fixtures for running the dbt project on the DuckDB
+profile (dbt/profiles/duckdb), built from the crawled catalog
+in data/raw_artists_tracks.json and the vectorized synthetic
+play generator (fake_listening_history.synthesize_plays).
+
+  seeds   write small CSV seeds of the raw tables to dbt/seeds/
+          (`dbt seed --vars 'load_fixture_seeds: true'` loads them,
+          replacing the raw tables; they are disabled on Snowflake)
+  load    write the raw tables straight into the DuckDB warehouse
+          with N plays – CSV seeds do not scale to 10M+ rows
+  append  add N plays from the last day with a fresh INGESTED_AT,
+          to time an incremental build against the full one
+
+Usage:
+  python ingestion/dbt_fixtures.py seeds --plays 5000
+  dbt seed --project-dir dbt --profiles-dir dbt/profiles/duckdb --vars 'load_fixture_seeds: true'
+  dbt build --project-dir dbt --profiles-dir dbt/profiles/duckdb
+
+  python ingestion/dbt_fixtures.py load --plays 10000000 --users 5000
+  dbt build --project-dir dbt --profiles-dir dbt/profiles/duckdb --exclude resource_type:seed resource_type:test
+  python ingestion/dbt_fixtures.py append --plays 100000 --users 5000
+  dbt build --project-dir dbt --profiles-dir dbt/profiles/duckdb --exclude resource_type:seed resource_type:test
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.dirname(__file__))
+from dedup import ALIAS_TABLE, dedupe_tracks
+from fake_listening_history import synthesize_plays
+from payloads import artist_to_row, track_to_row
+from schemas import RAW_SCHEMAS, apply_schema
+from warehouse import DuckDBWarehouse
+
+CATALOG_PATH = "data/raw_artists_tracks.json"
+SEEDS_DIR = os.path.join(os.path.dirname(__file__), "..", "dbt", "seeds")
+CHUNK_SIZE = 1_000_000
+HISTORY_DAYS = 60
+APPEND_DAYS = 1
+INGEST_LAG_SEC = 600
+PLAYS_TABLE = "RAW_LISTENING_HISTORY"
+WINDOWS_TABLE = "RAW_PLAY_WINDOWS"
+
+
+def catalog_frames(path=CATALOG_PATH):
+    """Catalog raw tables (artists, tracks, aliases) from a crawl dump, plus an empty RAW_PLAY_WINDOWS."""
+    with open(path) as f:
+        data = json.load(f)
+
+    artists = data.get("top_artists", [])
+    # Keep the catalog referentially complete: tracks whose primary artist is a
+    # featured artist that was never crawled would fail the relationship tests
+    artist_ids = {a.get("id") for a in artists}
+    tracks = [t for t in data.get("top_tracks", []) if (t.get("artists") or [{}])[0].get("id") in artist_ids]
+    tracks, dedup_index = dedupe_tracks(tracks)
+
+    # The fixtures only need the typed columns; no JSON_DATA payloads
+    artists_df = apply_schema(pd.DataFrame([artist_to_row(a, "archive") for a in artists]), "RAW_TOP_ARTISTS")
+    tracks_df = apply_schema(pd.DataFrame([track_to_row(t, "archive") for t in tracks]), "RAW_TOP_TRACKS")
+    aliases_df = apply_schema(pd.DataFrame(dedup_index.alias_rows()), ALIAS_TABLE)
+    return {
+        "RAW_TOP_ARTISTS": artists_df.drop(columns=["json_data"]),
+        "RAW_TOP_TRACKS": tracks_df.drop(columns=["json_data"]),
+        ALIAS_TABLE: aliases_df,
+        # Written by the streaming aggregator; only needs to exist for the source tests
+        WINDOWS_TABLE: empty_frame(WINDOWS_TABLE),
+    }
+
+
+def empty_frame(table_name):
+    """Zero-row frame with the registry columns and dtypes of `table_name`."""
+    return apply_schema(pd.DataFrame(columns=list(RAW_SCHEMAS[table_name])), table_name)
+
+
+def _track_pool(tracks_df):
+    return pd.DataFrame({
+        "TRACK_ID": tracks_df["id"],
+        "ARTIST_ID": tracks_df["artist_id"],
+        "TRACK_LANGUAGE": tracks_df["track_language"].astype(str),
+    })
+
+
+def iter_plays(tracks_df, n_plays, n_users, seed, now, days=HISTORY_DAYS, backfill=True, chunk_size=CHUNK_SIZE):
+    """
+    Yield synthetic plays in chunks, stamped with INGESTED_AT.
+
+    Backfilled history is stamped a few minutes after each play, as the
+    stream would have landed it, so incremental models only see an appended
+    batch (stamped `now`) as new rows.
+    """
+    pool = _track_pool(tracks_df)
+    rng = np.random.default_rng(seed)
+    for i, start in enumerate(range(0, n_plays, chunk_size)):
+        chunk_seed = None if seed is None else seed + i
+        plays = synthesize_plays(pool, min(chunk_size, n_plays - start), n_users=n_users, days=days,
+                                 seed=chunk_seed, now=now)
+        if backfill:
+            lag = pd.to_timedelta(rng.integers(0, INGEST_LAG_SEC, len(plays)), unit="s")
+            plays["ingested_at"] = (plays["play_ts"] + lag).clip(upper=pd.Timestamp(now))
+        else:
+            plays["ingested_at"] = pd.Timestamp(now)
+        yield plays
+
+
+def write_seeds(n_plays, n_users, seed, seeds_dir=SEEDS_DIR):
+    """Write the raw tables as CSV seeds named after the source tables."""
+    os.makedirs(seeds_dir, exist_ok=True)
+    ingested_at = datetime.now().replace(microsecond=0)
+    frames = catalog_frames()
+    frames[PLAYS_TABLE] = pd.concat(list(iter_plays(frames["RAW_TOP_TRACKS"], n_plays, n_users, seed, ingested_at)))
+
+    for table, df in frames.items():
+        path = os.path.join(seeds_dir, f"{table}.csv")
+        df.rename(columns=str.upper).to_csv(path, index=False)
+        print(f"🌱 {table}: {len(df):,} rows → {os.path.relpath(path)}")
+
+
+def load_warehouse(n_plays, n_users, seed, append=False, path=None):
+    """Write the raw tables (or, with `append`, only new plays) into the DuckDB warehouse."""
+    ingested_at = datetime.now().replace(microsecond=0)
+    frames = catalog_frames()
+    start = time.perf_counter()
+
+    with DuckDBWarehouse(path=path) as wh:
+        if not append:
+            for table in [*frames, PLAYS_TABLE]:
+                wh.execute(f"DROP TABLE IF EXISTS {table}")
+            for table, df in frames.items():
+                wh.write(df.rename(columns=str.upper), table, create=True)
+                print(f"📦 {table}: {len(df):,} rows")
+
+        loaded = 0
+        days = APPEND_DAYS if append else HISTORY_DAYS
+        for plays in iter_plays(frames["RAW_TOP_TRACKS"], n_plays, n_users, seed, ingested_at, days=days,
+                                backfill=not append):
+            loaded += wh.write(plays.rename(columns=str.upper), PLAYS_TABLE, create=True)
+            print(f"🎧 {PLAYS_TABLE}: {loaded:,}/{n_plays:,} plays")
+
+    elapsed = time.perf_counter() - start
+    print(f"✅ {'Appended' if append else 'Loaded'} {loaded:,} plays in {elapsed:.1f}s "
+          f"({loaded / max(elapsed, 1e-9):,.0f} rows/sec) into {wh.path}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Raw-table fixtures for the dbt DuckDB profile")
+    parser.add_argument("command", choices=["seeds", "load", "append"])
+    parser.add_argument("--plays", type=int, default=None, help="plays to generate (seeds: 5,000; load: 1,000,000)")
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=42, help="RNG seed (append uses fresh randomness)")
+    parser.add_argument("--duckdb-path", default=None, help="warehouse file (default DUCKDB_PATH)")
+    args = parser.parse_args(argv)
+
+    if args.command == "seeds":
+        write_seeds(args.plays or 5_000, args.users, args.seed)
+    else:
+        append = args.command == "append"
+        load_warehouse(args.plays or (100_000 if append else 1_000_000), args.users,
+                       None if append else args.seed, append=append, path=args.duckdb_path)
+
+
+if __name__ == "__main__":
+    main()
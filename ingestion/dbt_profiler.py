@@ -0,0 +1,374 @@
+"""
+ingestion/dbt_profiler.py
+────────────────────────────────────────────────────────
+Per-model timing history for dbt runs.
+
+After each `dbt run` / `dbt build`, `record` reads
+target/run_results.json and target/manifest.json and stores
+one row per executed node (execution time, compile/execute
+split, rows affected, bytes scanned) in a local DuckDB history
+file (DBT_RUN_HISTORY_PATH). It then prints:
+
+  • the critical path – the chain of dependent nodes whose
+    execution times add up to the longest path through the DAG,
+    i.e. what bounds the run however many threads there are
+  • regressions – nodes whose time grew more than the threshold
+    over their trailing median (same full-refresh mode only,
+    and only once a node has enough history)
+
+Rows affected come from the adapter response (Snowflake reports
+them, DuckDB does not). Bytes scanned are looked up in Snowflake's
+QUERY_HISTORY by query id with --bytes-from-snowflake.
+
+Usage:
+  dbt build --project-dir dbt --profiles-dir dbt/profiles/duckdb
+  python ingestion/dbt_profiler.py record --target-dir dbt/target
+  python ingestion/dbt_profiler.py trend mart_daily_plays
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+
+import pandas as pd
+
+sys.path.append(os.path.dirname(__file__))
+from warehouse import DuckDBWarehouse, get_warehouse
+
+DEFAULT_TARGET_DIR = "dbt/target"
+DEFAULT_HISTORY_PATH = "data/dbt_run_history.duckdb"
+HISTORY_DATABASE = "DBT_RUN_HISTORY"
+HISTORY_SCHEMA = "RUNS"
+RUNS_TABLE = "DBT_RUNS"
+NODES_TABLE = "DBT_NODE_RUNS"
+
+REGRESSION_THRESHOLD = float(os.getenv("DBT_REGRESSION_THRESHOLD", "0.5"))  # +50% over the median
+TRAILING_RUNS = 10
+MIN_HISTORY = 3
+MIN_SECONDS = 1.0  # sub-second nodes are mostly noise
+OK_STATUSES = ("success", "pass")
+
+DDL = {
+    RUNS_TABLE: """
+        invocation_id VARCHAR PRIMARY KEY,
+        generated_at TIMESTAMP,
+        dbt_version VARCHAR,
+        command VARCHAR,
+        full_refresh BOOLEAN,
+        elapsed_sec DOUBLE,
+        nodes INTEGER,
+        critical_path_sec DOUBLE
+    """,
+    NODES_TABLE: """
+        invocation_id VARCHAR,
+        unique_id VARCHAR,
+        name VARCHAR,
+        resource_type VARCHAR,
+        materialized VARCHAR,
+        status VARCHAR,
+        execution_sec DOUBLE,
+        compile_sec DOUBLE,
+        execute_sec DOUBLE,
+        rows_affected BIGINT,
+        bytes_scanned BIGINT,
+        query_id VARCHAR,
+        thread_id VARCHAR,
+        started_at TIMESTAMP,
+        completed_at TIMESTAMP,
+        on_critical_path BOOLEAN
+    """,
+}
+
+
+def _columns(table):
+    return [line.split()[0] for line in DDL[table].strip().splitlines()]
+
+
+def _ts(value):
+    return pd.Timestamp(value).tz_localize(None) if value else None
+
+
+def load_artifacts(target_dir=DEFAULT_TARGET_DIR):
+    """(run_results, manifest) as written by the last dbt invocation in `target_dir`."""
+    with open(os.path.join(target_dir, "run_results.json")) as f:
+        run_results = json.load(f)
+    with open(os.path.join(target_dir, "manifest.json")) as f:
+        manifest = json.load(f)
+    return run_results, manifest
+
+
+def node_rows(run_results, manifest):
+    """One history row per executed node."""
+    invocation_id = run_results["metadata"]["invocation_id"]
+    nodes = manifest.get("nodes", {})
+    rows = []
+    for result in run_results["results"]:
+        node = nodes.get(result["unique_id"], {})
+        timing = {t["name"]: t for t in result.get("timing") or []}
+        response = result.get("adapter_response") or {}
+
+        def phase_sec(name):
+            t = timing.get(name)
+            if not t or not t.get("started_at") or not t.get("completed_at"):
+                return None
+            return (_ts(t["completed_at"]) - _ts(t["started_at"])).total_seconds()
+
+        starts = [t["started_at"] for t in timing.values() if t.get("started_at")]
+        ends = [t["completed_at"] for t in timing.values() if t.get("completed_at")]
+        rows.append({
+            "invocation_id": invocation_id,
+            "unique_id": result["unique_id"],
+            "name": node.get("name", result["unique_id"].rsplit(".", 1)[-1]),
+            "resource_type": node.get("resource_type", result["unique_id"].split(".", 1)[0]),
+            "materialized": node.get("config", {}).get("materialized"),
+            "status": result["status"],
+            "execution_sec": result.get("execution_time") or 0.0,
+            "compile_sec": phase_sec("compile"),
+            "execute_sec": phase_sec("execute"),
+            "rows_affected": response.get("rows_affected"),
+            # BigQuery reports bytes_processed; Snowflake's come from QUERY_HISTORY
+            "bytes_scanned": response.get("bytes_scanned", response.get("bytes_processed")),
+            "query_id": response.get("query_id"),
+            "thread_id": result.get("thread_id"),
+            "started_at": _ts(min(starts)) if starts else None,
+            "completed_at": _ts(max(ends)) if ends else None,
+            "on_critical_path": False,
+        })
+    return rows
+
+
+def critical_path(rows, manifest):
+    """
+    Longest chain of executed nodes through the DAG, weighted by execution time.
+
+    Nodes that were not executed in this run (ephemeral models, excluded or
+    deferred nodes) are walked through, so their executed ancestors still count.
+    Returns [(unique_id, seconds), ...] from the root of the chain to its end.
+    """
+    durations = {r["unique_id"]: r["execution_sec"] for r in rows}
+    nodes = manifest.get("nodes", {})
+    parents_memo, finish = {}, {}
+
+    def executed_parents(uid):
+        if uid not in parents_memo:
+            parents = set()
+            for parent in nodes.get(uid, {}).get("depends_on", {}).get("nodes", []):
+                if parent in durations:
+                    parents.add(parent)
+                elif parent in nodes:
+                    parents |= executed_parents(parent)
+            parents_memo[uid] = parents
+        return parents_memo[uid]
+
+    def finish_time(uid):
+        # (end of the longest chain ending at uid, previous node on that chain)
+        if uid not in finish:
+            best = max(((finish_time(p)[0], p) for p in executed_parents(uid)), default=(0.0, None))
+            finish[uid] = (best[0] + durations[uid], best[1])
+        return finish[uid]
+
+    if not durations:
+        return []
+    uid = max(durations, key=lambda u: finish_time(u)[0])
+    path = []
+    while uid is not None:
+        path.append((uid, durations[uid]))
+        uid = finish_time(uid)[1]
+    return path[::-1]
+
+
+def run_row(run_results, rows, path):
+    metadata = run_results["metadata"]
+    args = run_results.get("args", {})
+    return {
+        "invocation_id": metadata["invocation_id"],
+        "generated_at": _ts(metadata["generated_at"]),
+        "dbt_version": metadata.get("dbt_version"),
+        "command": args.get("which"),
+        "full_refresh": bool(args.get("full_refresh", False)),
+        "elapsed_sec": run_results.get("elapsed_time"),
+        "nodes": len(rows),
+        "critical_path_sec": sum(sec for _, sec in path),
+    }
+
+
+def snowflake_bytes_scanned(query_ids, wh=None):
+    """BYTES_SCANNED per query id from INFORMATION_SCHEMA.QUERY_HISTORY (last 7 days)."""
+    query_ids = [q for q in dict.fromkeys(query_ids) if q]
+    if not query_ids:
+        return {}
+    wh = wh or get_warehouse("snowflake")
+    placeholders = ", ".join([wh.placeholder] * len(query_ids))
+    rows = wh.query(
+        "SELECT QUERY_ID, BYTES_SCANNED FROM TABLE(INFORMATION_SCHEMA.QUERY_HISTORY(RESULT_LIMIT => 10000)) "
+        f"WHERE QUERY_ID IN ({placeholders})",
+        tuple(query_ids),
+    )
+    return {r["QUERY_ID"]: r["BYTES_SCANNED"] for r in rows}
+
+
+class RunHistory:
+    """dbt run / node timing history in a local DuckDB file."""
+
+    def __init__(self, path=None):
+        self.wh = DuckDBWarehouse(path=path or os.getenv("DBT_RUN_HISTORY_PATH", DEFAULT_HISTORY_PATH),
+                                  database=HISTORY_DATABASE, schema=HISTORY_SCHEMA)
+        for table, columns in DDL.items():
+            self.wh.execute(f"CREATE TABLE IF NOT EXISTS {table} ({columns})").close()
+
+    def close(self):
+        self.wh.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def record(self, run, rows):
+        """Store one invocation; re-recording the same invocation replaces it."""
+        for table in (NODES_TABLE, RUNS_TABLE):
+            self.wh.delete_keys(table, "invocation_id", [run["invocation_id"]])
+        self.wh.write(pd.DataFrame([run]), RUNS_TABLE)
+        nodes = pd.DataFrame(rows, columns=_columns(NODES_TABLE))
+        for column in ("rows_affected", "bytes_scanned"):
+            nodes[column] = nodes[column].astype("Int64")
+        self.wh.write(nodes, NODES_TABLE)
+
+    def trailing_times(self, run, window=TRAILING_RUNS):
+        """unique_id → execution times of its last `window` successful runs before `run`."""
+        rows = self.wh.query(
+            f"""
+            SELECT unique_id, execution_sec
+            FROM (
+                SELECT n.unique_id, n.execution_sec,
+                       row_number() OVER (PARTITION BY n.unique_id ORDER BY r.generated_at DESC) AS rn
+                FROM {NODES_TABLE} n
+                JOIN {RUNS_TABLE} r USING (invocation_id)
+                WHERE r.generated_at < ?
+                  AND r.full_refresh = ?
+                  AND n.status IN ({", ".join("?" * len(OK_STATUSES))})
+            )
+            WHERE rn <= ?
+            """,
+            (run["generated_at"], run["full_refresh"], *OK_STATUSES, window),
+        )
+        times = {}
+        for r in rows:
+            times.setdefault(r["UNIQUE_ID"], []).append(r["EXECUTION_SEC"])
+        return times
+
+    def regressions(self, run, rows, threshold=REGRESSION_THRESHOLD, window=TRAILING_RUNS,
+                    min_history=MIN_HISTORY, min_seconds=MIN_SECONDS):
+        """Nodes of `run` slower than (1 + threshold) × their trailing median, slowest growth first."""
+        history = self.trailing_times(run, window)
+        flagged = []
+        for r in rows:
+            times = history.get(r["unique_id"], [])
+            if r["status"] not in OK_STATUSES or len(times) < min_history or r["execution_sec"] < min_seconds:
+                continue
+            median = statistics.median(times)
+            if median > 0 and r["execution_sec"] > median * (1 + threshold):
+                flagged.append({**r, "median_sec": median, "history_runs": len(times),
+                                "growth": r["execution_sec"] / median - 1})
+        return sorted(flagged, key=lambda f: f["growth"], reverse=True)
+
+    def trend(self, model, limit=TRAILING_RUNS * 2):
+        """Most recent runs of one node (by unique_id or name), oldest first."""
+        rows = self.wh.query(
+            f"""
+            SELECT r.generated_at, r.command, r.full_refresh, n.status, n.execution_sec, n.rows_affected
+            FROM {NODES_TABLE} n
+            JOIN {RUNS_TABLE} r USING (invocation_id)
+            WHERE n.unique_id = ? OR n.name = ?
+            ORDER BY r.generated_at DESC
+            LIMIT ?
+            """,
+            (model, model, limit),
+        )
+        return rows[::-1]
+
+
+def render_critical_path(path, elapsed_sec):
+    total = sum(sec for _, sec in path)
+    lines = [f"🛤️  Critical path: {total:.2f}s over {len(path)} nodes ({elapsed_sec:.2f}s wall)"]
+    for uid, sec in path:
+        share = sec / total if total else 0.0
+        lines.append(f"   {sec:8.2f}s  {share:4.0%}  {'█' * round(share * 20):<20}  {uid}")
+    return lines
+
+
+def record(target_dir=DEFAULT_TARGET_DIR, history_path=None, threshold=REGRESSION_THRESHOLD, window=TRAILING_RUNS,
+           min_history=MIN_HISTORY, bytes_from_snowflake=False):
+    """Ingest the last run's artifacts, print its critical path and regressions; returns the regressions."""
+    run_results, manifest = load_artifacts(target_dir)
+    rows = node_rows(run_results, manifest)
+    if bytes_from_snowflake:
+        scanned = snowflake_bytes_scanned([r["query_id"] for r in rows])
+        for r in rows:
+            r["bytes_scanned"] = scanned.get(r["query_id"], r["bytes_scanned"])
+
+    path = critical_path(rows, manifest)
+    on_path = {uid for uid, _ in path}
+    for r in rows:
+        r["on_critical_path"] = r["unique_id"] in on_path
+    run = run_row(run_results, rows, path)
+
+    with RunHistory(history_path) as history:
+        history.record(run, rows)
+        flagged = history.regressions(run, rows, threshold=threshold, window=window, min_history=min_history)
+        print(f"📥 Recorded {run['command'] or 'dbt'} run {run['invocation_id'][:8]}: {len(rows)} nodes, "
+              f"{run['elapsed_sec']:.2f}s → {history.wh.path}")
+
+    for line in render_critical_path(path, run["elapsed_sec"]):
+        print(line)
+    if flagged:
+        print(f"🐢 {len(flagged)} regression(s) over {threshold:.0%} of the trailing median:")
+        for f in flagged:
+            print(f"   {f['unique_id']}: {f['execution_sec']:.2f}s vs median {f['median_sec']:.2f}s "
+                  f"(+{f['growth']:.0%}, {f['history_runs']} runs)")
+    else:
+        print("✅ No regressions")
+    return flagged
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Per-model dbt timing history, critical path and regressions")
+    parser.add_argument("--history-path", default=None, help="history file (default DBT_RUN_HISTORY_PATH)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    rec = commands.add_parser("record", help="ingest run_results.json + manifest.json from the last run")
+    rec.add_argument("--target-dir", default=DEFAULT_TARGET_DIR)
+    rec.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD, help="flag growth over the median")
+    rec.add_argument("--window", type=int, default=TRAILING_RUNS, help="runs in the trailing median")
+    rec.add_argument("--min-history", type=int, default=MIN_HISTORY)
+    rec.add_argument("--bytes-from-snowflake", action="store_true", help="look up BYTES_SCANNED by query id")
+    rec.add_argument("--fail-on-regression", action="store_true", help="exit 1 when a node regressed")
+
+    tr = commands.add_parser("trend", help="recent timings of one model")
+    tr.add_argument("model", help="node name or unique_id")
+    tr.add_argument("--limit", type=int, default=TRAILING_RUNS * 2)
+    args = parser.parse_args(argv)
+
+    if args.command == "record":
+        flagged = record(args.target_dir, args.history_path, args.threshold, args.window, args.min_history,
+                         args.bytes_from_snowflake)
+        if flagged and args.fail_on_regression:
+            sys.exit(1)
+    else:
+        with RunHistory(args.history_path) as history:
+            runs = history.trend(args.model, args.limit)
+        if not runs:
+            print(f"⚠️ No history for {args.model}")
+            return
+        slowest = max(r["EXECUTION_SEC"] for r in runs) or 1.0
+        for r in runs:
+            mode = "full-refresh" if r["FULL_REFRESH"] else r["COMMAND"]
+            print(f"{r['GENERATED_AT']:%Y-%m-%d %H:%M}  {mode:<12} {r['STATUS']:<8} {r['EXECUTION_SEC']:8.2f}s  "
+                  f"{'█' * round(r['EXECUTION_SEC'] / slowest * 30)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+ingestion/dedup.py
+────────────────────────────────────────────────────────
+ISRC-keyed track de-duplication applied before load.
+
+The same recording shows up under several artists' top
+tracks (features) and under several Spotify IDs (single vs
+album version). TrackDedupIndex collapses those copies to one
+canonical track per recording and keeps an alias map from
+every Spotify ID seen to its canonical ID.
+
+Recordings are keyed on external_ids.isrc; tracks without an
+ISRC fall back to a hash of the normalized name and duration.
+"""
+
+import hashlib
+import re
+import unicodedata
+from typing import Dict, Iterable, List, Optional, Tuple
+
+ALIAS_TABLE = "RAW_TRACK_ALIASES"
+
+# "Song (feat. X)", "Song - Remastered 2011", "Song [Radio Edit]" → "song"
+_DECORATION_RE = re.compile(r"\s*(\(|\[)\s*(feat|ft|with)\.?\s[^)\]]*(\)|\])|\s+-\s+.*$", re.IGNORECASE)
+_NON_WORD_RE = re.compile(r"[^\w\s]")
+_SPACE_RE = re.compile(r"\s+")
+
+
+def normalize_title(name: Optional[str]) -> str:
+    """Lower-case, accent-fold and strip featuring/version decorations from a title."""
+    if not name:
+        return ""
+    text = unicodedata.normalize("NFKD", name)
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    text = _DECORATION_RE.sub("", text.lower())
+    text = _NON_WORD_RE.sub(" ", text)
+    return _SPACE_RE.sub(" ", text).strip()
+
+
+def dedup_key(track: Dict) -> str:
+    """Return the recording key for a Spotify track object."""
+    isrc = (track.get("external_ids") or {}).get("isrc")
+    if isrc:
+        return f"isrc:{isrc.strip().upper()}"
+    seconds = round((track.get("duration_ms") or 0) / 1000)
+    digest = hashlib.sha1(f"{normalize_title(track.get('name'))}|{seconds}".encode("utf-8")).hexdigest()
+    return f"nd:{digest[:16]}"
+
+
+class TrackDedupIndex:
+    """Collapse duplicate recordings and track Spotify ID → canonical ID aliases."""
+
+    def __init__(self):
+        self._canonical: Dict[str, Dict] = {}   # dedup key → canonical track object
+        self._key_of: Dict[str, str] = {}       # spotify id → dedup key
+        self.duplicates = 0
+
+    def __len__(self):
+        return len(self._canonical)
+
+    def add(self, track: Dict) -> Optional[str]:
+        """Add a track and return the canonical ID its recording maps to."""
+        track_id = track.get("id")
+        if not track_id:
+            return None
+
+        key = self._key_of.get(track_id) or dedup_key(track)
+        self._key_of[track_id] = key
+
+        current = self._canonical.get(key)
+        if current is None:
+            self._canonical[key] = track
+        else:
+            self.duplicates += 1
+            # Same tie-break the dbt models used: most popular copy wins
+            if (track.get("popularity") or 0) > (current.get("popularity") or 0):
+                self._canonical[key] = track
+        return self._canonical[key]["id"]
+
+    def add_all(self, tracks: Iterable[Dict]) -> "TrackDedupIndex":
+        for track in tracks:
+            self.add(track)
+        return self
+
+    def canonical_id(self, track_id: str) -> Optional[str]:
+        key = self._key_of.get(track_id)
+        return self._canonical[key]["id"] if key else None
+
+    def tracks(self) -> List[Dict]:
+        """Canonical track objects, one per recording."""
+        return list(self._canonical.values())
+
+    def alias_map(self) -> Dict[str, str]:
+        """Every Spotify ID seen → canonical Spotify ID (identity for canonical IDs)."""
+        return {track_id: self._canonical[key]["id"] for track_id, key in self._key_of.items()}
+
+    def alias_rows(self) -> List[Dict]:
+        """Rows for RAW_TRACK_ALIASES."""
+        return [
+            {"alias_id": track_id, "canonical_id": self._canonical[key]["id"], "dedup_key": key}
+            for track_id, key in self._key_of.items()
+        ]
+
+
+def dedupe_tracks(tracks: Iterable[Dict]) -> Tuple[List[Dict], TrackDedupIndex]:
+    """Convenience wrapper: return (canonical tracks, index)."""
+    index = TrackDedupIndex().add_all(tracks)
+    return index.tracks(), index
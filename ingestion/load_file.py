@@ -0,0 +1,150 @@
+"""
+ingestion/load_file.py
+────────────────────────────────────────────────────────
+Stream a local CSV/Parquet file into a warehouse table in
+fixed-size chunks, so peak memory stays flat no matter how
+large data/raw_listening_history.csv grows.
+
+Usage:
+  python ingestion/load_file.py data/raw_listening_history.csv \
+      --table RAW_LISTENING_HISTORY --chunk-size 100000
+"""
+
+import argparse
+import os
+import resource
+import sys
+import time
+from datetime import datetime
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+sys.path.append(os.path.dirname(__file__))
+from warehouse import get_warehouse
+from profiling import LoadProfiler
+from schemas import csv_read_options
+
+DEFAULT_CHUNK_SIZE = 100_000
+
+
+def _peak_rss_mb() -> float:
+    # ru_maxrss is reported in KB on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def iter_file_chunks(path, chunk_size=DEFAULT_CHUNK_SIZE, dtypes=None, parse_dates=None):
+    """Yield the file as a sequence of pyarrow Tables of at most `chunk_size` rows."""
+    ext = os.path.splitext(path)[1].lower()
+
+    if ext == ".parquet":
+        parquet_file = pq.ParquetFile(path)
+        for batch in parquet_file.iter_batches(batch_size=chunk_size):
+            yield pa.Table.from_batches([batch])
+    elif ext == ".csv":
+        reader = pd.read_csv(
+            path,
+            chunksize=chunk_size,
+            dtype=dtypes,
+            parse_dates=parse_dates,
+        )
+        for chunk in reader:
+            yield pa.Table.from_pandas(chunk, preserve_index=False)
+    else:
+        raise ValueError(f"Unsupported file type '{ext}' (expected .csv or .parquet)")
+
+
+def _prepare_chunk(table: pa.Table, ingested_at, target_columns=None) -> pa.Table:
+    """Upper-case column names, stamp INGESTED_AT and align to the target table."""
+    table = table.rename_columns([c.upper() for c in table.column_names])
+    if "INGESTED_AT" not in table.column_names:
+        table = table.append_column("INGESTED_AT", pa.array([ingested_at] * table.num_rows, pa.timestamp("s")))
+    if target_columns:
+        table = table.select([c for c in target_columns if c in table.column_names])
+    return table
+
+
+def load_file_to_warehouse(path, table_name, chunk_size=DEFAULT_CHUNK_SIZE, truncate_first=False,
+                           dtypes=None, parse_dates=None, profiler=None):
+    """
+    Load `path` into `table_name` one chunk at a time through the bulk write path.
+
+    Returns a stats dict with rows, chunks, seconds, rows_per_sec, peak_rss_mb
+    and per-phase timings.
+    """
+    if dtypes is None and path.lower().endswith(".csv"):
+        # Explicit dtypes come from the schema registry (ingestion/schemas.py)
+        header = pd.read_csv(path, nrows=0).columns
+        dtypes, parse_dates = csv_read_options(table_name, header)
+
+    profiler = profiler or LoadProfiler(run_name=f"load_file:{table_name}")
+    ingested_at = datetime.now().replace(microsecond=0)
+    stats = {"table": table_name, "file": path, "rows": 0, "chunks": 0}
+    start = time.perf_counter()
+
+    wh = get_warehouse()
+    with profiler.phase(table_name, "connect"):
+        wh.connect()
+
+    with wh:
+        target_columns = None
+        chunks = iter_file_chunks(path, chunk_size, dtypes, parse_dates)
+        while True:
+            with profiler.phase(table_name, "serialize"):
+                chunk = next(chunks, None)
+                if chunk is not None:
+                    chunk = _prepare_chunk(chunk, ingested_at, target_columns)
+            if chunk is None:
+                break
+
+            if target_columns is None:
+                with profiler.phase(table_name, "describe"):
+                    wh.ensure_table(table_name, chunk)
+                    target_columns = [name for name, _ in wh.describe_table(table_name)]
+                missing = set(chunk.column_names) - set(target_columns)
+                if missing:
+                    print(f"⚠️  {table_name}: Missing columns in warehouse: {missing}")
+                chunk = chunk.select([c for c in target_columns if c in chunk.column_names])
+                if truncate_first:
+                    with profiler.phase(table_name, "truncate"):
+                        wh.truncate(table_name)
+                    print(f"🗑️  {table_name}: Table truncated")
+
+            with profiler.phase(table_name, "upload"):
+                rows = wh.write(chunk, table_name)
+            profiler.record(table_name, rows=rows, payload_bytes=chunk.nbytes)
+            stats["rows"] += rows
+            stats["chunks"] += 1
+            del chunk
+
+        with profiler.phase(table_name, "commit"):
+            wh.commit()
+        profiler.record(table_name, success=True)
+
+    stats["seconds"] = round(time.perf_counter() - start, 3)
+    stats["rows_per_sec"] = round(stats["rows"] / stats["seconds"], 1) if stats["seconds"] else 0.0
+    stats["peak_rss_mb"] = round(_peak_rss_mb(), 1)
+    stats["phases_sec"] = profiler.report()["tables"][table_name]["phases_sec"]
+
+    print(
+        f"✅  {table_name}: {stats['rows']:,} rows in {stats['chunks']} chunks, "
+        f"{stats['seconds']}s ({stats['rows_per_sec']:,.0f} rows/sec, peak RSS {stats['peak_rss_mb']} MB)"
+    )
+    return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Stream a CSV/Parquet file into a warehouse table")
+    parser.add_argument("path", nargs="?", default="data/raw_listening_history.csv")
+    parser.add_argument("--table", default="RAW_LISTENING_HISTORY")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument("--truncate", action="store_true", help="truncate the table before loading")
+    args = parser.parse_args(argv)
+
+    return load_file_to_warehouse(args.path, args.table, chunk_size=args.chunk_size, truncate_first=args.truncate)
+
+
+if __name__ == "__main__":
+    main()
@@ -2,10 +2,9 @@ import os
 import json
 import sys
 from pathlib import Path
+from contextlib import nullcontext
 from dotenv import load_dotenv
-import snowflake.connector as sf
 import pandas as pd
-from snowflake.connector.pandas_tools import write_pandas
 from datetime import datetime
 
 # Setup paths and imports
@@ -14,52 +13,70 @@ load_dotenv()
 # Add current directory to path so we can import crawl
 sys.path.append(os.path.dirname(__file__))
 from crawl import main as crawl_spotify_data
+from warehouse import get_warehouse
+from profiling import LoadProfiler
+from schemas import apply_schema
+from payloads import ARCHIVE_TABLE, archive_rows, artist_to_row, ensure_track_columns, get_payload_mode, track_to_row
+from dedup import ALIAS_TABLE, dedupe_tracks
 
 def _get_conn():
-    return sf.connect(
-        user=os.getenv("SNOWFLAKE_USER"),
-        password=os.getenv("SNOWFLAKE_PASSWORD"),
-        account=os.getenv("SNOWFLAKE_ACCOUNT"),
-        warehouse=os.getenv("SNOWFLAKE_WAREHOUSE"),
-        database=os.getenv("SNOWFLAKE_DATABASE"),
-        schema=os.getenv("SNOWFLAKE_SCHEMA"),
-    )
-
-def load_df_to_snowflake(df: pd.DataFrame, table_name: str, truncate_first=True):
-    """Insert DataFrame into Snowflake table."""
+    """Return the configured warehouse backend (see WAREHOUSE_BACKEND)."""
+    return get_warehouse()
+
+def load_df_to_snowflake(df: pd.DataFrame, table_name: str, truncate_first=True, profiler=None,
+                         create_if_missing=False, merge_key=None, wh=None):
+    """
+    Insert DataFrame into a warehouse table, timing each phase on `profiler`.
+
+    Raw tables are expected to exist already; pass create_if_missing for
+    auxiliary tables that should be created from the DataFrame's schema.
+    With merge_key set, rows whose key is already in the table are replaced
+    instead of duplicated. Pass an open warehouse as `wh` to reuse its
+    connection across calls (it is left open).
+    """
     if df.empty:
         print(f"⚠️  {table_name}: No data to load")
         return False
 
-    # Add ingested_at timestamp as string in format Snowflake expects
-    df_with_timestamp = df.copy()
-    df_with_timestamp['ingested_at'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    profiler = profiler or LoadProfiler(run_name=table_name)
+
+    with profiler.phase(table_name, "serialize"):
+        # Add ingested_at timestamp and cast to the registered compact dtypes
+        df_with_timestamp = df.copy()
+        df_with_timestamp['ingested_at'] = pd.Timestamp.now().floor('s')
+        df_with_timestamp = apply_schema(df_with_timestamp, table_name)
+
+        # Convert column names to uppercase for Snowflake
+        df_with_timestamp.columns = [col.upper() for col in df_with_timestamp.columns]
 
-    # Convert column names to uppercase for Snowflake
-    df_with_timestamp.columns = [col.upper() for col in df_with_timestamp.columns]
+    owns_connection = wh is None
+    wh = wh or _get_conn()
+    with profiler.phase(table_name, "connect"):
+        wh.connect()
 
-    with _get_conn() as conn:
+    with (wh if owns_connection else nullcontext(wh)):
         try:
-            # Debug: Show current database and schema context
-            cursor = conn.cursor()
-            cursor.execute("SELECT CURRENT_DATABASE(), CURRENT_SCHEMA()")
-            db_info = cursor.fetchone()
-            print(f"🔍 Current context: Database={db_info[0]}, Schema={db_info[1]}")
-            
-            # Get the actual column order from Snowflake table with full qualification
-            full_table_name = f"{db_info[0]}.{db_info[1]}.{table_name}"
-            print(f"🔍 Describing table: {full_table_name}")
-            
-            cursor.execute(f"DESC TABLE {full_table_name}")
-            desc_results = cursor.fetchall()
-            snowflake_columns = [row[0] for row in desc_results]
+            with profiler.phase(table_name, "describe"):
+                # Debug: Show current database and schema context
+                db_info = wh.current_context()
+                print(f"🔍 Current context: Database={db_info[0]}, Schema={db_info[1]} ({wh.name})")
+                
+                # Get the actual column order from the warehouse table with full qualification
+                full_table_name = f"{db_info[0]}.{db_info[1]}.{table_name}"
+                wh.ensure_table(full_table_name, df_with_timestamp)
+                create = create_if_missing and not wh.table_exists(full_table_name)
+                print(f"🔍 Describing table: {full_table_name}")
+                
+                if create:
+                    desc_results = [(col, str(dtype)) for col, dtype in df_with_timestamp.dtypes.items()]
+                else:
+                    desc_results = wh.describe_table(full_table_name)
+                snowflake_columns = [row[0] for row in desc_results]
             
             # Show full DESC TABLE results for debugging
             print(f"🔍 Full DESC TABLE results:")
             for row in desc_results:
-                print(f"    {row[0]} - {row[1]} - {row[2]}")
-            
-            cursor.close()
+                print(f"    {row[0]} - {row[1]}")
             
             print(f"🔍 {table_name}: Snowflake columns: {snowflake_columns}")
             print(f"🔍 {table_name}: DataFrame columns: {list(df_with_timestamp.columns)}")
@@ -69,43 +86,39 @@ def load_df_to_snowflake(df: pd.DataFrame, table_name: str, truncate_first=True)
             if missing_columns:
                 print(f"⚠️  {table_name}: Missing columns in Snowflake: {missing_columns}")
             
-            # Reorder DataFrame columns to match Snowflake table (only include existing columns)
-            existing_columns = [col for col in snowflake_columns if col in df_with_timestamp.columns]
-            df_reordered = df_with_timestamp.reindex(columns=existing_columns)
+            with profiler.phase(table_name, "serialize"):
+                # Reorder DataFrame columns to match Snowflake table (only include existing columns)
+                existing_columns = [col for col in snowflake_columns if col in df_with_timestamp.columns]
+                df_reordered = df_with_timestamp.reindex(columns=existing_columns)
+                payload_bytes = int(df_reordered.memory_usage(index=False, deep=True).sum())
             
             print(f"🔄 {table_name}: Reordered DataFrame columns: {list(df_reordered.columns)}")
             
             # Truncate table first if requested (overwrite mode)
-            if truncate_first:
-                cursor = conn.cursor()
-                cursor.execute(f"TRUNCATE TABLE {table_name}")
-                cursor.close()
+            if truncate_first and not create:
+                with profiler.phase(table_name, "truncate"):
+                    wh.truncate(table_name)
                 print(f"🗑️  {table_name}: Table truncated")
+            elif merge_key and not create:
+                # Upsert: drop the existing versions of the incoming keys first
+                with profiler.phase(table_name, "truncate"):
+                    wh.delete_keys(table_name, merge_key.upper(), df_reordered[merge_key.upper()].tolist())
+
+            with profiler.phase(table_name, "upload"):
+                nrows = wh.write(df_reordered, table_name, create=create)  # Use reordered DataFrame
+            with profiler.phase(table_name, "commit"):
+                wh.commit()
 
-            result = write_pandas(
-                conn,
-                df_reordered,  # Use reordered DataFrame
-                table_name=table_name,
-                quote_identifiers=False,
-                auto_create_table=False,
-                overwrite=False
-            )
-
-            success = result[0]
-            nrows = result[-1] if isinstance(result[-1], int) else len(df)
-
-            if success:
-                print(f"✅  {table_name}: {nrows:,} rows loaded")
-                return True
-            else:
-                print(f"❌  {table_name}: write_pandas reported failure")
-                return False
+            profiler.record(table_name, rows=nrows, payload_bytes=payload_bytes, success=True)
+            print(f"✅  {table_name}: {nrows:,} rows loaded")
+            return True
                 
         except Exception as e:
+            profiler.record(table_name, success=False)
             print(f"❌  {table_name}: Error - {e}")
             return False
 
-def load_spotify_data():
+def load_spotify_data(profiler=None):
     """Load Spotify artists and tracks."""
     print("📡 Fetching Spotify data...")
     
@@ -119,48 +132,40 @@ def load_spotify_data():
     
     print(f"📊 Processing {len(top_artists)} artists and {len(top_tracks)} tracks")
     
-    # Process artists
-    artists_data = []
-    for a in top_artists:
-        artists_data.append({
-            'id': a.get('id'),
-            'name': a.get('name'),
-            'followers': a.get('followers', 0),
-            'popularity': a.get('popularity', 0),
-            'genres': json.dumps(a.get('genres', [])),
-            'json_data': json.dumps(a)
-        })
-    
-    artists_df = pd.DataFrame(artists_data)
-    
-    # Process tracks
-    tracks_data = []
-    for t in top_tracks:
-        # Get first artist ID safely
-        artist_id = None
-        if t.get('artists') and len(t['artists']) > 0:
-            artist_id = t['artists'][0].get('id')
-            
-        tracks_data.append({
-            'id': t.get('id'),
-            'name': t.get('name'),
-            'artist_id': artist_id,
-            'popularity': t.get('popularity', 0),
-            'duration_ms': t.get('duration_ms'),
-            'explicit': t.get('explicit', False),
-            'track_language': t.get('language', 'und'),
-            'json_data': json.dumps(t)
-        })
-    
-    tracks_df = pd.DataFrame(tracks_data)
+    # Collapse duplicate recordings (same ISRC, or same name + duration) before load
+    top_tracks, dedup_index = dedupe_tracks(top_tracks)
+    print(f"🧬 Dedup: {len(top_tracks)} unique recordings ({dedup_index.duplicates} duplicates collapsed)")
     
-    # Load to Snowflake - always overwrite artists and tracks
-    artists_ok = load_df_to_snowflake(artists_df, 'RAW_TOP_ARTISTS', truncate_first=True)
-    tracks_ok = load_df_to_snowflake(tracks_df, 'RAW_TOP_TRACKS', truncate_first=True)
+    # Project artists and tracks onto typed columns (see ingestion/payloads.py)
+    payload_mode = get_payload_mode()
+    print(f"🧾 Raw payload mode: {payload_mode}")
     
-    return artists_ok and tracks_ok
+    artists_df = apply_schema(pd.DataFrame([artist_to_row(a, payload_mode) for a in top_artists]), 'RAW_TOP_ARTISTS')
+    tracks_df = apply_schema(pd.DataFrame([track_to_row(t, payload_mode) for t in top_tracks]), 'RAW_TOP_TRACKS')
+    
+    # Tables created before the ISRC/album columns existed would silently drop them
+    with _get_conn() as wh:
+        ensure_track_columns(wh)
+
+    # Load to Snowflake - always overwrite artists and tracks
+    artists_ok = load_df_to_snowflake(artists_df, 'RAW_TOP_ARTISTS', truncate_first=True, profiler=profiler)
+    tracks_ok = load_df_to_snowflake(tracks_df, 'RAW_TOP_TRACKS', truncate_first=True, profiler=profiler)
+    
+    # Alias map lets plays that reference a duplicate ID resolve to the canonical track
+    aliases_df = pd.DataFrame(dedup_index.alias_rows())
+    aliases_ok = load_df_to_snowflake(aliases_df, ALIAS_TABLE, truncate_first=True, profiler=profiler,
+                                      create_if_missing=True)
+    
+    # Archive mode keeps the full payloads compressed, out of the hot tables
+    archive_ok = True
+    if payload_mode == "archive":
+        archive_df = pd.DataFrame(archive_rows('artist', top_artists) + archive_rows('track', top_tracks))
+        archive_ok = load_df_to_snowflake(archive_df, ARCHIVE_TABLE, truncate_first=True, profiler=profiler,
+                                          create_if_missing=True)
+    
+    return artists_ok and tracks_ok and aliases_ok and archive_ok
 
-def load_listening_history():
+def load_listening_history(profiler=None):
     """Generate and load fake listening history."""
     print("🎭 Generating fake listening history...")
     
@@ -175,7 +180,7 @@ def load_listening_history():
             return False
         
         # Load to Snowflake - append mode (no truncate)
-        return load_df_to_snowflake(plays_df, 'RAW_LISTENING_HISTORY', truncate_first=False)
+        return load_df_to_snowflake(plays_df, 'RAW_LISTENING_HISTORY', truncate_first=False, profiler=profiler)
         
     except ImportError as e:
         print(f"❌ Could not import fake_listening_history: {e}")
@@ -189,12 +194,13 @@ def main(include_listening_history=True):
     print("🎵 Starting Spotify data pipeline...")
     
     results = {}
+    profiler = LoadProfiler()
     
     # Load Spotify data first
-    results['spotify'] = load_spotify_data()
+    results['spotify'] = load_spotify_data(profiler=profiler)
     
     if include_listening_history and results['spotify']:
-        results['listening'] = load_listening_history()
+        results['listening'] = load_listening_history(profiler=profiler)
     elif include_listening_history:
         print("⚠️ Skipping listening history (Spotify data load failed)")
         results['listening'] = False
@@ -209,6 +215,14 @@ def main(include_listening_history=True):
         status = "✅" if success else "❌"
         print(f"  {status} {dataset.title()}: {'Success' if success else 'Failed'}")
     
+    print(f"⏱️  Timings:")
+    for line in profiler.summary_lines():
+        print(f"  {line}")
+    report_path = profiler.write_report()
+    print(f"📝 Run report written to {report_path}")
+    if profiler.push():
+        print(f"📤 Run report pushed to {os.getenv('LOAD_METRICS_ENDPOINT')}")
+    
     if success_count == total_count:
         print("\n🎉 All data loaded successfully!")
     else:
@@ -0,0 +1,150 @@
+"""
+ingestion/payloads.py
+────────────────────────────────────────────────────────
+Projection of raw Spotify artist/track objects into the
+RAW_TOP_ARTISTS / RAW_TOP_TRACKS row layout.
+
+RAW_PAYLOAD_MODE controls what happens to the original JSON:
+  • full    – JSON_DATA holds json.dumps of the whole object (legacy)
+  • slim    – JSON_DATA holds only the fields that are not already
+              typed columns, minus heavy arrays such as
+              available_markets and images (default)
+  • archive – JSON_DATA is left empty and the full object is stored
+              zlib-compressed in RAW_PAYLOAD_ARCHIVE, to be fetched
+              lazily with fetch_archived_payloads()
+"""
+
+import json
+import os
+import zlib
+from typing import Dict, Iterable, List, Optional
+
+PAYLOAD_MODES = ("full", "slim", "archive")
+DEFAULT_PAYLOAD_MODE = "slim"
+ARCHIVE_TABLE = "RAW_PAYLOAD_ARCHIVE"
+
+# Large, unused arrays/blobs that dominate the size of a Spotify object
+HEAVY_FIELDS = {"available_markets", "images", "preview_url", "external_urls", "href", "uri"}
+
+# Fields that already live in typed columns and need not be repeated in JSON_DATA
+ARTIST_COLUMNS_FROM = {"id", "name", "followers", "popularity", "genres"}
+TRACK_COLUMNS_FROM = {"id", "name", "artists", "popularity", "duration_ms", "explicit", "language",
+                      "external_ids", "album", "track_number", "disc_number"}
+
+# Typed RAW_TOP_TRACKS columns added after the table was first created (name → SQL type)
+TRACK_DETAIL_COLUMNS = {
+    "ISRC": "VARCHAR",
+    "ALBUM_ID": "VARCHAR",
+    "ALBUM_RELEASE_DATE": "VARCHAR",
+    "TRACK_NUMBER": "INTEGER",
+}
+
+
+def get_payload_mode(mode: Optional[str] = None) -> str:
+    mode = (mode or os.getenv("RAW_PAYLOAD_MODE", DEFAULT_PAYLOAD_MODE)).lower()
+    if mode not in PAYLOAD_MODES:
+        raise ValueError(f"Unknown RAW_PAYLOAD_MODE '{mode}'. Choose one of: {', '.join(PAYLOAD_MODES)}")
+    return mode
+
+
+def strip_heavy_fields(obj):
+    """Recursively drop HEAVY_FIELDS from a JSON-like object."""
+    if isinstance(obj, dict):
+        return {k: strip_heavy_fields(v) for k, v in obj.items() if k not in HEAVY_FIELDS}
+    if isinstance(obj, list):
+        return [strip_heavy_fields(v) for v in obj]
+    return obj
+
+
+def _json_data(obj: Dict, projected: set, mode: str) -> Optional[str]:
+    if mode == "full":
+        return json.dumps(obj)
+    if mode == "archive":
+        return None
+    rest = strip_heavy_fields({k: v for k, v in obj.items() if k not in projected})
+    return json.dumps(rest) if rest else None
+
+
+def _followers(a: Dict) -> int:
+    followers = a.get('followers', 0)
+    # The search API nests the count ({"total": n}); crawl.py already flattens it
+    return followers.get('total', 0) if isinstance(followers, dict) else followers
+
+
+def artist_to_row(a: Dict, mode: Optional[str] = None) -> Dict:
+    """Project a Spotify artist object onto the RAW_TOP_ARTISTS columns."""
+    mode = get_payload_mode(mode)
+    return {
+        'id': a.get('id'),
+        'name': a.get('name'),
+        'followers': _followers(a),
+        'popularity': a.get('popularity', 0),
+        'genres': json.dumps(a.get('genres', [])),
+        'json_data': _json_data(a, ARTIST_COLUMNS_FROM, mode),
+    }
+
+
+def track_to_row(t: Dict, mode: Optional[str] = None) -> Dict:
+    """Project a Spotify track object onto the RAW_TOP_TRACKS columns."""
+    mode = get_payload_mode(mode)
+
+    # Get first artist ID safely
+    artist_id = None
+    if t.get('artists') and len(t['artists']) > 0:
+        artist_id = t['artists'][0].get('id')
+
+    album = t.get('album') or {}
+    return {
+        'id': t.get('id'),
+        'name': t.get('name'),
+        'artist_id': artist_id,
+        'popularity': t.get('popularity', 0),
+        'duration_ms': t.get('duration_ms'),
+        'explicit': t.get('explicit', False),
+        'track_language': t.get('language', 'und'),
+        'isrc': (t.get('external_ids') or {}).get('isrc'),
+        'album_id': album.get('id'),
+        'album_release_date': album.get('release_date'),
+        'track_number': t.get('track_number'),
+        'json_data': _json_data(t, TRACK_COLUMNS_FROM, mode),
+    }
+
+
+def ensure_track_columns(wh, table_name: str = "RAW_TOP_TRACKS"):
+    """Add TRACK_DETAIL_COLUMNS to an existing tracks table (new tables get them from the first batch)."""
+    db, schema = wh.current_context()
+    full_table_name = f"{db}.{schema}.{table_name}"
+    if wh.table_exists(full_table_name):
+        wh.add_columns(full_table_name, TRACK_DETAIL_COLUMNS)
+
+
+def compress_payload(obj: Dict) -> bytes:
+    return zlib.compress(json.dumps(obj, separators=(",", ":")).encode("utf-8"), 6)
+
+
+def decompress_payload(blob: bytes) -> Dict:
+    return json.loads(zlib.decompress(blob).decode("utf-8"))
+
+
+def archive_rows(entity: str, objects: Iterable[Dict]) -> List[Dict]:
+    """Build RAW_PAYLOAD_ARCHIVE rows (entity, id, compressed payload)."""
+    return [
+        {'entity': entity, 'id': obj.get('id'), 'payload_zlib': compress_payload(obj)}
+        for obj in objects
+        if obj.get('id')
+    ]
+
+
+def fetch_archived_payloads(wh, entity: str, ids: Iterable[str], chunk_size: int = 1000) -> Dict[str, Dict]:
+    """Lazily load and decompress archived payloads for the given IDs."""
+    ids = [i for i in dict.fromkeys(ids) if i]
+    payloads = {}
+    for start in range(0, len(ids), chunk_size):
+        chunk = ids[start:start + chunk_size]
+        placeholders = ", ".join([wh.placeholder] * len(chunk))
+        rows = wh.query(
+            f"SELECT ID, PAYLOAD_ZLIB FROM {ARCHIVE_TABLE} WHERE ENTITY = {wh.placeholder} AND ID IN ({placeholders})",
+            (entity, *chunk),
+        )
+        payloads.update({row['ID']: decompress_payload(bytes(row['PAYLOAD_ZLIB'])) for row in rows})
+    return payloads
@@ -0,0 +1,134 @@
+"""
+ingestion/schemas.py
+────────────────────────────────────────────────────────
+Central dtype registry for the raw tables.
+
+Every DataFrame on its way into the warehouse (generator,
+crawler flattening, loaders) goes through apply_schema so
+low-cardinality strings become categoricals, IDs become
+Arrow-backed strings, counters become int32 and timestamps
+are real datetime64 values instead of formatted strings.
+"""
+
+from typing import Dict, List, Tuple
+
+import pandas as pd
+
+ARROW_STRING = "string[pyarrow]"
+TIMESTAMP = "datetime64[ns]"
+
+RAW_SCHEMAS: Dict[str, Dict[str, str]] = {
+    "RAW_TOP_ARTISTS": {
+        "id": ARROW_STRING,
+        "name": ARROW_STRING,
+        "followers": "int64",
+        "popularity": "int32",
+        "genres": ARROW_STRING,
+        "json_data": ARROW_STRING,
+        "ingested_at": TIMESTAMP,
+    },
+    "RAW_TOP_TRACKS": {
+        "id": ARROW_STRING,
+        "name": ARROW_STRING,
+        "artist_id": ARROW_STRING,
+        "popularity": "int32",
+        "duration_ms": "Int32",
+        "explicit": "bool",
+        "track_language": "category",
+        "isrc": ARROW_STRING,
+        "album_id": ARROW_STRING,
+        "album_release_date": ARROW_STRING,
+        "track_number": "Int32",
+        "json_data": ARROW_STRING,
+        "ingested_at": TIMESTAMP,
+    },
+    "RAW_TRACK_ALIASES": {
+        "alias_id": ARROW_STRING,
+        "canonical_id": ARROW_STRING,
+        "dedup_key": ARROW_STRING,
+        "ingested_at": TIMESTAMP,
+    },
+    "RAW_PAYLOAD_ARCHIVE": {
+        "entity": "category",
+        "id": ARROW_STRING,
+        "ingested_at": TIMESTAMP,
+    },
+    "RAW_LISTENING_HISTORY": {
+        "play_id": ARROW_STRING,
+        "user_id": "category",
+        "track_id": ARROW_STRING,
+        "artist_id": ARROW_STRING,
+        "play_ts": TIMESTAMP,
+        "track_language": "category",
+        "device": "category",
+        "play_duration_seconds": "int32",
+        "skipped": "bool",
+        # Filled in-stream by kafka/enrichment.py
+        "track_name": ARROW_STRING,
+        "track_popularity": "Int32",
+        "duration_seconds": "Float64",
+        "artist_name": ARROW_STRING,
+        "artist_popularity": "Int32",
+        "artist_genres": ARROW_STRING,
+        "ingested_at": TIMESTAMP,
+    },
+    # Windowed play metrics emitted by kafka/aggregator.py
+    "RAW_PLAY_WINDOWS": {
+        "agg_id": ARROW_STRING,
+        "window_name": "category",
+        "window_start": TIMESTAMP,
+        "window_end": TIMESTAMP,
+        "dimension": "category",
+        "dim_key": ARROW_STRING,
+        "plays": "int32",
+        "skips": "int32",
+        "listen_seconds": "int64",
+        "avg_listen_seconds": "float64",
+        "listeners": "int32",
+        "ingested_at": TIMESTAMP,
+    },
+}
+
+
+def get_schema(table_name: str) -> Dict[str, str]:
+    """Return the column → dtype mapping for a raw table (empty if unregistered)."""
+    return RAW_SCHEMAS.get(table_name.upper(), {})
+
+
+def apply_schema(df: pd.DataFrame, table_name: str) -> pd.DataFrame:
+    """
+    Cast the columns of `df` that are registered for `table_name`.
+
+    Column matching is case-insensitive so frames can be cast before or
+    after the loader upper-cases their names. Unregistered columns are
+    left untouched.
+    """
+    schema = get_schema(table_name)
+    if not schema or df.empty:
+        return df
+
+    df = df.copy(deep=False)
+    casts = {}
+    for col in df.columns:
+        dtype = schema.get(col.lower())
+        if dtype is None or str(df[col].dtype) == dtype:
+            continue
+        if dtype == TIMESTAMP:
+            df[col] = pd.to_datetime(df[col])
+        else:
+            casts[col] = dtype
+    return df.astype(casts) if casts else df
+
+
+def csv_read_options(table_name: str, columns=None) -> Tuple[Dict[str, str], List[str]]:
+    """
+    Return (dtype, parse_dates) arguments for pd.read_csv of a raw table,
+    limited to `columns` (the file header) when given.
+    """
+    schema = get_schema(table_name)
+    if columns is not None:
+        present = {c.lower() for c in columns}
+        schema = {col: dtype for col, dtype in schema.items() if col in present}
+    dtypes = {col: dtype for col, dtype in schema.items() if dtype != TIMESTAMP}
+    parse_dates = [col for col, dtype in schema.items() if dtype == TIMESTAMP]
+    return dtypes, parse_dates
@@ -0,0 +1,133 @@
+# ingestion/tests/test_dbt_profiler.py
+"""
+Tests for the dbt run profiler (history, critical path, regressions)
+"""
+
+import unittest
+from ..dbt_profiler import RunHistory, critical_path, node_rows, run_row
+
+MANIFEST = {
+    "nodes": {
+        "model.spotify.stg_plays": {"name": "stg_plays", "resource_type": "model", "config": {"materialized": "view"},
+                                    "depends_on": {"nodes": []}},
+        "model.spotify.stg_tracks": {"name": "stg_tracks", "resource_type": "model",
+                                     "config": {"materialized": "view"}, "depends_on": {"nodes": []}},
+        # Ephemeral: compiled into its children, never in run_results
+        "model.spotify.int_tracks": {"name": "int_tracks", "resource_type": "model",
+                                     "config": {"materialized": "ephemeral"},
+                                     "depends_on": {"nodes": ["model.spotify.stg_tracks"]}},
+        "model.spotify.int_enriched": {"name": "int_enriched", "resource_type": "model",
+                                       "config": {"materialized": "incremental"},
+                                       "depends_on": {"nodes": ["model.spotify.stg_plays"]}},
+        "model.spotify.mart_daily": {"name": "mart_daily", "resource_type": "model",
+                                     "config": {"materialized": "incremental"},
+                                     "depends_on": {"nodes": ["model.spotify.int_enriched",
+                                                              "model.spotify.int_tracks"]}},
+        "model.spotify.mart_top": {"name": "mart_top", "resource_type": "model", "config": {"materialized": "table"},
+                                   "depends_on": {"nodes": ["model.spotify.int_tracks"]}},
+    }
+}
+
+
+def run_results(invocation_id, generated_at, times, full_refresh=False):
+    return {
+        "metadata": {"invocation_id": invocation_id, "generated_at": generated_at, "dbt_version": "1.10.0"},
+        "args": {"which": "build", "full_refresh": full_refresh},
+        "elapsed_time": sum(times.values()),
+        "results": [
+            {
+                "unique_id": f"model.spotify.{name}",
+                "status": "success",
+                "execution_time": sec,
+                "thread_id": "Thread-1",
+                "timing": [
+                    {"name": "compile", "started_at": "2024-05-01T12:00:00Z", "completed_at": "2024-05-01T12:00:01Z"},
+                    {"name": "execute", "started_at": "2024-05-01T12:00:01Z", "completed_at": "2024-05-01T12:00:04Z"},
+                ],
+                "adapter_response": {"_message": "SUCCESS 10", "rows_affected": 10, "query_id": f"q-{name}"},
+            }
+            for name, sec in times.items()
+        ],
+    }
+
+
+TIMES = {"stg_plays": 0.5, "stg_tracks": 9.0, "int_enriched": 5.0, "mart_daily": 4.0, "mart_top": 1.0}
+
+
+class TestCriticalPath(unittest.TestCase):
+    """Test cases for the critical path through the DAG"""
+
+    def test_longest_chain_through_ephemeral(self):
+        """The chain walks through ephemeral nodes and picks the slowest ancestors"""
+        rows = node_rows(run_results("a", "2024-05-01T12:00:00Z", TIMES), MANIFEST)
+        path = critical_path(rows, MANIFEST)
+        self.assertEqual([uid for uid, _ in path], ["model.spotify.stg_tracks", "model.spotify.mart_daily"])
+        self.assertAlmostEqual(sum(sec for _, sec in path), 13.0)
+
+    def test_empty_run(self):
+        """A run without results has no critical path"""
+        self.assertEqual(critical_path([], MANIFEST), [])
+
+
+class TestNodeRows(unittest.TestCase):
+    """Test cases for parsing run_results.json"""
+
+    def test_fields(self):
+        """Timings, adapter response and manifest config land on each row"""
+        rows = node_rows(run_results("a", "2024-05-01T12:00:00Z", TIMES), MANIFEST)
+        row = next(r for r in rows if r["name"] == "mart_daily")
+        self.assertEqual(row["materialized"], "incremental")
+        self.assertEqual(row["compile_sec"], 1.0)
+        self.assertEqual(row["execute_sec"], 3.0)
+        self.assertEqual(row["rows_affected"], 10)
+        self.assertIsNone(row["bytes_scanned"])
+        self.assertEqual(row["query_id"], "q-mart_daily")
+
+
+class TestRunHistory(unittest.TestCase):
+    """Test cases for RunHistory"""
+
+    def setUp(self):
+        self.history = RunHistory(path=":memory:")
+
+    def tearDown(self):
+        self.history.close()
+
+    def record(self, invocation_id, generated_at, times, full_refresh=False):
+        results = run_results(invocation_id, generated_at, times, full_refresh)
+        rows = node_rows(results, MANIFEST)
+        run = run_row(results, rows, critical_path(rows, MANIFEST))
+        self.history.record(run, rows)
+        return run, rows
+
+    def test_record_is_idempotent(self):
+        """Recording the same invocation twice replaces it"""
+        for _ in range(2):
+            self.record("a", "2024-05-01T12:00:00Z", TIMES)
+        self.assertEqual(self.history.wh.query("SELECT COUNT(*) AS n FROM DBT_NODE_RUNS"), [{"N": len(TIMES)}])
+        self.assertEqual(len(self.history.trend("mart_daily")), 1)
+
+    def test_regression_over_trailing_median(self):
+        """Only the node that grew past the threshold is flagged"""
+        for day in range(1, 5):
+            self.record(f"run-{day}", f"2024-05-0{day}T12:00:00Z", TIMES)
+        run, rows = self.record("run-5", "2024-05-05T12:00:00Z", {**TIMES, "int_enriched": 9.0, "mart_daily": 5.0})
+
+        flagged = self.history.regressions(run, rows, threshold=0.5)
+        self.assertEqual([f["name"] for f in flagged], ["int_enriched"])
+        self.assertEqual(flagged[0]["median_sec"], 5.0)
+        self.assertEqual(flagged[0]["history_runs"], 4)
+
+    def test_needs_history_and_same_mode(self):
+        """Full refreshes are not compared with incremental runs, and new nodes are not flagged"""
+        for day in range(1, 5):
+            self.record(f"run-{day}", f"2024-05-0{day}T12:00:00Z", TIMES)
+        run, rows = self.record("full", "2024-05-05T12:00:00Z", {**TIMES, "int_enriched": 50.0}, full_refresh=True)
+        self.assertEqual(self.history.regressions(run, rows), [])
+
+        run, rows = self.record("run-6", "2024-05-06T12:00:00Z", {**TIMES, "int_enriched": 50.0})
+        self.assertEqual(self.history.regressions(run, rows, min_history=5), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,53 @@
+# ingestion/tests/test_dedup.py
+"""
+Tests for ISRC-keyed track deduplication
+"""
+
+import unittest
+from ..dedup import TrackDedupIndex, dedup_key, dedupe_tracks, normalize_title
+
+
+def _track(track_id, name="Song", isrc=None, duration_ms=200000, popularity=50):
+    track = {"id": track_id, "name": name, "duration_ms": duration_ms, "popularity": popularity}
+    if isrc:
+        track["external_ids"] = {"isrc": isrc}
+    return track
+
+
+class TestTrackDedupIndex(unittest.TestCase):
+    """Test cases for TrackDedupIndex"""
+
+    def test_normalize_title(self):
+        self.assertEqual(normalize_title("Señorita (feat. Someone)"), "senorita")
+        self.assertEqual(normalize_title("Song - Remastered 2011"), "song")
+        self.assertEqual(normalize_title(None), "")
+
+    def test_isrc_key_wins_over_name(self):
+        """Tracks sharing an ISRC collapse even with different titles"""
+        a = _track("a", name="Song", isrc="usum1", popularity=40)
+        b = _track("b", name="Song (Single Version)", isrc="USUM1", popularity=80)
+        tracks, index = dedupe_tracks([a, b])
+        self.assertEqual(len(tracks), 1)
+        self.assertEqual(tracks[0]["id"], "b")  # most popular copy is canonical
+        self.assertEqual(index.alias_map(), {"a": "b", "b": "b"})
+        self.assertEqual(index.duplicates, 1)
+
+    def test_fallback_name_duration_key(self):
+        """Without ISRC, normalized name + rounded duration is the key"""
+        a = _track("a", name="Song (feat. X)", duration_ms=200200)
+        b = _track("b", name="song", duration_ms=199900)
+        c = _track("c", name="song", duration_ms=250000)
+        self.assertEqual(dedup_key(a), dedup_key(b))
+        self.assertNotEqual(dedup_key(a), dedup_key(c))
+        self.assertEqual(len(TrackDedupIndex().add_all([a, b, c])), 2)
+
+    def test_same_id_repeated(self):
+        """A track listed under several artists is stored once"""
+        index = TrackDedupIndex().add_all([_track("a", isrc="X"), _track("a", isrc="X")])
+        self.assertEqual(len(index.tracks()), 1)
+        self.assertEqual(len(index.alias_rows()), 1)
+        self.assertEqual(index.canonical_id("a"), "a")
+
+
+if __name__ == "__main__":
+    unittest.main()
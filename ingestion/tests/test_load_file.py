@@ -0,0 +1,94 @@
+# ingestion/tests/test_load_file.py
+"""
+Tests for the chunked CSV/Parquet file loader
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from ..load_file import iter_file_chunks, load_file_to_warehouse
+from ..schemas import csv_read_options
+from ..warehouse import DuckDBWarehouse
+
+
+class TestLoadFile(unittest.TestCase):
+    """Test cases for iter_file_chunks / load_file_to_warehouse"""
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.db_path = os.path.join(self.test_dir, "warehouse.duckdb")
+        self.plays = pd.DataFrame({
+            "play_id": [f"p{i}" for i in range(25)],
+            "user_id": ["xp"] * 25,
+            "track_id": [f"t{i % 4}" for i in range(25)],
+            "play_ts": pd.date_range("2025-01-01", periods=25, freq="h").astype(str),
+            "device": ["Mobile", "Web"] * 12 + ["Mobile"],
+            "play_duration_seconds": list(range(25)),
+            "skipped": [i % 3 == 0 for i in range(25)],
+        })
+        self.csv_path = os.path.join(self.test_dir, "plays.csv")
+        self.plays.to_csv(self.csv_path, index=False)
+        self.env = mock.patch.dict(os.environ, {"WAREHOUSE_BACKEND": "duckdb", "DUCKDB_PATH": self.db_path})
+        self.env.start()
+
+    def tearDown(self):
+        self.env.stop()
+        shutil.rmtree(self.test_dir)
+
+    def test_csv_chunks_use_registry_dtypes(self):
+        """CSV chunks are at most chunk_size rows and typed from the schema registry"""
+        dtypes, parse_dates = csv_read_options("RAW_LISTENING_HISTORY", self.plays.columns)
+        chunks = list(iter_file_chunks(self.csv_path, 10, dtypes, parse_dates))
+
+        self.assertEqual([c.num_rows for c in chunks], [10, 10, 5])
+        schema = chunks[0].schema
+        self.assertEqual(schema.field("play_duration_seconds").type, pa.int32())
+        self.assertEqual(schema.field("skipped").type, pa.bool_())
+        self.assertTrue(pa.types.is_timestamp(schema.field("play_ts").type))
+        self.assertTrue(pa.types.is_dictionary(schema.field("device").type))
+
+    def test_parquet_iter_batches(self):
+        """Parquet files are streamed batch by batch"""
+        path = os.path.join(self.test_dir, "plays.parquet")
+        pq.write_table(pa.Table.from_pandas(self.plays, preserve_index=False), path)
+        chunks = list(iter_file_chunks(path, 10))
+        self.assertEqual([c.num_rows for c in chunks], [10, 10, 5])
+        self.assertEqual(chunks[0].column_names, list(self.plays.columns))
+
+    def test_unsupported_extension(self):
+        """Only .csv and .parquet are accepted"""
+        with self.assertRaises(ValueError):
+            list(iter_file_chunks(os.path.join(self.test_dir, "plays.json")))
+
+    def test_load_reports_rows_and_chunks(self):
+        """Every row lands in the table, stamped with INGESTED_AT, and the stats add up"""
+        stats = load_file_to_warehouse(self.csv_path, "RAW_LISTENING_HISTORY", chunk_size=10)
+
+        self.assertEqual(stats["rows"], 25)
+        self.assertEqual(stats["chunks"], 3)
+        self.assertEqual(stats["table"], "RAW_LISTENING_HISTORY")
+        self.assertGreater(stats["phases_sec"]["upload"], 0)
+        for key in ("seconds", "rows_per_sec", "peak_rss_mb"):
+            self.assertIn(key, stats)
+
+        with DuckDBWarehouse(path=self.db_path) as wh:
+            rows = wh.query("SELECT COUNT(*) AS n, COUNT(DISTINCT ingested_at) AS stamps FROM RAW_LISTENING_HISTORY")
+        self.assertEqual(rows, [{"N": 25, "STAMPS": 1}])
+
+    def test_truncate_first(self):
+        """A truncating reload replaces the table instead of appending"""
+        load_file_to_warehouse(self.csv_path, "RAW_LISTENING_HISTORY", chunk_size=10)
+        load_file_to_warehouse(self.csv_path, "RAW_LISTENING_HISTORY", chunk_size=10, truncate_first=True)
+        with DuckDBWarehouse(path=self.db_path) as wh:
+            self.assertEqual(wh.query("SELECT COUNT(*) AS n FROM RAW_LISTENING_HISTORY"), [{"N": 25}])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,124 @@
+# ingestion/tests/test_payloads.py
+"""
+Tests for the raw payload projection and the compressed archive
+"""
+
+import json
+import unittest
+import pandas as pd
+from ..payloads import (ARCHIVE_TABLE, TRACK_DETAIL_COLUMNS, archive_rows, artist_to_row, ensure_track_columns,
+                        fetch_archived_payloads, get_payload_mode, track_to_row)
+from ..warehouse import DuckDBWarehouse
+
+ARTIST = {
+    "id": "a1",
+    "name": "Artist One",
+    "followers": {"total": 1200},
+    "popularity": 70,
+    "genres": ["indie pop", "dream pop"],
+    "images": [{"url": "https://img/1.jpg"}],
+    "type": "artist",
+}
+
+TRACK = {
+    "id": "t1",
+    "name": "Song One",
+    "artists": [{"id": "a1", "name": "Artist One"}, {"id": "a2", "name": "Featured"}],
+    "popularity": 55,
+    "duration_ms": 201000,
+    "explicit": True,
+    "language": "en",
+    "external_ids": {"isrc": "USABC2400001"},
+    "album": {"id": "al1", "release_date": "2024-03-01", "images": [{"url": "https://img/al1.jpg"}],
+              "album_type": "single"},
+    "track_number": 3,
+    "disc_number": 1,
+    "available_markets": ["US", "GB"],
+    "is_local": False,
+}
+
+
+class TestRowProjection(unittest.TestCase):
+    """Test cases for artist_to_row / track_to_row in each payload mode"""
+
+    def test_artist_columns(self):
+        """Typed columns are the same in every mode; nested follower counts are flattened"""
+        for mode in ("full", "slim", "archive"):
+            row = artist_to_row(ARTIST, mode)
+            self.assertEqual(row["followers"], 1200)
+            self.assertEqual(json.loads(row["genres"]), ["indie pop", "dream pop"])
+            self.assertEqual((row["id"], row["name"], row["popularity"]), ("a1", "Artist One", 70))
+
+    def test_track_columns(self):
+        """Tracks carry the primary artist and the ISRC/album details as typed columns"""
+        row = track_to_row(TRACK, "slim")
+        self.assertEqual(row["artist_id"], "a1")
+        self.assertEqual(row["isrc"], "USABC2400001")
+        self.assertEqual((row["album_id"], row["album_release_date"]), ("al1", "2024-03-01"))
+        self.assertEqual(row["track_number"], 3)
+        self.assertEqual(row["track_language"], "en")
+        self.assertEqual(set(TRACK_DETAIL_COLUMNS), {"ISRC", "ALBUM_ID", "ALBUM_RELEASE_DATE", "TRACK_NUMBER"})
+
+    def test_full_mode_keeps_everything(self):
+        """full: JSON_DATA is the whole object"""
+        self.assertEqual(json.loads(track_to_row(TRACK, "full")["json_data"]), TRACK)
+
+    def test_slim_mode_drops_typed_and_heavy_fields(self):
+        """slim: only untyped, light fields are left in JSON_DATA"""
+        self.assertEqual(json.loads(track_to_row(TRACK, "slim")["json_data"]), {"is_local": False})
+        self.assertEqual(json.loads(artist_to_row(ARTIST, "slim")["json_data"]), {"type": "artist"})
+
+    def test_archive_mode_leaves_json_empty(self):
+        """archive: JSON_DATA is empty, the payload goes to the archive table"""
+        self.assertIsNone(track_to_row(TRACK, "archive")["json_data"])
+        self.assertIsNone(artist_to_row(ARTIST, "archive")["json_data"])
+
+    def test_unknown_mode(self):
+        """An unknown RAW_PAYLOAD_MODE is rejected"""
+        with self.assertRaises(ValueError):
+            get_payload_mode("gzip")
+
+    def test_missing_artists(self):
+        """Tracks without artists still project"""
+        row = track_to_row({"id": "t2", "name": "Orphan"}, "slim")
+        self.assertIsNone(row["artist_id"])
+        self.assertIsNone(row["isrc"])
+
+
+class TestPayloadArchive(unittest.TestCase):
+    """Test cases for the compressed archive round-trip"""
+
+    def setUp(self):
+        self.wh = DuckDBWarehouse(path=":memory:", database="DBT_SPOTIFY", schema="RAW")
+        self.wh.connect()
+        rows = archive_rows("track", [TRACK, {"id": "t'2", "name": "Quote"}, {"name": "no id"}])
+        self.wh.write(pd.DataFrame(rows).rename(columns=str.upper), ARCHIVE_TABLE, create=True)
+
+    def tearDown(self):
+        self.wh.close()
+
+    def test_round_trip(self):
+        """Archived payloads decompress to the original objects; unknown IDs are skipped"""
+        payloads = fetch_archived_payloads(self.wh, "track", ["t1", "t'2", "missing", None])
+        self.assertEqual(payloads, {"t1": TRACK, "t'2": {"id": "t'2", "name": "Quote"}})
+
+    def test_entity_is_bound(self):
+        """The entity is a bound parameter, filtered exactly and never interpolated"""
+        self.assertEqual(fetch_archived_payloads(self.wh, "artist", ["t1"]), {})
+        self.assertEqual(fetch_archived_payloads(self.wh, "track' OR '1'='1", ["t1"]), {})
+
+    def test_chunked_lookup(self):
+        """Large ID lists are fetched in chunks"""
+        self.assertEqual(set(fetch_archived_payloads(self.wh, "track", ["t1", "x", "t'2"], chunk_size=1)),
+                         {"t1", "t'2"})
+
+    def test_ensure_track_columns(self):
+        """The ISRC/album columns are added to an existing tracks table"""
+        self.wh.write(pd.DataFrame({"ID": ["t1"], "NAME": ["Song One"]}), "RAW_TOP_TRACKS", create=True)
+        ensure_track_columns(self.wh)
+        columns = [c for c, _ in self.wh.describe_table("RAW_TOP_TRACKS")]
+        self.assertEqual(columns, ["ID", "NAME", *TRACK_DETAIL_COLUMNS])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,59 @@
+# ingestion/tests/test_profiling.py
+"""
+Tests for the load-pipeline profiler
+"""
+
+import json
+import os
+import shutil
+import unittest
+from ..profiling import LoadProfiler, PHASES
+
+
+class TestLoadProfiler(unittest.TestCase):
+    """Test cases for LoadProfiler"""
+
+    def setUp(self):
+        self.test_dir = "./test_reports"
+        self.profiler = LoadProfiler(run_name="test")
+
+    def tearDown(self):
+        if os.path.exists(self.test_dir):
+            shutil.rmtree(self.test_dir)
+
+    def test_phases_accumulate(self):
+        """Repeated phases add up and every phase is reported"""
+        for _ in range(2):
+            with self.profiler.phase("RAW_TOP_TRACKS", "upload"):
+                pass
+        self.profiler.record("RAW_TOP_TRACKS", rows=10, payload_bytes=100, success=True)
+
+        table = self.profiler.report()["tables"]["RAW_TOP_TRACKS"]
+        self.assertEqual(set(table["phases_sec"]), set(PHASES))
+        self.assertEqual(table["rows"], 10)
+        self.assertEqual(table["payload_bytes"], 100)
+        self.assertTrue(table["success"])
+
+    def test_failure_sticks(self):
+        """A failed batch marks the table as failed"""
+        self.profiler.record("RAW_TOP_TRACKS", rows=5, success=True)
+        self.profiler.record("RAW_TOP_TRACKS", success=False)
+        self.assertFalse(self.profiler.report()["tables"]["RAW_TOP_TRACKS"]["success"])
+
+    def test_write_report(self):
+        """Report is written as JSON"""
+        self.profiler.record("RAW_TOP_ARTISTS", rows=3)
+        path = self.profiler.write_report(f"{self.test_dir}/report.json")
+        with open(path) as f:
+            report = json.load(f)
+        self.assertEqual(report["total_rows"], 3)
+        self.assertIn("RAW_TOP_ARTISTS", report["tables"])
+
+    def test_push_without_endpoint(self):
+        """Pushing is skipped when no endpoint is configured"""
+        os.environ.pop("LOAD_METRICS_ENDPOINT", None)
+        self.assertFalse(self.profiler.push())
+
+
+if __name__ == "__main__":
+    unittest.main()
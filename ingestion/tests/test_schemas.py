@@ -0,0 +1,52 @@
+# ingestion/tests/test_schemas.py
+"""
+Tests for the raw-table dtype registry
+"""
+
+import unittest
+import pandas as pd
+from ..schemas import apply_schema, csv_read_options
+
+
+class TestSchemaRegistry(unittest.TestCase):
+    """Test cases for apply_schema / csv_read_options"""
+
+    def setUp(self):
+        self.plays = pd.DataFrame({
+            "play_id": ["p1", "p2", "p3"],
+            "user_id": ["xp", "xp", "xp"],
+            "play_ts": ["2025-01-01 10:00:00", "2025-01-02 11:00:00", "2025-01-03 12:00:00"],
+            "device": ["Mobile", "Web", "Mobile"],
+            "play_duration_seconds": [30, 120, 300],
+            "skipped": [True, False, False],
+            "extra": ["kept", "as", "is"],
+        })
+
+    def test_apply_schema_casts_registered_columns(self):
+        """Registered columns get compact dtypes, others are untouched"""
+        df = apply_schema(self.plays, "RAW_LISTENING_HISTORY")
+        self.assertEqual(str(df["device"].dtype), "category")
+        self.assertEqual(str(df["play_duration_seconds"].dtype), "int32")
+        self.assertTrue(pd.api.types.is_datetime64_any_dtype(df["play_ts"]))
+        self.assertEqual(df["extra"].dtype, self.plays["extra"].dtype)
+        # Input frame is not modified
+        self.assertFalse(pd.api.types.is_datetime64_any_dtype(self.plays["play_ts"]))
+
+    def test_apply_schema_is_case_insensitive(self):
+        """Upper-cased (loader) column names are matched too"""
+        upper = self.plays.rename(columns=str.upper)
+        df = apply_schema(upper, "raw_listening_history")
+        self.assertEqual(str(df["USER_ID"].dtype), "category")
+
+    def test_unregistered_table_passthrough(self):
+        self.assertIs(apply_schema(self.plays, "SOMETHING_ELSE"), self.plays)
+
+    def test_csv_read_options_limited_to_header(self):
+        dtypes, parse_dates = csv_read_options("RAW_LISTENING_HISTORY", self.plays.columns)
+        self.assertEqual(parse_dates, ["play_ts"])
+        self.assertNotIn("ingested_at", dtypes)
+        self.assertEqual(dtypes["device"], "category")
+
+
+if __name__ == "__main__":
+    unittest.main()
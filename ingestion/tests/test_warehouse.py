@@ -0,0 +1,53 @@
+# ingestion/tests/test_warehouse.py
+"""
+Tests for the warehouse abstraction (embedded DuckDB backend)
+"""
+
+import unittest
+import pandas as pd
+from ..warehouse import DuckDBWarehouse, get_warehouse
+
+
+class TestDuckDBWarehouse(unittest.TestCase):
+    """Test cases for DuckDBWarehouse"""
+
+    def setUp(self):
+        """Open an in-memory warehouse"""
+        self.wh = DuckDBWarehouse(path=":memory:", database="DBT_SPOTIFY", schema="RAW")
+        self.wh.connect()
+        self.df = pd.DataFrame({"ID": ["a", "b"], "NAME": ["Song A", "Song B"], "POPULARITY": [10, 20]})
+
+    def tearDown(self):
+        self.wh.close()
+
+    def test_context_matches_snowflake_layout(self):
+        """Database and schema mirror the Snowflake names"""
+        self.assertEqual(self.wh.current_context(), ("DBT_SPOTIFY", "RAW"))
+
+    def test_write_creates_and_appends(self):
+        """First write creates the table, later writes append by name"""
+        self.assertEqual(self.wh.write(self.df, "RAW_TOP_TRACKS", create=True), 2)
+        self.wh.write(self.df[["NAME", "ID", "POPULARITY"]], "RAW_TOP_TRACKS")
+        rows = self.wh.query("SELECT COUNT(*) AS n FROM DBT_SPOTIFY.RAW.RAW_TOP_TRACKS")
+        self.assertEqual(rows, [{"N": 4}])
+
+    def test_describe_and_arrow(self):
+        """describe_table and query_arrow use upper-case column names"""
+        self.wh.write(self.df, "RAW_TOP_TRACKS", create=True)
+        self.assertEqual([c for c, _ in self.wh.describe_table("RAW_TOP_TRACKS")], ["ID", "NAME", "POPULARITY"])
+        table = self.wh.query_arrow("select id, popularity from RAW_TOP_TRACKS order by id")
+        self.assertEqual(table.column_names, ["ID", "POPULARITY"])
+        self.assertEqual(table.num_rows, 2)
+
+    def test_truncate(self):
+        self.wh.write(self.df, "RAW_TOP_TRACKS", create=True)
+        self.wh.truncate("RAW_TOP_TRACKS")
+        self.assertEqual(self.wh.query_df("SELECT * FROM RAW_TOP_TRACKS").shape[0], 0)
+
+    def test_unknown_backend(self):
+        with self.assertRaises(ValueError):
+            get_warehouse("postgres")
+
+
+if __name__ == "__main__":
+    unittest.main()
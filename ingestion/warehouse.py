@@ -0,0 +1,312 @@
+"""
+ingestion/warehouse.py
+────────────────────────────────────────────────────────
+Thin warehouse abstraction used by the loaders, the fake
+listening-history generator and the chatbot.
+
+Two backends are available:
+  • snowflake – the production warehouse (default)
+  • duckdb    – an embedded stand-in for offline runs and benchmarks
+
+The backend is picked with the WAREHOUSE_BACKEND env var.
+"""
+
+import os
+from typing import Any, Dict, List, Optional, Tuple
+
+import pandas as pd
+from dotenv import load_dotenv
+
+load_dotenv()
+
+DEFAULT_BACKEND = "snowflake"
+DEFAULT_DUCKDB_PATH = "data/warehouse.duckdb"
+
+
+class Warehouse:
+    """Common interface implemented by every backend."""
+
+    name = "base"
+    placeholder = "%s"  # DB-API paramstyle marker for bound parameters
+
+    def __init__(self):
+        self._conn = None
+
+    # ─── Connection handling ────────────────────────────────────────────────
+    def connect(self):
+        """Open the underlying connection (idempotent) and return it."""
+        raise NotImplementedError
+
+    @property
+    def connection(self):
+        return self.connect()
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def commit(self):
+        if self._conn is not None:
+            self._conn.commit()
+
+    def __enter__(self):
+        self.connect()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    # ─── Queries ────────────────────────────────────────────────────────────
+    def execute(self, sql: str, params: Optional[Tuple] = None):
+        """Run a statement and return the cursor it ran on."""
+        cursor = self.connection.cursor()
+        if params is None:
+            cursor.execute(sql)
+        else:
+            cursor.execute(sql, params)
+        return cursor
+
+    def query(self, sql: str, params: Optional[Tuple] = None) -> List[Dict[str, Any]]:
+        """Execute a query and return the rows as a list of dictionaries."""
+        cursor = self.execute(sql, params)
+        try:
+            columns = [self._column_name(desc[0]) for desc in cursor.description]
+            return [dict(zip(columns, row)) for row in cursor.fetchall()]
+        finally:
+            cursor.close()
+
+    def query_arrow(self, sql: str):
+        """Execute a query and return the result as a pyarrow Table."""
+        raise NotImplementedError
+
+    def _column_name(self, name: str) -> str:
+        return name
+
+    def query_df(self, sql: str):
+        """Execute a query and return the result as a pandas DataFrame."""
+        return self.query_arrow(sql).to_pandas()
+
+    def current_context(self) -> Tuple[str, str]:
+        """Return the (database, schema) the connection is pointed at."""
+        cursor = self.execute("SELECT CURRENT_DATABASE(), CURRENT_SCHEMA()")
+        try:
+            return tuple(cursor.fetchone())
+        finally:
+            cursor.close()
+
+    def describe_table(self, table_name: str) -> List[Tuple[str, str]]:
+        """Return (column_name, data_type) pairs in table order."""
+        raise NotImplementedError
+
+    def table_exists(self, table_name: str) -> bool:
+        try:
+            self.describe_table(table_name)
+            return True
+        except Exception:
+            return False
+
+    def ensure_table(self, table_name: str, data):
+        """
+        Create `table_name` from the schema of `data` if it does not exist.
+
+        Snowflake raw tables are managed with DDL outside this repo, so the
+        base implementation is a no-op.
+        """
+
+    def add_columns(self, table_name: str, columns: Dict[str, str]):
+        """Add the nullable `columns` (name → SQL type) that `table_name` does not have yet."""
+        existing = {name.upper() for name, _ in self.describe_table(table_name)}
+        for name, sql_type in columns.items():
+            if name.upper() not in existing:
+                self.execute(f"ALTER TABLE {table_name} ADD COLUMN {name} {sql_type}").close()
+
+    def truncate(self, table_name: str):
+        self.execute(f"TRUNCATE TABLE {table_name}").close()
+
+    def delete_keys(self, table_name: str, column: str, keys, chunk_size: int = 1000) -> None:
+        """Delete rows whose `column` is in `keys` (used for upsert-style loads)."""
+        keys = [str(k) for k in dict.fromkeys(keys) if k is not None]
+        for i in range(0, len(keys), chunk_size):
+            chunk = keys[i:i + chunk_size]
+            placeholders = ", ".join([self.placeholder] * len(chunk))
+            self.execute(f"DELETE FROM {table_name} WHERE {column} IN ({placeholders})", tuple(chunk)).close()
+
+    # ─── Bulk write ─────────────────────────────────────────────────────────
+    def write(self, data, table_name: str, create: bool = False) -> int:
+        """
+        Append a pandas DataFrame or pyarrow Table to `table_name`.
+
+        Column names must already match the table. When `create` is set the
+        table is created from the data's schema if it does not exist yet.
+        Returns the number of rows written.
+        """
+        raise NotImplementedError
+
+
+class SnowflakeWarehouse(Warehouse):
+    """Snowflake backend driven by the SNOWFLAKE_* env vars."""
+
+    name = "snowflake"
+
+    def __init__(self, **overrides):
+        super().__init__()
+        self.params = {
+            "user": os.getenv("SNOWFLAKE_USER"),
+            "password": os.getenv("SNOWFLAKE_PASSWORD"),
+            "account": os.getenv("SNOWFLAKE_ACCOUNT"),
+            "warehouse": os.getenv("SNOWFLAKE_WAREHOUSE"),
+            "database": os.getenv("SNOWFLAKE_DATABASE"),
+            "schema": os.getenv("SNOWFLAKE_SCHEMA", "RAW"),
+        }
+        self.params.update(overrides)
+
+    def connect(self):
+        if self._conn is None:
+            import snowflake.connector as sf
+
+            self._conn = sf.connect(**self.params)
+        return self._conn
+
+    def query_arrow(self, sql: str):
+        cursor = self.execute(sql)
+        try:
+            return cursor.fetch_arrow_all(force_return_table=True)
+        finally:
+            cursor.close()
+
+    def describe_table(self, table_name: str) -> List[Tuple[str, str]]:
+        cursor = self.execute(f"DESC TABLE {table_name}")
+        try:
+            return [(row[0], row[1]) for row in cursor.fetchall()]
+        finally:
+            cursor.close()
+
+    def write(self, data, table_name: str, create: bool = False) -> int:
+        from snowflake.connector.pandas_tools import write_pandas
+
+        df = data if isinstance(data, pd.DataFrame) else data.to_pandas()
+        success, _, nrows, _ = write_pandas(
+            self.connection,
+            df,
+            table_name=table_name,
+            quote_identifiers=False,
+            auto_create_table=create,
+            overwrite=False,
+            use_logical_type=True,  # keep datetime64 columns as real timestamps
+        )
+        if not success:
+            raise RuntimeError(f"write_pandas reported failure for {table_name}")
+        return nrows
+
+
+class DuckDBWarehouse(Warehouse):
+    """
+    Embedded DuckDB backend.
+
+    The database file is attached under the SNOWFLAKE_DATABASE name and the
+    SNOWFLAKE_SCHEMA schema is created inside it, so fully qualified names
+    such as DBT_SPOTIFY.RAW.MART_TOP_TRACKS resolve the same way they do in
+    Snowflake.
+    """
+
+    name = "duckdb"
+    placeholder = "?"
+
+    def __init__(self, path: Optional[str] = None, database: Optional[str] = None, schema: Optional[str] = None):
+        super().__init__()
+        self.path = path or os.getenv("DUCKDB_PATH", DEFAULT_DUCKDB_PATH)
+        self.database = database or os.getenv("SNOWFLAKE_DATABASE") or "DBT_SPOTIFY"
+        self.schema = schema or os.getenv("SNOWFLAKE_SCHEMA") or "RAW"
+
+    def connect(self):
+        if self._conn is None:
+            import duckdb
+
+            if self.path != ":memory:":
+                os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = duckdb.connect()
+            conn.execute(f"ATTACH '{self.path}' AS {self.database}")
+            conn.execute(f"CREATE SCHEMA IF NOT EXISTS {self.database}.{self.schema}")
+            conn.execute(f"USE {self.database}.{self.schema}")
+            self._conn = conn
+        return self._conn
+
+    def commit(self):
+        # DuckDB runs in auto-commit mode unless a transaction was opened.
+        pass
+
+    def _cursor(self):
+        # DuckDB cursors are separate connections that do not inherit USE.
+        cursor = self.connection.cursor()
+        cursor.execute(f"USE {self.database}.{self.schema}")
+        return cursor
+
+    def execute(self, sql: str, params: Optional[Tuple] = None):
+        cursor = self._cursor()
+        if params is None:
+            cursor.execute(sql)
+        else:
+            cursor.execute(sql, params)
+        return cursor
+
+    def _column_name(self, name: str) -> str:
+        # Match Snowflake, which folds unquoted identifiers to upper case.
+        return name.upper()
+
+    def query_arrow(self, sql: str):
+        cursor = self.execute(sql)
+        try:
+            table = cursor.fetch_arrow_table()
+        finally:
+            cursor.close()
+        return table.rename_columns([self._column_name(c) for c in table.column_names])
+
+    def describe_table(self, table_name: str) -> List[Tuple[str, str]]:
+        cursor = self.execute(f"DESCRIBE {table_name}")
+        try:
+            return [(row[0].upper(), row[1]) for row in cursor.fetchall()]
+        finally:
+            cursor.close()
+
+    def ensure_table(self, table_name: str, data):
+        # There is no out-of-band DDL for the embedded database, so raw
+        # tables are created from the first batch written to them.
+        cursor = self._cursor()
+        try:
+            cursor.register("_incoming", data)
+            # Categorical columns arrive as ENUMs; store them as plain VARCHAR
+            # so later batches with new categories can still be inserted.
+            columns = [
+                f'"{name}" {"VARCHAR" if dtype.startswith("ENUM") else dtype}'
+                for name, dtype, *_ in cursor.execute("DESCRIBE SELECT * FROM _incoming").fetchall()
+            ]
+            cursor.execute(f"CREATE TABLE IF NOT EXISTS {table_name} ({', '.join(columns)})")
+        finally:
+            cursor.close()
+
+    def write(self, data, table_name: str, create: bool = False) -> int:
+        if create:
+            self.ensure_table(table_name, data)
+        cursor = self._cursor()
+        try:
+            cursor.register("_incoming", data)
+            cursor.execute(f"INSERT INTO {table_name} BY NAME SELECT * FROM _incoming")
+        finally:
+            cursor.close()
+        return len(data)
+
+
+BACKENDS = {
+    SnowflakeWarehouse.name: SnowflakeWarehouse,
+    DuckDBWarehouse.name: DuckDBWarehouse,
+}
+
+
+def get_warehouse(backend: Optional[str] = None, **kwargs) -> Warehouse:
+    """Build the configured warehouse backend (WAREHOUSE_BACKEND env var)."""
+    backend = (backend or os.getenv("WAREHOUSE_BACKEND", DEFAULT_BACKEND)).lower()
+    try:
+        return BACKENDS[backend](**kwargs)
+    except KeyError:
+        raise ValueError(f"Unknown warehouse backend '{backend}'. Choose one of: {', '.join(BACKENDS)}")
@@ -0,0 +1,318 @@
+"""
+kafka/aggregator.py
+────────────────────────────────────────────────────────
+Stateful windowed aggregation of play events.
+
+Consumes spotify.plays.raw and keeps plays, skips, listen
+seconds and distinct listeners per track, artist and user in
+tumbling and sliding event-time windows. A window closes once
+the watermark (latest play_ts seen minus
+AGG_ALLOWED_LATENESS_SEC) passes its end; closed windows are
+emitted as compact rows to RAW_PLAY_WINDOWS, upserted on
+AGG_ID so a replayed window simply overwrites itself.
+
+Open window state, rows not yet written and the last processed
+offset per partition are checkpointed to AGG_CHECKPOINT_PATH.
+Kafka offsets are only committed after a checkpoint, and after
+a restart messages at or below the checkpointed offset are
+skipped. The state is per process: run a single aggregator per
+checkpoint file.
+
+Usage:
+  python -m kafka.aggregator
+"""
+
+import json
+import logging
+import os
+import tempfile
+import time
+from collections import defaultdict, namedtuple
+from typing import Dict, Iterable, List, Optional
+
+import pandas as pd
+from confluent_kafka import Consumer, TopicPartition
+from ingestion import load_to_snowflake
+from ingestion.load_to_snowflake import load_df_to_snowflake
+from kafka.codec import to_epoch_ms
+from kafka.consumer import KAFKA_CONFIG as CONSUMER_CONFIG, PLAYS_TOPIC, decode
+
+WINDOW_TABLE = "RAW_PLAY_WINDOWS"
+CHECKPOINT_PATH = os.getenv("AGG_CHECKPOINT_PATH", "data/checkpoints/play_windows.json")
+ALLOWED_LATENESS_SEC = int(os.getenv("AGG_ALLOWED_LATENESS_SEC", "60"))
+CHECKPOINT_INTERVAL_SEC = float(os.getenv("AGG_CHECKPOINT_SEC", "30"))
+
+KAFKA_CONFIG = {**CONSUMER_CONFIG, 'group.id': 'spotify-aggregator-group'}
+
+WindowSpec = namedtuple("WindowSpec", ["name", "size_sec", "slide_sec"])
+
+DEFAULT_WINDOWS = (
+    WindowSpec("1m", 60, 60),            # tumbling
+    WindowSpec("1h", 3600, 3600),        # tumbling
+    WindowSpec("15m_by_1m", 900, 60),    # sliding: last 15 minutes, every minute
+)
+
+# dimension → event field holding its key
+DIMENSIONS = {"track": "track_id", "artist": "artist_id", "user": "user_id"}
+
+
+def window_starts(spec: WindowSpec, ts: int) -> Iterable[int]:
+    """Start (epoch seconds) of every window of `spec` that contains `ts`."""
+    start = ts - ts % spec.slide_sec
+    while start > ts - spec.size_sec:
+        yield start
+        start -= spec.slide_sec
+
+
+class WindowedAggregator:
+    """
+    In-memory window state keyed by (window, start, dimension, key).
+
+    Each entry holds [plays, skips, listen_seconds, set of user IDs].
+    Entries are also indexed by window end so closing windows does not
+    scan the whole state.
+    """
+
+    def __init__(self, windows=DEFAULT_WINDOWS, dimensions=DIMENSIONS, allowed_lateness_sec=ALLOWED_LATENESS_SEC):
+        self.windows = {spec.name: spec for spec in windows}
+        self.dimensions = dimensions
+        self.allowed_lateness_sec = allowed_lateness_sec
+        self.state: Dict[tuple, list] = {}
+        self._by_end: Dict[int, set] = defaultdict(set)
+        self.max_event_sec: Optional[int] = None
+        self.events = 0
+        self.late_events = 0
+
+    def __len__(self):
+        return len(self.state)
+
+    @property
+    def watermark(self) -> Optional[int]:
+        return None if self.max_event_sec is None else self.max_event_sec - self.allowed_lateness_sec
+
+    def add(self, event: Dict) -> bool:
+        """Fold one play event into every open window it falls in; False if it was too late."""
+        if event.get("play_ts") is None:
+            return False
+        ts = to_epoch_ms(event["play_ts"]) // 1000
+        watermark = self.watermark
+        skipped = bool(event.get("skipped"))
+        listened = int(event.get("play_duration_seconds") or 0)
+        user = event.get("user_id")
+
+        accepted = False
+        for spec in self.windows.values():
+            for start in window_starts(spec, ts):
+                end = start + spec.size_sec
+                if watermark is not None and end <= watermark:
+                    continue  # already emitted
+                accepted = True
+                for dim, field in self.dimensions.items():
+                    key = event.get(field)
+                    if key is None:
+                        continue
+                    state_key = (spec.name, start, dim, key)
+                    acc = self.state.get(state_key)
+                    if acc is None:
+                        acc = self.state[state_key] = [0, 0, 0, set()]
+                        self._by_end[end].add(state_key)
+                    acc[0] += 1
+                    acc[1] += skipped
+                    acc[2] += listened
+                    if user is not None:
+                        acc[3].add(user)
+
+        if not accepted:
+            self.late_events += 1
+            return False
+        self.events += 1
+        self.max_event_sec = ts if self.max_event_sec is None else max(self.max_event_sec, ts)
+        return True
+
+    def close_due(self, force: bool = False) -> List[Dict]:
+        """Remove and return rows for windows that ended before the watermark (all windows with force)."""
+        watermark = self.watermark
+        if watermark is None:
+            return []
+        rows = []
+        for end in sorted(self._by_end):
+            if end > watermark and not force:
+                break
+            for state_key in self._by_end.pop(end):
+                rows.append(self._row(state_key, self.state.pop(state_key)))
+        return rows
+
+    def _row(self, state_key: tuple, acc: list) -> Dict:
+        window, start, dim, key = state_key
+        plays, skips, listen_seconds, users = acc
+        return {
+            "agg_id": f"{window}|{start}|{dim}|{key}",
+            "window_name": window,
+            "window_start": start,
+            "window_end": start + self.windows[window].size_sec,
+            "dimension": dim,
+            "dim_key": key,
+            "plays": plays,
+            "skips": skips,
+            "listen_seconds": listen_seconds,
+            "avg_listen_seconds": round(listen_seconds / plays, 2) if plays else 0.0,
+            "listeners": len(users),
+        }
+
+    def snapshot(self) -> Dict:
+        """JSON-serializable copy of the state."""
+        return {
+            "max_event_sec": self.max_event_sec,
+            "events": self.events,
+            "late_events": self.late_events,
+            "state": [[*k, p, s, l, sorted(u)] for k, (p, s, l, u) in self.state.items()],
+        }
+
+    def restore(self, snapshot: Dict):
+        self.state.clear()
+        self._by_end.clear()
+        self.max_event_sec = snapshot.get("max_event_sec")
+        self.events = snapshot.get("events", 0)
+        self.late_events = snapshot.get("late_events", 0)
+        for window, start, dim, key, plays, skips, listen_seconds, users in snapshot.get("state", []):
+            if window not in self.windows:
+                continue  # window definition was dropped since the checkpoint
+            state_key = (window, start, dim, key)
+            self.state[state_key] = [plays, skips, listen_seconds, set(users)]
+            self._by_end[start + self.windows[window].size_sec].add(state_key)
+
+
+def rows_to_frame(rows: List[Dict]) -> pd.DataFrame:
+    df = pd.DataFrame(rows)
+    df["window_start"] = pd.to_datetime(df["window_start"], unit="s")
+    df["window_end"] = pd.to_datetime(df["window_end"], unit="s")
+    return df
+
+
+class Checkpoint:
+    """Atomically replaced JSON file holding aggregator state and offsets."""
+
+    def __init__(self, path: str = CHECKPOINT_PATH):
+        self.path = path
+
+    def load(self) -> Dict:
+        if not os.path.exists(self.path):
+            return {}
+        with open(self.path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def save(self, data: Dict):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp, self.path)
+
+
+class AggregatorRunner:
+    """Drives a WindowedAggregator from a consumer: emit on window close, checkpoint, then commit."""
+
+    def __init__(self, consumer, aggregator, wh, checkpoint, checkpoint_interval_sec=CHECKPOINT_INTERVAL_SEC,
+                 clock=time.monotonic):
+        self.consumer = consumer
+        self.aggregator = aggregator
+        self.wh = wh
+        self.checkpoint_store = checkpoint
+        self.checkpoint_interval_sec = checkpoint_interval_sec
+        self.clock = clock
+
+        data = checkpoint.load()
+        if data.get("aggregator"):
+            aggregator.restore(data["aggregator"])
+        self.offsets = {}
+        for tp, offset in data.get("offsets", {}).items():
+            topic, partition = tp.rsplit(":", 1)
+            self.offsets[(topic, int(partition))] = offset
+        self.pending: List[Dict] = data.get("pending", [])
+        self.rows_emitted = 0
+        self.next_checkpoint = clock() + checkpoint_interval_sec
+        if data:
+            logging.info(f"Restored {len(aggregator)} open window entries from {checkpoint.path}")
+
+    def handle(self, msg):
+        if msg.error():
+            logging.error(f"Consumer error: {msg.error()}")
+            return
+        tp = (msg.topic(), msg.partition())
+        if msg.offset() <= self.offsets.get(tp, -1):
+            return  # already folded into the checkpointed state
+        self.aggregator.add(decode(msg))
+        self.offsets[tp] = msg.offset()
+
+    def emit(self) -> bool:
+        """Write rows of closed windows; rows stay pending (and checkpointed) on failure."""
+        self.pending.extend(self.aggregator.close_due())
+        if not self.pending:
+            return True
+        ok = load_df_to_snowflake(rows_to_frame(self.pending), WINDOW_TABLE, truncate_first=False,
+                                  create_if_missing=True, merge_key="agg_id", wh=self.wh)
+        if ok:
+            self.rows_emitted += len(self.pending)
+            logging.info(f"Emitted {len(self.pending)} window rows (watermark {self.aggregator.watermark})")
+            self.pending = []
+        return ok
+
+    def checkpoint(self):
+        self.checkpoint_store.save({
+            "aggregator": self.aggregator.snapshot(),
+            "offsets": {f"{t}:{p}": o for (t, p), o in self.offsets.items()},
+            "pending": self.pending,
+        })
+        commit = [TopicPartition(t, p, o + 1) for (t, p), o in self.offsets.items()]
+        if commit:
+            try:
+                self.consumer.commit(offsets=commit, asynchronous=False)
+            except Exception as e:
+                # The checkpoint already covers these offsets; replays are skipped in handle()
+                logging.error(f"Offset commit failed: {e}")
+        self.next_checkpoint = self.clock() + self.checkpoint_interval_sec
+
+    def tick(self, force=False):
+        self.emit()
+        if force or self.clock() >= self.next_checkpoint:
+            self.checkpoint()
+
+    def on_revoke(self, consumer, partitions):
+        logging.info(f"Partitions revoked: {[(p.topic, p.partition) for p in partitions]}; checkpointing")
+        self.checkpoint()
+
+    def on_assign(self, consumer, partitions):
+        logging.info(f"Partitions assigned: {[(p.topic, p.partition) for p in partitions]}")
+
+
+def run(consumer, runner, should_stop=lambda: False, batch_size=500):
+    while not should_stop():
+        for msg in consumer.consume(num_messages=batch_size, timeout=1.0):
+            runner.handle(msg)
+        runner.tick()
+
+
+def main():
+    logging.basicConfig(level=logging.INFO)
+    logging.info("Starting play-window aggregator")
+
+    consumer = Consumer(KAFKA_CONFIG)
+    wh = load_to_snowflake._get_conn()
+    runner = AggregatorRunner(consumer, WindowedAggregator(), wh, Checkpoint())
+    consumer.subscribe([PLAYS_TOPIC], on_assign=runner.on_assign, on_revoke=runner.on_revoke)
+
+    try:
+        run(consumer, runner)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        runner.tick(force=True)
+        consumer.close()
+        wh.close()
+        logging.info(f"Aggregator shut down ({runner.rows_emitted} rows emitted, "
+                     f"{runner.aggregator.late_events} late events dropped).")
+
+
+if __name__ == '__main__':
+    main()
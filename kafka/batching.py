@@ -0,0 +1,64 @@
+"""
+kafka/batching.py
+────────────────────────────────────────────────────────
+Micro-batching for the Kafka consumer.
+
+Decoded records are buffered per topic and handed to a
+flush callback once either `max_records` have accumulated or
+the oldest buffered record has waited `linger_sec`. Optional
+per-record metadata (e.g. topic/partition/key/offset) travels
+with the batch so the caller can commit or dedupe after flush.
+"""
+
+import time
+from collections import defaultdict, namedtuple
+from typing import Any, Callable, Dict, List, Optional
+
+FlushResult = namedtuple("FlushResult", ["ok", "count", "meta"])
+
+
+class MicroBatcher:
+    """Size- or time-bounded buffer of decoded records, grouped by topic."""
+
+    def __init__(self, flush_fn: Callable[[str, List[Any]], bool], max_records=1000, linger_sec=2.0,
+                 clock=time.monotonic):
+        self.flush_fn = flush_fn
+        self.max_records = max_records
+        self.linger_sec = linger_sec
+        self.clock = clock
+        self._buffers: Dict[str, List[Any]] = defaultdict(list)
+        self._meta: Dict[str, List[Any]] = defaultdict(list)
+        self._size = 0
+        self._first_at: Optional[float] = None
+
+    def __len__(self):
+        return self._size
+
+    def add(self, topic: str, record: Any, meta: Any = None):
+        if self._first_at is None:
+            self._first_at = self.clock()
+        self._buffers[topic].append(record)
+        self._meta[topic].append(meta)
+        self._size += 1
+
+    def time_left(self) -> float:
+        """Seconds until the linger deadline (linger_sec when the buffer is empty)."""
+        if self._first_at is None:
+            return self.linger_sec
+        return max(0.0, self._first_at + self.linger_sec - self.clock())
+
+    def due(self) -> bool:
+        return self._size >= self.max_records or (self._size > 0 and self.time_left() == 0.0)
+
+    def flush(self) -> Dict[str, FlushResult]:
+        """Flush every topic buffer and return a FlushResult per topic."""
+        results = {}
+        for topic, records in list(self._buffers.items()):
+            if records:
+                ok = bool(self.flush_fn(topic, records))
+                results[topic] = FlushResult(ok, len(records), self._meta[topic])
+        self._buffers.clear()
+        self._meta.clear()
+        self._size = 0
+        self._first_at = None
+        return results
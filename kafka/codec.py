@@ -0,0 +1,129 @@
+"""
+kafka/codec.py
+────────────────────────────────────────────────────────
+Compact binary encoding for Kafka message values.
+
+Wire format (same framing as the Confluent serializers):
+
+  byte 0     magic byte 0x00
+  bytes 1-4  schema ID, big-endian uint32
+  bytes 5-   msgpack array of field values in schema order
+
+Field names are not repeated in every message, and nested
+values (artists, album, ...) are msgpack maps instead of JSON
+text. Messages that don't start with the magic byte are decoded
+as JSON, so topics that still hold JSON records stay readable.
+"""
+
+import json
+import struct
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+import msgpack
+
+from kafka.schema_registry import LocalSchemaRegistry, subject_for
+
+MAGIC_BYTE = 0
+_HEADER = struct.Struct(">BI")
+_EPOCH = datetime(1970, 1, 1)
+
+# Versioned value schemas per topic; new versions are appended, never edited
+TRACK_FIELDS = [
+    ("id", "string"),
+    ("name", "string"),
+    ("artists", "any"),
+    ("popularity", "int"),
+    ("duration_ms", "int"),
+    ("explicit", "bool"),
+    ("language", "string"),
+    ("external_ids", "any"),
+    ("album", "any"),
+    ("track_number", "int"),
+    ("disc_number", "int"),
+]
+
+PLAY_FIELDS = [
+    ("play_id", "string"),
+    ("user_id", "string"),
+    ("track_id", "string"),
+    ("artist_id", "string"),
+    ("play_ts", "timestamp_ms"),
+    ("track_language", "string"),
+    ("device", "string"),
+    ("play_duration_seconds", "int"),
+    ("skipped", "bool"),
+]
+
+TOPIC_SCHEMAS = {
+    "spotify.tracks.raw": TRACK_FIELDS,
+    "spotify.plays.raw": PLAY_FIELDS,
+}
+
+
+def to_epoch_ms(value) -> Optional[int]:
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return int(value)
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return (value - _EPOCH) // timedelta(milliseconds=1)
+
+
+def from_epoch_ms(value) -> Optional[datetime]:
+    return None if value is None else _EPOCH + timedelta(milliseconds=value)
+
+
+class SchemaCodec:
+    """Encode/decode message values against a LocalSchemaRegistry."""
+
+    def __init__(self, registry: Optional[LocalSchemaRegistry] = None):
+        self.registry = registry or LocalSchemaRegistry()
+        self._writers: Dict[str, tuple] = {}   # subject → (id, names, timestamp field positions)
+        self._readers: Dict[int, tuple] = {}   # schema id → (names, timestamp field positions)
+
+    @staticmethod
+    def _compile(fields: List) -> tuple:
+        names = [name for name, _ in fields]
+        ts_positions = [i for i, (_, ftype) in enumerate(fields) if ftype == "timestamp_ms"]
+        return names, ts_positions
+
+    def _writer(self, topic: str) -> tuple:
+        subject = subject_for(topic)
+        if subject not in self._writers:
+            if topic in TOPIC_SCHEMAS:
+                schema_id = self.registry.register(subject, TOPIC_SCHEMAS[topic])
+                schema = self.registry.get(schema_id)
+            else:
+                schema_id, schema = self.registry.latest(subject)
+            self._writers[subject] = (schema_id, *self._compile(schema["fields"]))
+        return self._writers[subject]
+
+    def encode(self, topic: str, record: Dict) -> bytes:
+        """Serialize the schema's fields of `record`; other keys are dropped."""
+        schema_id, names, ts_positions = self._writer(topic)
+        values = [record.get(name) for name in names]
+        for i in ts_positions:
+            values[i] = to_epoch_ms(values[i])
+        return _HEADER.pack(MAGIC_BYTE, schema_id) + msgpack.packb(values, use_bin_type=True)
+
+    def decode(self, data: bytes) -> Dict:
+        """Decode a framed msgpack value, or a plain JSON value."""
+        if not data or data[0] != MAGIC_BYTE:
+            return json.loads(data.decode("utf-8") if isinstance(data, bytes) else data)
+
+        _, schema_id = _HEADER.unpack_from(data)
+        reader = self._readers.get(schema_id)
+        if reader is None:
+            reader = self._readers[schema_id] = self._compile(self.registry.get(schema_id)["fields"])
+        names, ts_positions = reader
+
+        values = msgpack.unpackb(data[_HEADER.size:], raw=False)
+        # Older/newer writers may carry fewer/more fields than this schema
+        values = (values + [None] * len(names))[:len(names)]
+        for i in ts_positions:
+            values[i] = from_epoch_ms(values[i])
+        return dict(zip(names, values))
@@ -1,47 +1,308 @@
 # kafka/consumer.py
+"""
+Consume Spotify records from Kafka and bulk-load them into the
+warehouse in micro-batches.
+
+Each decoded message is buffered; a batch is flushed when it
+reaches CONSUMER_BATCH_SIZE records or the oldest record has
+waited CONSUMER_LINGER_MS. Every flush converts the records to
+the raw table layout and does one bulk write, instead of
+re-crawling Spotify per message.
+
+Delivery is at-least-once: auto-commit is off and offsets are
+committed per partition only after their batch is in the
+warehouse (see BatchingLoader).
+
+Message values are decoded with the schema-ID msgpack codec;
+plain JSON values are still accepted. Play events are enriched
+with track/artist attributes from an in-memory dimension cache
+before they land (CONSUMER_ENRICH=0 turns this off).
+
+With `--sink lake` (or CONSUMER_SINK=lake) batches go to
+date/hour-partitioned Parquet files instead of the warehouse
+(see kafka/lake_sink.py); offsets are then committed as files
+are finalized.
+"""
 
 from confluent_kafka import Consumer
-import json
+import argparse
 import logging
 import os
+import time
+import pandas as pd
 from ingestion import load_to_snowflake
-from ingestion.load_to_snowflake import load_spotify_data  # use your existing loader function
+from ingestion.load_to_snowflake import load_df_to_snowflake
+from ingestion.payloads import ensure_track_columns, track_to_row
+from ingestion.schemas import apply_schema
+from kafka.batching import MicroBatcher
+from kafka.codec import SchemaCodec
+from kafka.enrichment import DimensionCache, PlayEnricher
+from kafka.metrics import METRICS_PORT, ConsumerMetrics, start_http_server
+from kafka.offsets import OffsetTracker, ReplayFilter
 
 KAFKA_CONFIG = {
     'bootstrap.servers': 'localhost:9092',
     'group.id': 'spotify-consumer-group',
-    'auto.offset.reset': 'earliest'  # or 'latest' if you only want new messages
+    'auto.offset.reset': 'earliest',  # or 'latest' if you only want new messages
+    # Offsets are committed by BatchingLoader after each warehouse write
+    'enable.auto.commit': False,
+    'enable.auto.offset.store': False,
 }
 
 TOPIC_NAME = 'spotify.tracks.raw'
+PLAYS_TOPIC = 'spotify.plays.raw'
 
-def main():
-    logging.basicConfig(level=logging.INFO)
-    logging.info("Starting Kafka consumer")
+BATCH_SIZE = int(os.getenv("CONSUMER_BATCH_SIZE", "1000"))
+LINGER_SEC = int(os.getenv("CONSUMER_LINGER_MS", "2000")) / 1000.0
+ENRICH = os.getenv("CONSUMER_ENRICH", "1") != "0"
+SINKS = ("warehouse", "lake")
 
-    consumer = Consumer(KAFKA_CONFIG)
-    consumer.subscribe([TOPIC_NAME])
+# topic → (raw table, record → row converter, upsert key or None to append)
+TOPIC_TABLES = {
+    TOPIC_NAME: ('RAW_TOP_TRACKS', track_to_row, 'id'),
+    # Play events already have the RAW_LISTENING_HISTORY layout. They are
+    # appended: an upsert would run a DELETE against the whole, ever-growing
+    # fact table per batch. Replays are dropped by the ReplayFilter and any
+    # duplicate that slips through is resolved on play_id by
+    # int_listening_history_enriched.
+    PLAYS_TOPIC: ('RAW_LISTENING_HISTORY', dict, None),
+}
 
-    try:
-        while True:
-            msg = consumer.poll(timeout=1.0)
 
-            if msg is None:
-                continue
-            if msg.error():
-                logging.error(f"Consumer error: {msg.error()}")
-                continue
+def records_to_frame(topic, records):
+    """Convert decoded records from `topic` into a DataFrame in the raw table layout."""
+    table_name, to_row, key = TOPIC_TABLES[topic]
+    df = pd.DataFrame([to_row(r) for r in records])
+    if key:
+        # The same entity can appear several times in one batch; keep the latest
+        df = df.drop_duplicates(subset=[key], keep='last')
+    return apply_schema(df, table_name)
+
+
+def load_batch(topic, records, wh=None, profiler=None):
+    """Bulk-load one micro-batch of decoded records; returns True on success."""
+    if topic not in TOPIC_TABLES:
+        logging.warning(f"No table mapping for topic {topic}; dropping {len(records)} records")
+        return True
+    table_name, _, key = TOPIC_TABLES[topic]
+    df = records_to_frame(topic, records)
+    return load_df_to_snowflake(df, table_name, truncate_first=False, merge_key=key, wh=wh, profiler=profiler)
+
+
+_codec = None
+
+
+def make_enricher(wh):
+    """Bootstrap the dimension cache from the warehouse (None when enrichment is off)."""
+    if not ENRICH:
+        return None
+    enricher = PlayEnricher(DimensionCache(wh))
+    enricher.cache.refresh(force=True)
+    enricher.ensure_columns(wh)
+    return enricher
+
+
+def decode(msg):
+    global _codec
+    if _codec is None:
+        _codec = SchemaCodec()
+    return _codec.decode(msg.value())
+
+
+class BatchingLoader:
+    """
+    Micro-batching warehouse loader with an at-least-once commit protocol.
+
+    Offsets are committed per partition, synchronously, only after the
+    batch holding them was written to the warehouse. A failed batch is
+    rewound (seek back to its first offset) and retried with backoff;
+    replays of already-loaded keys are dropped by the ReplayFilter.
+    Tracks are upserted on their key; plays are appended and any
+    remaining duplicates are resolved on play_id in dbt.
+
+    With a `sink` (LakeSink) batches are appended to its open files
+    instead, and only offsets covered by finalized files are committed.
+    """
+
+    def __init__(self, consumer, wh, batch_size=BATCH_SIZE, linger_sec=LINGER_SEC, profiler=None, enricher=None,
+                 sink=None, metrics=None):
+        self.consumer = consumer
+        self.wh = wh
+        self.profiler = profiler
+        self.enricher = enricher
+        self.sink = sink
+        self.metrics = metrics
+        self.batcher = MicroBatcher(self._load, max_records=batch_size, linger_sec=linger_sec)
+        self.offsets = OffsetTracker()
+        self.replays = ReplayFilter()
+        self.failures = 0
+        self.records_loaded = 0
+        self.batches = 0
+
+    def _load(self, topic, records):
+        if self.enricher is not None:
+            if topic == PLAYS_TOPIC:
+                records = self.enricher.enrich_all(records)
+            elif topic == TOPIC_NAME:
+                self.enricher.cache.update_tracks(records)
+        if self.sink is not None:
+            if topic not in TOPIC_TABLES:
+                logging.warning(f"No table mapping for topic {topic}; dropping {len(records)} records")
+                return True
+            return self.sink.write(topic, records_to_frame(topic, records), self.offsets.ranges([topic]))
+        return load_batch(topic, records, wh=self.wh, profiler=self.profiler)
 
-            record = json.loads(msg.value().decode('utf-8'))
+    def handle(self, msg):
+        """Buffer one polled message (errors and replays are skipped)."""
+        if msg.error():
+            logging.error(f"Consumer error: {msg.error()}")
+            return
+        topic, partition, offset, key = msg.topic(), msg.partition(), msg.offset(), msg.key()
+        if self.replays.is_replay(topic, partition, key, offset):
+            return
+        self.batcher.add(topic, decode(msg), meta=(topic, partition, key, offset))
+        self.offsets.track(topic, partition, offset)
 
-            # Your Snowflake loader expects a list
-            load_spotify_data()
+    def maybe_flush(self):
+        if self.batcher.due():
+            self.flush()
+        if self.sink is not None and self.sink.roll_due():
+            self._commit(self.sink.take_committable())
+
+    def _commit(self, offsets):
+        if not offsets:
+            return
+        started = time.monotonic()
+        try:
+            self.consumer.commit(offsets=offsets, asynchronous=False)
+            ok = True
+        except Exception as e:
+            # The data is already written; a replay is absorbed by the upsert / dbt dedupe (lake: re-written)
+            logging.error(f"Offset commit failed: {e}")
+            ok = False
+        if self.metrics is not None:
+            self.metrics.observe_commit(time.monotonic() - started, ok)
+
+    def flush(self):
+        """
+        Flush the buffered batch, then commit the offsets of every topic
+        that loaded successfully and rewind the ones that failed.
+        """
+        if not len(self.batcher):
+            return True
+
+        started = time.monotonic()
+        results = self.batcher.flush()
+        loaded = [topic for topic, r in results.items() if r.ok]
+        failed = [topic for topic, r in results.items() if not r.ok]
+        if self.metrics is not None:
+            self.metrics.observe_flush({t: results[t].count for t in loaded}, time.monotonic() - started, bool(failed))
+
+        if self.sink is None:
+            for topic in loaded:
+                self.replays.mark_loaded(results[topic].meta)
+            commit = self.offsets.commit_offsets(loaded)
+        else:
+            # Lake files may still be discarded on failure, so nothing counts as loaded before finalize
+            commit = self.sink.take_committable()
+        self._commit(commit)
+        self.offsets.forget(loaded)
+
+        n = sum(r.count for r in results.values())
+        if failed:
+            self.failures += 1
+            rewind = self.offsets.rewind_offsets(failed)
+            if self.sink is not None:
+                rewind += self.sink.abort()
+            for tp in rewind:
+                try:
+                    self.consumer.seek(tp)
+                except Exception as e:
+                    # Partition was revoked meanwhile; its new owner resumes from the last commit
+                    logging.warning(f"Could not rewind {tp.topic}[{tp.partition}]: {e}")
+            self.offsets.forget(failed)
+            backoff = min(30.0, 0.5 * 2 ** (self.failures - 1))
+            logging.error(f"Batch of {n} records failed for {failed}; rewound, retrying in {backoff:.1f}s")
+            time.sleep(backoff)
+            return False
+
+        self.failures = 0
+        self.records_loaded += n
+        self.batches += 1
+        logging.info(f"Flushed batch of {n} records, committed {len(commit)} partition offsets")
+        return True
+
+    def on_revoke(self, consumer, partitions):
+        """Rebalance callback: flush and commit before partitions move to another worker."""
+        logging.info(f"Partitions revoked: {[(p.topic, p.partition) for p in partitions]}; flushing")
+        self.close()
+
+    def close(self):
+        """Flush the buffer and, in lake mode, finalize open files and commit their offsets."""
+        self.flush()
+        if self.sink is not None:
+            self.sink.finalize_all()
+            self._commit(self.sink.take_committable())
+
+    def on_assign(self, consumer, partitions):
+        logging.info(f"Partitions assigned: {[(p.topic, p.partition) for p in partitions]}")
+
+
+def poll_once(consumer, loader):
+    """One poll → buffer → maybe-flush iteration."""
+    # consume() hands back up to a batch worth of messages per call
+    messages = consumer.consume(num_messages=max(1, loader.batcher.max_records - len(loader.batcher)),
+                                timeout=min(1.0, loader.batcher.time_left()))
+    for msg in messages:
+        loader.handle(msg)
+    loader.maybe_flush()
+
+
+def run(consumer, loader, should_stop=lambda: False, on_tick=None):
+    """Poll/buffer/flush loop shared by the single consumer and the supervisor's workers."""
+    while not should_stop():
+        poll_once(consumer, loader)
+        if on_tick:
+            on_tick()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Consume Spotify topics into the warehouse or the Parquet lake")
+    parser.add_argument("--sink", choices=SINKS, default=os.getenv("CONSUMER_SINK", "warehouse"))
+    parser.add_argument("--lake-path", default=None, help="lake root (default LAKE_PATH or data/lake)")
+    parser.add_argument("--metrics-port", type=int, default=METRICS_PORT, help="0 disables the /metrics endpoint")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    logging.info(f"Starting Kafka consumer ({args.sink} sink)")
+
+    consumer = Consumer(KAFKA_CONFIG)
+    metrics = ConsumerMetrics(KAFKA_CONFIG['group.id'])
+    if args.sink == "lake":
+        from kafka.lake_sink import LAKE_PATH, LakeSink
+
+        wh = None
+        loader = BatchingLoader(consumer, wh, sink=LakeSink(TOPIC_TABLES, args.lake_path or LAKE_PATH), metrics=metrics)
+    else:
+        wh = load_to_snowflake._get_conn()
+        ensure_track_columns(wh)
+        loader = BatchingLoader(consumer, wh, enricher=make_enricher(wh), metrics=metrics)
+    consumer.subscribe(list(TOPIC_TABLES), on_assign=loader.on_assign, on_revoke=loader.on_revoke)
+    server = start_http_server(metrics, args.metrics_port)
+
+    try:
+        run(consumer, loader, on_tick=lambda: metrics.tick(consumer))
 
     except KeyboardInterrupt:
         pass
     finally:
+        loader.close()
         consumer.close()
-        logging.info("Kafka consumer shut down.")
+        if wh is not None:
+            wh.close()
+        if server is not None:
+            server.shutdown()
+        logging.info(f"Kafka consumer shut down. {metrics.summary()}")
 
 if __name__ == '__main__':
     main()
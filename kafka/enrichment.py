@@ -0,0 +1,182 @@
+"""
+kafka/enrichment.py
+────────────────────────────────────────────────────────
+In-stream enrichment of play events with track and artist
+attributes.
+
+DimensionCache keeps the track, artist and track-alias
+dimensions in memory. It is bootstrapped from the raw tables
+and refreshed incrementally (rows with a newer INGESTED_AT)
+every ENRICH_REFRESH_SEC seconds; track records flowing through
+spotify.tracks.raw update it directly. PlayEnricher stamps each
+play event with the attributes downstream queries used to join
+for, so RAW_LISTENING_HISTORY rows land denormalized.
+
+Lookups may run on other threads than refresh() (the decode pool
+of kafka/pipeline.py): a refresh applies its rows to copies of the
+dictionaries and swaps them in, and writers hold a lock.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from typing import Dict, Iterable, List, Optional
+
+REFRESH_SEC = float(os.getenv("ENRICH_REFRESH_SEC", "300"))
+
+# Columns added to RAW_LISTENING_HISTORY by the enricher (name → SQL type)
+ENRICHED_COLUMNS = {
+    "TRACK_NAME": "VARCHAR",
+    "TRACK_POPULARITY": "INTEGER",
+    "DURATION_SECONDS": "FLOAT",  # DURATION_MS / 1000.0, as in stg_top_tracks
+    "ARTIST_NAME": "VARCHAR",
+    "ARTIST_POPULARITY": "INTEGER",
+    "ARTIST_GENRES": "VARCHAR",
+}
+
+_QUERIES = {
+    "tracks": "SELECT ID, NAME, ARTIST_ID, POPULARITY, DURATION_MS, INGESTED_AT FROM RAW_TOP_TRACKS",
+    "artists": "SELECT ID, NAME, POPULARITY, GENRES, INGESTED_AT FROM RAW_TOP_ARTISTS",
+    "aliases": "SELECT ALIAS_ID, CANONICAL_ID, INGESTED_AT FROM RAW_TRACK_ALIASES",
+}
+
+
+class DimensionCache:
+    """Track / artist / alias lookups, refreshed incrementally on INGESTED_AT."""
+
+    def __init__(self, wh=None, refresh_sec=REFRESH_SEC, clock=time.monotonic):
+        self.wh = wh
+        self.refresh_sec = refresh_sec
+        self.clock = clock
+        self.tracks: Dict[str, Dict] = {}
+        self.artists: Dict[str, Dict] = {}
+        self.aliases: Dict[str, str] = {}
+        self._watermarks: Dict[str, object] = {}
+        self._next_refresh = 0.0
+        self._lock = threading.Lock()
+
+    def _fetch(self, name: str) -> List[Dict]:
+        sql = _QUERIES[name]
+        since = self._watermarks.get(name)
+        if since is None:
+            return self.wh.query(sql)
+        return self.wh.query(f"{sql} WHERE INGESTED_AT > {self.wh.placeholder}", (since,))
+
+    def refresh(self, force: bool = False) -> int:
+        """Pull rows ingested since the last refresh; returns the number of rows applied."""
+        if self.wh is None or (not force and self.clock() < self._next_refresh):
+            return 0
+        self._next_refresh = self.clock() + self.refresh_sec
+
+        fetched = {}
+        for name in ("tracks", "artists", "aliases"):
+            try:
+                fetched[name] = self._fetch(name)
+            except Exception as e:
+                # Table not created yet (fresh DuckDB file) or warehouse hiccup: keep the current cache
+                logging.warning(f"Dimension refresh of {name} failed: {e}")
+
+        applied = sum(len(rows) for rows in fetched.values())
+        if not applied:
+            return 0
+        with self._lock:
+            # Rebuild copies and swap each in with one assignment, so readers never see a half-applied refresh
+            tracks, artists, aliases = dict(self.tracks), dict(self.artists), dict(self.aliases)
+            for row in fetched.get("tracks", []):
+                tracks[row["ID"]] = self._track_entry(row)
+            for row in fetched.get("artists", []):
+                artists[row["ID"]] = {"name": row.get("NAME"), "popularity": row.get("POPULARITY"),
+                                      "genres": row.get("GENRES")}
+            for row in fetched.get("aliases", []):
+                aliases[row["ALIAS_ID"]] = row["CANONICAL_ID"]
+            self.tracks, self.artists, self.aliases = tracks, artists, aliases
+
+        for name, rows in fetched.items():
+            for row in rows:
+                ingested_at = row.get("INGESTED_AT")
+                if ingested_at is not None and (name not in self._watermarks or ingested_at > self._watermarks[name]):
+                    self._watermarks[name] = ingested_at
+        logging.info(f"Dimension cache: {len(self.tracks)} tracks, {len(self.artists)} artists, "
+                     f"{len(self.aliases)} aliases (+{applied} rows)")
+        return applied
+
+    @staticmethod
+    def _track_entry(row: Dict) -> Dict:
+        return {
+            "name": row.get("NAME"),
+            "artist_id": row.get("ARTIST_ID"),
+            "popularity": row.get("POPULARITY"),
+            "duration_ms": row.get("DURATION_MS"),
+        }
+
+    def update_tracks(self, tracks: Iterable[Dict]):
+        """Apply raw Spotify track objects seen on the tracks topic (safe from several threads)."""
+        with self._lock:
+            for t in tracks:
+                if not t.get("id"):
+                    continue
+                artists = t.get("artists") or [{}]
+                self.tracks[t["id"]] = {
+                    "name": t.get("name"),
+                    "artist_id": artists[0].get("id"),
+                    "popularity": t.get("popularity"),
+                    "duration_ms": t.get("duration_ms"),
+                }
+
+    def track(self, track_id: Optional[str]) -> Optional[Dict]:
+        if track_id is None:
+            return None
+        return self.tracks.get(self.aliases.get(track_id, track_id))
+
+    def artist(self, artist_id: Optional[str]) -> Optional[Dict]:
+        return self.artists.get(artist_id) if artist_id is not None else None
+
+
+class PlayEnricher:
+    """Adds ENRICHED_COLUMNS to play events from a DimensionCache."""
+
+    def __init__(self, cache: DimensionCache):
+        self.cache = cache
+        self.hits = 0
+        self.misses = 0
+
+    def ensure_columns(self, wh, table_name: str = "RAW_LISTENING_HISTORY"):
+        """Add the enrichment columns to an existing raw table (new tables get them from the first batch)."""
+        db, schema = wh.current_context()
+        full_table_name = f"{db}.{schema}.{table_name}"
+        if wh.table_exists(full_table_name):
+            wh.add_columns(full_table_name, ENRICHED_COLUMNS)
+            # Tables from before DURATION_SECONDS was fractional keep their integer column
+            types = dict(wh.describe_table(full_table_name))
+            if not any(t in types.get("DURATION_SECONDS", "FLOAT").upper() for t in ("FLOAT", "DOUBLE", "REAL")):
+                logging.warning(f"{full_table_name}.DURATION_SECONDS is {types['DURATION_SECONDS']}; streamed durations "
+                                f"are truncated to whole seconds until it is recreated as FLOAT")
+
+    def enrich(self, event: Dict) -> Dict:
+        track = self.cache.track(event.get("track_id"))
+        artist_id = event.get("artist_id") or (track or {}).get("artist_id")
+        artist = self.cache.artist(artist_id)
+        if track is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+
+        track, artist = track or {}, artist or {}
+        duration_ms = track.get("duration_ms")
+        genres = artist.get("genres")
+        return {
+            **event,
+            "artist_id": artist_id,
+            "track_name": track.get("name"),
+            "track_popularity": track.get("popularity"),
+            "duration_seconds": duration_ms / 1000.0 if duration_ms is not None else None,
+            "artist_name": artist.get("name"),
+            "artist_popularity": artist.get("popularity"),
+            "artist_genres": genres if genres is None or isinstance(genres, str) else json.dumps(genres),
+        }
+
+    def enrich_all(self, events: Iterable[Dict]) -> List[Dict]:
+        self.cache.refresh()
+        return [self.enrich(e) for e in events]
@@ -0,0 +1,245 @@
+"""
+kafka/lake_sink.py
+────────────────────────────────────────────────────────
+Kafka → Parquet lake sink.
+
+Batches are written in the raw table layout (upper-case columns
+plus INGESTED_AT) to
+
+  <LAKE_PATH>/<topic>/date=YYYY-MM-DD/hour=HH/part-<ms>-<seq>.parquet
+
+partitioned on processing time (UTC). A file is written as
+`.inprogress` and rolled once it reaches LAKE_ROLL_BYTES or has
+been open for LAKE_ROLL_SEC (or its hour has passed), then
+renamed into place and appended to <LAKE_PATH>/_manifest.jsonl
+with the offset range it holds per partition. Only offsets
+covered by finalized files are committed, so the lake can be
+replayed from the manifest and a crash at worst re-writes the
+open files. On startup only the sink's own topic directories are
+recovered, and only files named the way it writes them (part-*).
+
+Files are plain Parquet with the warehouse column names, so
+backfills go through `ingestion/load_file.py <file> --table T`.
+"""
+
+import json
+import logging
+import os
+import re
+import time
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+from confluent_kafka import TopicPartition
+
+LAKE_PATH = os.getenv("LAKE_PATH", "data/lake")
+ROLL_BYTES = int(os.getenv("LAKE_ROLL_BYTES", str(128 * 1024 * 1024)))
+ROLL_SEC = float(os.getenv("LAKE_ROLL_SEC", "300"))
+MANIFEST_NAME = "_manifest.jsonl"
+IN_PROGRESS_SUFFIX = ".inprogress"
+PART_FILE = re.compile(r"^part-\d+-\d+-\d+\.parquet(\.inprogress)?$")
+
+
+def _file_schema(schema: pa.Schema) -> pa.Schema:
+    """Stable per-file schema: dictionaries decoded, all-null columns typed as strings."""
+    fields = []
+    for field in schema:
+        if pa.types.is_dictionary(field.type):
+            field = field.with_type(field.type.value_type)
+        elif pa.types.is_null(field.type):
+            field = field.with_type(pa.string())
+        fields.append(field)
+    return pa.schema(fields)
+
+
+def _conform(table: pa.Table, schema: pa.Schema) -> pa.Table:
+    """Cast `table` to `schema`; missing columns become nulls and extra columns are dropped."""
+    columns = []
+    for field in schema:
+        if field.name in table.column_names:
+            columns.append(table[field.name].cast(field.type))
+        else:
+            columns.append(pa.nulls(table.num_rows, field.type))
+    return pa.Table.from_arrays(columns, schema=schema)
+
+
+class _OpenFile:
+    def __init__(self, key: Tuple[str, str, str], path: str, opened_at: float):
+        self.key = key
+        self.path = path
+        self.tmp_path = path + IN_PROGRESS_SUFFIX
+        self.opened_at = opened_at
+        self.writer: Optional[pq.ParquetWriter] = None
+        self.rows = 0
+        self.offsets: Dict[Tuple[str, int], List[int]] = {}
+
+    def size(self) -> int:
+        return os.path.getsize(self.tmp_path) if os.path.exists(self.tmp_path) else 0
+
+
+class LakeSink:
+    """Date/hour-partitioned Parquet writer with atomic finalize and an offsets manifest."""
+
+    def __init__(self, topics: Iterable[str], root: str = LAKE_PATH, roll_bytes: int = ROLL_BYTES,
+                 roll_sec: float = ROLL_SEC, compression: str = "zstd", clock=time.time):
+        self.topics = list(topics)
+        self.root = root
+        self.roll_bytes = roll_bytes
+        self.roll_sec = roll_sec
+        self.compression = compression
+        self.clock = clock
+        self.manifest_path = os.path.join(root, MANIFEST_NAME)
+        self._open: Dict[Tuple[str, str, str], _OpenFile] = {}
+        self._finalized: Dict[Tuple[str, int], int] = {}   # (topic, partition) → next offset
+        self._committed: Dict[Tuple[str, int], int] = {}
+        self._seq = 0
+        self.files_finalized = 0
+        os.makedirs(root, exist_ok=True)
+        self.recover()
+
+    # ─── Startup ─────────────────────────────────────────────────────────────
+    def manifest(self) -> List[Dict]:
+        if not os.path.exists(self.manifest_path):
+            return []
+        with open(self.manifest_path, "r", encoding="utf-8") as f:
+            return [json.loads(line) for line in f if line.strip()]
+
+    def recover(self):
+        """
+        Drop this sink's in-progress files and finalized files that never made
+        it into the manifest. Only part-* files under <root>/<topic>/ for the
+        sink's own topics are touched; anything else in the lake is left alone.
+        """
+        known = {entry["file"] for entry in self.manifest()}
+        removed = 0
+        for topic in self.topics:
+            for dirpath, _, filenames in os.walk(os.path.join(self.root, topic)):
+                for name in filenames:
+                    path = os.path.join(dirpath, name)
+                    if PART_FILE.match(name) and os.path.relpath(path, self.root) not in known:
+                        os.remove(path)
+                        removed += 1
+        if removed:
+            logging.info(f"Lake recovery removed {removed} unfinished files; their offsets were never committed")
+
+    # ─── Writing ─────────────────────────────────────────────────────────────
+    def _bucket(self, now: float) -> Tuple[str, str]:
+        ts = datetime.fromtimestamp(now, tz=timezone.utc)
+        return ts.strftime("%Y-%m-%d"), ts.strftime("%H")
+
+    def _file_for(self, topic: str, now: float) -> _OpenFile:
+        date, hour = self._bucket(now)
+        key = (topic, date, hour)
+        f = self._open.get(key)
+        if f is None:
+            directory = os.path.join(self.root, topic, f"date={date}", f"hour={hour}")
+            os.makedirs(directory, exist_ok=True)
+            self._seq += 1
+            name = f"part-{int(now * 1000)}-{os.getpid()}-{self._seq:04d}.parquet"
+            f = self._open[key] = _OpenFile(key, os.path.join(directory, name), now)
+        return f
+
+    def write(self, topic: str, df, offsets: List[Tuple[str, int, int, int]]) -> bool:
+        """Append one batch (DataFrame in the raw layout) and record its offset ranges."""
+        now = self.clock()
+        try:
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            table = table.rename_columns([c.upper() for c in table.column_names])
+            if "INGESTED_AT" not in table.column_names:
+                stamp = datetime.fromtimestamp(int(now), tz=timezone.utc).replace(tzinfo=None)
+                table = table.append_column("INGESTED_AT", pa.array([stamp] * table.num_rows, pa.timestamp("s")))
+
+            f = self._file_for(topic, now)
+            if f.writer is None:
+                f.writer = pq.ParquetWriter(f.tmp_path, _file_schema(table.schema), compression=self.compression)
+            f.writer.write_table(_conform(table, f.writer.schema))
+        except Exception as e:
+            logging.error(f"Lake write for {topic} failed: {e}")
+            return False
+
+        f.rows += table.num_rows
+        for t, partition, first, last in offsets:
+            rng = f.offsets.setdefault((t, partition), [first, last])
+            rng[0], rng[1] = min(rng[0], first), max(rng[1], last)
+
+        if f.size() >= self.roll_bytes:
+            self._finalize(f.key)
+        return True
+
+    def _finalize(self, key: Tuple[str, str, str]):
+        f = self._open.pop(key)
+        if f.writer is None:
+            return
+        f.writer.close()
+        size = os.path.getsize(f.tmp_path)
+        os.replace(f.tmp_path, f.path)   # atomic: readers never see a partial file
+
+        topic, date, hour = key
+        entry = {
+            "file": os.path.relpath(f.path, self.root),
+            "topic": topic,
+            "date": date,
+            "hour": hour,
+            "rows": f.rows,
+            "bytes": size,
+            "offsets": [{"topic": t, "partition": p, "first": first, "last": last}
+                        for (t, p), (first, last) in sorted(f.offsets.items())],
+            "finalized_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        }
+        with open(self.manifest_path, "a", encoding="utf-8") as m:
+            m.write(json.dumps(entry) + "\n")
+            m.flush()
+            os.fsync(m.fileno())
+
+        for tp, (_, last) in f.offsets.items():
+            self._finalized[tp] = max(self._finalized.get(tp, 0), last + 1)
+        self.files_finalized += 1
+        logging.info(f"Finalized {entry['file']} ({f.rows:,} rows, {size / 1024:.0f} KB)")
+
+    def roll_due(self) -> bool:
+        """Finalize files that are old enough or belong to a past hour; True if any were rolled."""
+        now = self.clock()
+        current = self._bucket(now)
+        due = [key for key, f in self._open.items()
+               if now - f.opened_at >= self.roll_sec or key[1:] != current]
+        for key in due:
+            self._finalize(key)
+        return bool(due)
+
+    def finalize_all(self):
+        for key in list(self._open):
+            self._finalize(key)
+
+    # ─── Offsets ─────────────────────────────────────────────────────────────
+    def take_committable(self) -> List[TopicPartition]:
+        """
+        Offsets newly safe to commit: everything in finalized files, capped at
+        the first offset still sitting in an open file of the same partition.
+        """
+        caps: Dict[Tuple[str, int], int] = {}
+        for f in self._open.values():
+            for tp, (first, _) in f.offsets.items():
+                caps[tp] = min(caps.get(tp, first), first)
+
+        commit = []
+        for tp, offset in self._finalized.items():
+            offset = min(offset, caps.get(tp, offset))
+            if offset > self._committed.get(tp, -1):
+                self._committed[tp] = offset
+                commit.append(TopicPartition(tp[0], tp[1], offset))
+        return commit
+
+    def abort(self) -> List[TopicPartition]:
+        """Discard open files; returns the offsets to seek back to so their records are re-consumed."""
+        rewind: Dict[Tuple[str, int], int] = {}
+        for f in self._open.values():
+            if f.writer is not None:
+                f.writer.close()
+            if os.path.exists(f.tmp_path):
+                os.remove(f.tmp_path)
+            for tp, (first, _) in f.offsets.items():
+                rewind[tp] = min(rewind.get(tp, first), first)
+        self._open.clear()
+        return [TopicPartition(t, p, offset) for (t, p), offset in rewind.items()]
@@ -0,0 +1,398 @@
+"""
+kafka/loadtest.py
+────────────────────────────────────────────────────────
+End-to-end streaming load test: producer → broker → consumer
+→ warehouse.
+
+Synthetic play events are produced at a target rate through the
+same produce()/DeliveryStats path as kafka/producer.py and consumed
+by BatchingLoader (kafka/consumer.py) or the PipelinedConsumer
+(kafka/pipeline.py) into RAW_LISTENING_HISTORY_LOADTEST, a table
+of its own so synthetic plays never reach the real fact table
+(drop it when done with --warehouse env). Each event's
+play_ts is its produce time, so the harness reports end-to-end
+latency percentiles (produced → written to the warehouse) and
+sustained throughput.
+
+Without --bootstrap, an in-process broker stand-in replaces Kafka
+and a throwaway DuckDB file replaces Snowflake, so nothing but
+this repo is needed. With --bootstrap localhost:9092 the real
+docker-compose broker is used (on a separate topic and a fresh
+consumer group).
+
+Usage:
+  python -m kafka.loadtest --rate 20000 --duration 15
+  python -m kafka.loadtest --mode pipeline --batch-size 5000
+  python -m kafka.loadtest --bootstrap localhost:9092 --topic spotify.plays.loadtest
+"""
+
+import argparse
+import contextlib
+import json
+import logging
+import os
+import random
+import tempfile
+import threading
+import time
+import uuid
+import zlib
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+import numpy as np
+from confluent_kafka import TopicPartition
+from ingestion.warehouse import get_warehouse
+from kafka import consumer as consumer_mod
+from kafka.codec import SchemaCodec, to_epoch_ms
+from kafka.producer import DeliveryStats, build_producer_conf, produce
+
+LOADTEST_TOPIC = "spotify.plays.loadtest"
+LOADTEST_TABLE = "RAW_LISTENING_HISTORY_LOADTEST"
+DEVICES = ["Mobile", "Web", "Smart Speaker", "Car"]
+
+
+# ─── In-process broker stand-in ───────────────────────────────────────────────
+class StandInMessage:
+    """Subset of confluent_kafka.Message used by the producer callback and the consumers."""
+
+    def __init__(self, topic, partition, offset, key, value, ts_ms, latency=None):
+        self._topic, self._partition, self._offset = topic, partition, offset
+        self._key, self._value, self._ts_ms, self._latency = key, value, ts_ms, latency
+
+    def error(self): return None
+    def topic(self): return self._topic
+    def partition(self): return self._partition
+    def offset(self): return self._offset
+    def key(self): return self._key
+    def value(self): return self._value
+    def timestamp(self): return (1, self._ts_ms)
+    def latency(self): return self._latency
+
+
+class InProcessBroker:
+    """Append-only partitioned logs shared by a StandInProducer and a StandInConsumer."""
+
+    def __init__(self, partitions: int = 4):
+        self.partitions = partitions
+        self.logs: Dict[str, List[List[StandInMessage]]] = {}
+        self.cond = threading.Condition()
+
+    def log(self, topic: str) -> List[List[StandInMessage]]:
+        if topic not in self.logs:
+            self.logs[topic] = [[] for _ in range(self.partitions)]
+        return self.logs[topic]
+
+    def append(self, topic, key, value) -> StandInMessage:
+        key = key.encode("utf-8") if isinstance(key, str) else key
+        # Stable key → partition mapping, like the default partitioner
+        partition = zlib.crc32(key) % self.partitions if key else random.randrange(self.partitions)
+        with self.cond:
+            log = self.log(topic)[partition]
+            msg = StandInMessage(topic, partition, len(log), key, value, int(time.time() * 1000))
+            log.append(msg)
+            self.cond.notify_all()
+        return msg
+
+
+class StandInProducer:
+    """Producer stand-in: appends immediately, delivers callbacks on poll()/flush()."""
+
+    def __init__(self, broker: InProcessBroker):
+        self.broker = broker
+        self._pending = []
+
+    def produce(self, topic, key=None, value=None, callback=None):
+        started = time.monotonic()
+        msg = self.broker.append(topic, key, value)
+        msg._latency = time.monotonic() - started
+        if callback is not None:
+            self._pending.append((callback, msg))
+
+    def poll(self, timeout=0):
+        pending, self._pending = self._pending, []
+        for callback, msg in pending:
+            callback(None, msg)
+        return len(pending)
+
+    def flush(self, timeout=None):
+        self.poll()
+        return 0
+
+
+class StandInConsumer:
+    """Single-member consumer group over an InProcessBroker (no rebalances)."""
+
+    def __init__(self, broker: InProcessBroker):
+        self.broker = broker
+        self.positions: Dict[tuple, int] = {}
+        self.committed: Dict[tuple, int] = {}
+        self.paused = set()
+        self._next = 0
+
+    def subscribe(self, topics, on_assign=None, on_revoke=None):
+        with self.broker.cond:
+            partitions = [TopicPartition(t, p) for t in topics for p in range(len(self.broker.log(t)))]
+        for tp in partitions:
+            self.positions[(tp.topic, tp.partition)] = 0
+        if on_assign:
+            on_assign(self, partitions)
+
+    def assignment(self):
+        return [TopicPartition(t, p) for t, p in self.positions]
+
+    def position(self, partitions):
+        return [TopicPartition(tp.topic, tp.partition, self.positions[(tp.topic, tp.partition)]) for tp in partitions]
+
+    def get_watermark_offsets(self, tp, cached=False, timeout=None):
+        return 0, len(self.broker.log(tp.topic)[tp.partition])
+
+    def pause(self, partitions):
+        self.paused.update((tp.topic, tp.partition) for tp in partitions)
+
+    def resume(self, partitions):
+        self.paused.difference_update((tp.topic, tp.partition) for tp in partitions)
+
+    def seek(self, tp):
+        self.positions[(tp.topic, tp.partition)] = tp.offset
+
+    def commit(self, offsets=None, asynchronous=True):
+        for tp in offsets or []:
+            self.committed[(tp.topic, tp.partition)] = tp.offset
+
+    def _take(self, num_messages):
+        out = []
+        active = [tp for tp in self.positions if tp not in self.paused]
+        for i in range(len(active)):
+            # Rotate the starting partition so no partition starves
+            topic, partition = active[(self._next + i) % len(active)]
+            log = self.broker.logs[topic][partition]
+            start = self.positions[(topic, partition)]
+            chunk = log[start:start + num_messages - len(out)]
+            self.positions[(topic, partition)] = start + len(chunk)
+            out.extend(chunk)
+            if len(out) >= num_messages:
+                break
+        self._next += 1
+        return out
+
+    def consume(self, num_messages=1, timeout=-1):
+        deadline = time.monotonic() + max(timeout, 0)
+        with self.broker.cond:
+            while True:
+                out = self._take(num_messages)
+                remaining = deadline - time.monotonic()
+                if out or remaining <= 0:
+                    return out
+                self.broker.cond.wait(remaining)
+
+    def close(self):
+        pass
+
+
+# ─── Workload ────────────────────────────────────────────────────────────────
+def synthetic_play(n_tracks: int = 500, n_users: int = 100) -> Dict:
+    track = random.randrange(n_tracks)
+    return {
+        "play_id": str(uuid.uuid4()),
+        "user_id": f"user_{random.randrange(n_users)}",
+        "track_id": f"track_{track}",
+        "artist_id": f"artist_{track % 50}",
+        "play_ts": datetime.now(timezone.utc).replace(tzinfo=None),
+        "track_language": "en",
+        "device": random.choice(DEVICES),
+        "play_duration_seconds": random.randint(30, 300),
+        "skipped": random.random() < 0.1,
+    }
+
+
+def make_value_fn(encoding: str):
+    if encoding == "json":
+        return lambda record: json.dumps({**record, "play_ts": record["play_ts"].isoformat()}).encode("utf-8")
+    codec = SchemaCodec()
+    return lambda record: codec.encode(consumer_mod.PLAYS_TOPIC, record)
+
+
+def drive_producer(producer, topic: str, rate: float, duration: float, value_fn, stats: DeliveryStats) -> int:
+    """Produce synthetic plays at `rate` events/sec for `duration` seconds; returns the count."""
+    sent, started = 0, time.monotonic()
+    while True:
+        elapsed = time.monotonic() - started
+        if elapsed >= duration:
+            break
+        target = int(rate * elapsed)
+        while sent < target:
+            record = synthetic_play()
+            produce(producer, topic, record["play_id"], value_fn(record), stats)
+            sent += 1
+        producer.poll(0)
+        time.sleep(0.001)
+    producer.flush()
+    return sent
+
+
+# ─── Harness ─────────────────────────────────────────────────────────────────
+class LatencyRecorder:
+    """Wraps a load function and records produced → loaded latency per record."""
+
+    def __init__(self, load_fn):
+        self.load_fn = load_fn
+        self.latencies_ms: List[float] = []
+        self.loaded = 0
+        self.first_loaded_at: Optional[float] = None
+        self.last_loaded_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def __call__(self, topic, records):
+        ok = self.load_fn(topic, records)
+        if ok:
+            now = time.time()
+            lat = [now * 1000 - to_epoch_ms(r["play_ts"]) for r in records if r.get("play_ts") is not None]
+            with self._lock:
+                self.latencies_ms.extend(lat)
+                self.loaded += len(records)
+                self.first_loaded_at = self.first_loaded_at or now
+                self.last_loaded_at = now
+        return ok
+
+
+def load_plays(records, wh, table: str = LOADTEST_TABLE) -> bool:
+    """Append a batch of plays, typed like RAW_LISTENING_HISTORY, to `table` (created by the first batch)."""
+    df = consumer_mod.records_to_frame(consumer_mod.PLAYS_TOPIC, records)
+    return consumer_mod.load_df_to_snowflake(df, table, truncate_first=False, create_if_missing=True, wh=wh)
+
+
+def _percentiles(values: List[float]) -> Dict[str, float]:
+    if not values:
+        return {}
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {"p50_ms": round(p50, 1), "p95_ms": round(p95, 1), "p99_ms": round(p99, 1), "max_ms": round(max(values), 1)}
+
+
+def run_loadtest(rate=5000, duration=10.0, mode="batch", batch_size=consumer_mod.BATCH_SIZE,
+                 linger_sec=consumer_mod.LINGER_SEC, partitions=4, bootstrap=None, topic=LOADTEST_TOPIC,
+                 encoding="msgpack", wh=None, drain_timeout=60.0, table=LOADTEST_TABLE) -> Dict:
+    """Run one load test and return its report."""
+    if bootstrap:
+        from confluent_kafka import Consumer, Producer
+
+        producer = Producer({**build_producer_conf(), "bootstrap.servers": bootstrap})
+        consumer = Consumer({**consumer_mod.KAFKA_CONFIG, "bootstrap.servers": bootstrap,
+                             "group.id": f"spotify-loadtest-{uuid.uuid4().hex[:8]}", "auto.offset.reset": "latest"})
+    else:
+        broker = InProcessBroker(partitions)
+        producer, consumer = StandInProducer(broker), StandInConsumer(broker)
+
+    # Plays are written to `table` directly; the consumer's topic → table mapping is left alone
+    recorder = LatencyRecorder(lambda t, records: load_plays(records, wh, table))
+    if mode == "pipeline":
+        from kafka.pipeline import PipelinedConsumer
+
+        loader = PipelinedConsumer(consumer, wh, batch_size=batch_size, linger_sec=linger_sec, load_fn=recorder)
+        step, close = loader.step, loader.close
+    else:
+        loader = consumer_mod.BatchingLoader(consumer, wh, batch_size=batch_size, linger_sec=linger_sec)
+        loader.batcher.flush_fn = recorder
+        step, close = (lambda: consumer_mod.poll_once(consumer, loader)), loader.close
+    consumer.subscribe([topic], on_assign=loader.on_assign, on_revoke=loader.on_revoke)
+
+    if bootstrap:
+        # Wait for the assignment so 'latest' starts before the first produced event
+        deadline = time.monotonic() + 30
+        while not consumer.assignment() and time.monotonic() < deadline:
+            consumer.poll(0.5)
+
+    stats = DeliveryStats()
+    produced = {}
+    producer_thread = threading.Thread(
+        target=lambda: produced.setdefault("n", drive_producer(producer, topic, rate, duration,
+                                                                make_value_fn(encoding), stats)),
+        name="loadtest-producer")
+    started = time.time()
+    producer_thread.start()
+
+    while producer_thread.is_alive():
+        step()
+    drain_deadline = time.monotonic() + drain_timeout
+    while recorder.loaded < produced["n"] and time.monotonic() < drain_deadline:
+        step()
+    close()
+    consumer.close()
+
+    wall = (recorder.last_loaded_at or time.time()) - started
+    delivery = stats.summary()
+    return {
+        "mode": mode,
+        "broker": bootstrap or "in-process",
+        "warehouse": getattr(wh, "name", None),
+        "table": table,
+        "target_rate": rate,
+        "duration_sec": duration,
+        "batch_size": batch_size,
+        "produced": produced["n"],
+        "delivery_errors": delivery["errors"],
+        "producer_msgs_per_sec": round(produced["n"] / duration, 1),
+        "loaded": recorder.loaded,
+        "sustained_records_per_sec": round(recorder.loaded / wall, 1) if wall > 0 else 0.0,
+        "latency": _percentiles(recorder.latencies_ms),
+        "pauses": getattr(loader, "pauses", 0),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Producer → Kafka → consumer → warehouse load test")
+    parser.add_argument("--rate", type=float, default=5000, help="events per second")
+    parser.add_argument("--duration", type=float, default=10, help="seconds of production")
+    parser.add_argument("--mode", choices=("batch", "pipeline"), default="batch")
+    parser.add_argument("--batch-size", type=int, default=consumer_mod.BATCH_SIZE)
+    parser.add_argument("--linger-ms", type=int, default=int(consumer_mod.LINGER_SEC * 1000))
+    parser.add_argument("--partitions", type=int, default=4, help="partitions of the in-process topic")
+    parser.add_argument("--bootstrap", default=None, help="real broker (e.g. localhost:9092) instead of the stand-in")
+    parser.add_argument("--topic", default=LOADTEST_TOPIC)
+    parser.add_argument("--encoding", choices=("msgpack", "json"), default="msgpack")
+    parser.add_argument("--warehouse", choices=("duckdb", "env"), default="duckdb",
+                        help="duckdb: throwaway DuckDB file; env: WAREHOUSE_BACKEND")
+    parser.add_argument("--table", default=LOADTEST_TABLE, help="raw table the synthetic plays are appended to")
+    parser.add_argument("--report", default=None, help="write the JSON report here")
+    parser.add_argument("--verbose", action="store_true", help="keep the loader's per-batch output")
+    args = parser.parse_args(argv)
+    if args.table.upper() == consumer_mod.TOPIC_TABLES[consumer_mod.PLAYS_TOPIC][0]:
+        parser.error("--table must not be the real plays table")
+
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING)
+
+    tmpdir = tempfile.TemporaryDirectory() if args.warehouse == "duckdb" else None
+    wh = (get_warehouse("duckdb", path=os.path.join(tmpdir.name, "loadtest.duckdb")) if tmpdir
+          else get_warehouse())
+    wh.connect()
+    try:
+        with contextlib.ExitStack() as quiet:
+            if not args.verbose:
+                quiet.enter_context(contextlib.redirect_stdout(quiet.enter_context(open(os.devnull, "w"))))
+            report = run_loadtest(rate=args.rate, duration=args.duration, mode=args.mode, batch_size=args.batch_size,
+                                  linger_sec=args.linger_ms / 1000.0, partitions=args.partitions,
+                                  bootstrap=args.bootstrap, topic=args.topic, encoding=args.encoding, wh=wh,
+                                  table=args.table)
+    finally:
+        wh.close()
+        if tmpdir:
+            tmpdir.cleanup()
+
+    lat = report["latency"]
+    print(f"🚀 {report['produced']:,} events produced ({report['producer_msgs_per_sec']:,.0f}/sec target "
+          f"{args.rate:,.0f}/sec, {report['delivery_errors']} delivery errors)")
+    print(f"📥 {report['loaded']:,} loaded, sustained {report['sustained_records_per_sec']:,.0f} records/sec "
+          f"[{report['mode']}, batch {report['batch_size']}, {report['broker']}, "
+          f"{report['warehouse']}.{report['table']}]")
+    if lat:
+        print(f"⏱️  end-to-end latency p50={lat['p50_ms']}ms p95={lat['p95_ms']}ms "
+              f"p99={lat['p99_ms']}ms max={lat['max_ms']}ms")
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"📝 Report written to {args.report}")
+    return report
+
+
+if __name__ == "__main__":
+    main()
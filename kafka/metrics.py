@@ -0,0 +1,205 @@
+"""
+kafka/metrics.py
+────────────────────────────────────────────────────────
+Consumer-side metrics: per-partition lag, records/sec, batch
+sizes, flush latency and commit latency.
+
+ConsumerMetrics is updated by BatchingLoader and the poll loop
+and rendered in the Prometheus text format on
+http://localhost:<CONSUMER_METRICS_PORT>/metrics (default 9108,
+0 disables the endpoint). A one-line summary is logged every
+METRICS_SUMMARY_SEC seconds.
+"""
+
+import bisect
+import logging
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional, Sequence, Tuple
+
+from confluent_kafka import TopicPartition
+
+METRICS_PORT = int(os.getenv("CONSUMER_METRICS_PORT", "9108"))
+SUMMARY_SEC = float(os.getenv("METRICS_SUMMARY_SEC", "30"))
+LAG_REFRESH_SEC = 5.0
+
+BATCH_SIZE_BUCKETS = (1, 10, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+LATENCY_BUCKETS_SEC = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class Histogram:
+    """Fixed-bucket histogram with Prometheus (cumulative, le=) exposition."""
+
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def lines(self, name: str):
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            yield f'{name}_bucket{{le="{bound}"}} {cumulative}'
+        yield f'{name}_bucket{{le="+Inf"}} {self.count}'
+        yield f"{name}_sum {self.sum}"
+        yield f"{name}_count {self.count}"
+
+    def mean(self) -> float:
+        return self.sum / self.count if self.count else 0.0
+
+
+class ConsumerMetrics:
+    """Counters, histograms and lag gauges for one consumer process."""
+
+    def __init__(self, group: str = "spotify-consumer-group", clock=time.monotonic):
+        self.group = group
+        self.clock = clock
+        self._lock = threading.Lock()
+        self.records: Dict[str, int] = {}
+        self.batches = 0
+        self.flush_failures = 0
+        self.commit_failures = 0
+        self.batch_size = Histogram(BATCH_SIZE_BUCKETS)
+        self.flush_seconds = Histogram(LATENCY_BUCKETS_SEC)
+        self.commit_seconds = Histogram(LATENCY_BUCKETS_SEC)
+        self.lag: Dict[Tuple[str, int], int] = {}
+        self._rate = 0.0
+        self._rate_mark = (clock(), 0)
+        self._next_lag = 0.0
+        self._next_summary = clock() + SUMMARY_SEC
+
+    # ─── Updates ─────────────────────────────────────────────────────────────
+    def observe_flush(self, loaded: Dict[str, int], seconds: float, failed: bool = False):
+        """Record one flush: records loaded per topic, its duration and whether any topic failed."""
+        with self._lock:
+            self.flush_seconds.observe(seconds)
+            if failed:
+                self.flush_failures += 1
+            if loaded:
+                self.batches += 1
+                self.batch_size.observe(sum(loaded.values()))
+                for topic, n in loaded.items():
+                    self.records[topic] = self.records.get(topic, 0) + n
+
+    def observe_commit(self, seconds: float, ok: bool):
+        with self._lock:
+            self.commit_seconds.observe(seconds)
+            if not ok:
+                self.commit_failures += 1
+
+    def update_lag(self, consumer):
+        """Lag = high watermark − position for every assigned partition (cached watermarks, no broker call)."""
+        partitions = consumer.assignment()
+        if not partitions:
+            return
+        lag = {}
+        for tp in consumer.position(partitions):
+            try:
+                _, high = consumer.get_watermark_offsets(TopicPartition(tp.topic, tp.partition), cached=True)
+            except Exception:
+                continue
+            if high >= 0 and tp.offset >= 0:
+                lag[(tp.topic, tp.partition)] = max(0, high - tp.offset)
+        with self._lock:
+            self.lag = lag
+
+    def _update_rate(self, now: float):
+        with self._lock:
+            total = sum(self.records.values())
+        last_ts, last_total = self._rate_mark
+        if now > last_ts:
+            self._rate = (total - last_total) / (now - last_ts)
+            self._rate_mark = (now, total)
+
+    def tick(self, consumer=None):
+        """Called from the poll loop: refresh rate and lag, log the periodic summary."""
+        now = self.clock()
+        if now >= self._next_lag:
+            self._update_rate(now)
+            if consumer is not None:
+                try:
+                    self.update_lag(consumer)
+                except Exception as e:
+                    logging.debug(f"Lag refresh failed: {e}")
+            self._next_lag = now + LAG_REFRESH_SEC
+        if now >= self._next_summary:
+            logging.info(self.summary())
+            self._next_summary = now + SUMMARY_SEC
+
+    # ─── Output ──────────────────────────────────────────────────────────────
+    def summary(self) -> str:
+        rate = self._rate
+        with self._lock:
+            total_lag = sum(self.lag.values())
+            worst = max(self.lag.items(), key=lambda kv: kv[1], default=None)
+            return (f"📊 {rate:,.0f} records/sec | {sum(self.records.values()):,} records in {self.batches} batches "
+                    f"(avg {self.batch_size.mean():,.0f}) | flush avg {self.flush_seconds.mean() * 1000:.0f}ms, "
+                    f"commit avg {self.commit_seconds.mean() * 1000:.0f}ms | lag {total_lag:,}"
+                    + (f" (max {worst[0][0]}[{worst[0][1]}]={worst[1]:,})" if worst else "")
+                    + (f" | {self.flush_failures} failed flushes" if self.flush_failures else ""))
+
+    def render(self) -> str:
+        """Prometheus text exposition format (version 0.0.4)."""
+        rate = self._rate
+        g = f'group="{self.group}"'
+        with self._lock:
+            lines = [
+                "# HELP spotify_consumer_records_total Records written to the sink.",
+                "# TYPE spotify_consumer_records_total counter",
+                *(f'spotify_consumer_records_total{{{g},topic="{t}"}} {n}' for t, n in sorted(self.records.items())),
+                "# HELP spotify_consumer_records_per_second Records written per second over the last refresh interval.",
+                "# TYPE spotify_consumer_records_per_second gauge",
+                f"spotify_consumer_records_per_second{{{g}}} {rate:.3f}",
+                "# TYPE spotify_consumer_batches_total counter",
+                f"spotify_consumer_batches_total{{{g}}} {self.batches}",
+                "# TYPE spotify_consumer_flush_failures_total counter",
+                f"spotify_consumer_flush_failures_total{{{g}}} {self.flush_failures}",
+                "# TYPE spotify_consumer_commit_failures_total counter",
+                f"spotify_consumer_commit_failures_total{{{g}}} {self.commit_failures}",
+                "# HELP spotify_consumer_lag Messages between the partition high watermark and the consumer position.",
+                "# TYPE spotify_consumer_lag gauge",
+                *(f'spotify_consumer_lag{{{g},topic="{t}",partition="{p}"}} {lag}'
+                  for (t, p), lag in sorted(self.lag.items())),
+                "# TYPE spotify_consumer_batch_size histogram",
+                *self.batch_size.lines("spotify_consumer_batch_size"),
+                "# TYPE spotify_consumer_flush_seconds histogram",
+                *self.flush_seconds.lines("spotify_consumer_flush_seconds"),
+                "# TYPE spotify_consumer_commit_seconds histogram",
+                *self.commit_seconds.lines("spotify_consumer_commit_seconds"),
+            ]
+        return "\n".join(lines) + "\n"
+
+
+def start_http_server(metrics: ConsumerMetrics, port: int = METRICS_PORT, host: str = "127.0.0.1") \
+        -> Optional[ThreadingHTTPServer]:
+    """Serve metrics.render() on /metrics from a daemon thread (None when port is 0)."""
+    if not port:
+        return None
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = metrics.render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass  # scrapes would flood the consumer log
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    logging.info(f"Metrics on http://{host}:{port}/metrics")
+    return server
@@ -0,0 +1,95 @@
+"""
+kafka/offsets.py
+────────────────────────────────────────────────────────
+Bookkeeping for the consumer's at-least-once protocol.
+
+Auto-commit is disabled; OffsetTracker remembers the offset
+range buffered for each topic/partition so offsets are only
+committed once the batch holding them has been written to
+the warehouse, and so a failed batch can be rewound.
+ReplayFilter drops messages that were already loaded when a
+rewound or re-delivered batch comes back around.
+"""
+
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from confluent_kafka import TopicPartition
+
+TP = Tuple[str, int]
+
+
+class OffsetTracker:
+    """First/last buffered offset per (topic, partition)."""
+
+    def __init__(self):
+        self._ranges: Dict[TP, List[int]] = {}
+
+    def __len__(self):
+        return len(self._ranges)
+
+    def track(self, topic: str, partition: int, offset: int):
+        rng = self._ranges.get((topic, partition))
+        if rng is None:
+            self._ranges[(topic, partition)] = [offset, offset]
+        else:
+            rng[0] = min(rng[0], offset)
+            rng[1] = max(rng[1], offset)
+
+    def partitions(self, topics: Optional[Iterable[str]] = None) -> List[TP]:
+        topics = set(topics) if topics is not None else None
+        return [tp for tp in self._ranges if topics is None or tp[0] in topics]
+
+    def ranges(self, topics: Optional[Iterable[str]] = None) -> List[Tuple[str, int, int, int]]:
+        """(topic, partition, first, last) of the buffered offsets."""
+        return [(t, p, *self._ranges[(t, p)]) for t, p in self.partitions(topics)]
+
+    def commit_offsets(self, topics: Optional[Iterable[str]] = None) -> List[TopicPartition]:
+        """Offsets to commit (last buffered + 1) for the given topics."""
+        return [TopicPartition(t, p, self._ranges[(t, p)][1] + 1) for t, p in self.partitions(topics)]
+
+    def rewind_offsets(self, topics: Optional[Iterable[str]] = None) -> List[TopicPartition]:
+        """Offsets to seek back to (first buffered) so a failed batch is re-consumed."""
+        return [TopicPartition(t, p, self._ranges[(t, p)][0]) for t, p in self.partitions(topics)]
+
+    def forget(self, topics: Optional[Iterable[str]] = None, partitions: Optional[Iterable[TP]] = None):
+        if partitions is not None:
+            drop = set(partitions)
+        else:
+            drop = set(self.partitions(topics))
+        for tp in drop:
+            self._ranges.pop(tp, None)
+
+
+class ReplayFilter:
+    """
+    Bounded memory of the last loaded offset per message key.
+
+    A message is a replay when its key was already loaded from the same
+    partition at the same or a later offset; newer versions of a key
+    (higher offsets) still pass.
+    """
+
+    def __init__(self, max_keys: int = 100_000):
+        self.max_keys = max_keys
+        self._seen: "OrderedDict[Tuple[str, int, bytes], int]" = OrderedDict()
+        self.replays = 0
+
+    def is_replay(self, topic: str, partition: int, key, offset: int) -> bool:
+        if key is None:
+            return False
+        loaded = self._seen.get((topic, partition, key))
+        if loaded is not None and offset <= loaded:
+            self.replays += 1
+            return True
+        return False
+
+    def mark_loaded(self, entries: Iterable[Tuple[str, int, bytes, int]]):
+        for topic, partition, key, offset in entries:
+            if key is None:
+                continue
+            k = (topic, partition, key)
+            self._seen[k] = max(offset, self._seen.get(k, -1))
+            self._seen.move_to_end(k)
+        while len(self._seen) > self.max_keys:
+            self._seen.popitem(last=False)
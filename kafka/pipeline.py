@@ -0,0 +1,341 @@
+"""
+kafka/pipeline.py
+────────────────────────────────────────────────────────
+Pipelined consumer: polling, decoding and loading run as
+separate stages connected by bounded buffers.
+
+  poll (main thread) ─▶ decode/transform pool ─▶ batch ─▶ loader thread
+                                                          │
+  commit / seek (main thread) ◀────── load results ◀──────┘
+
+The main thread owns the Kafka consumer: it polls, hands raw
+values to a thread pool that decodes and enriches them, cuts
+micro-batches and queues them for a single loader thread. While
+the warehouse write runs, polling continues, so the consumer keeps
+serving heartbeats and stays in the group. When more than
+PIPELINE_MAX_BUFFERED messages are in flight the assigned
+partitions are paused (polling keeps going but returns nothing)
+and resumed once the backlog halves.
+
+Batches are loaded and committed strictly in order. A failed
+batch rewinds every partition to its first uncommitted offset and
+discards everything behind it, so the at-least-once guarantee of
+BatchingLoader is kept.
+
+The warehouse connection is used by the loader thread only: it
+also runs the periodic DimensionCache refresh, between loads or
+while idle, since neither the Snowflake connector nor DuckDB
+supports one connection used from two threads at once.
+
+Usage:
+  python -m kafka.pipeline
+"""
+
+import logging
+import os
+import queue
+import threading
+import time
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+from confluent_kafka import Consumer, TopicPartition
+from ingestion import load_to_snowflake
+from kafka.codec import SchemaCodec
+from kafka.consumer import (BATCH_SIZE, KAFKA_CONFIG, LINGER_SEC, PLAYS_TOPIC, TOPIC_NAME, TOPIC_TABLES,
+                            load_batch, make_enricher)
+from kafka.metrics import METRICS_PORT, ConsumerMetrics, start_http_server
+from kafka.offsets import OffsetTracker
+
+DECODE_WORKERS = int(os.getenv("PIPELINE_DECODE_WORKERS", "4"))
+MAX_INFLIGHT_BATCHES = int(os.getenv("PIPELINE_MAX_INFLIGHT_BATCHES", "2"))
+MAX_BUFFERED = int(os.getenv("PIPELINE_MAX_BUFFERED", str(BATCH_SIZE * 4)))
+POLL_BATCH = 500
+
+
+class _Batch:
+    """Decoded records of one micro-batch plus the offsets they cover."""
+
+    def __init__(self, epoch: int):
+        self.epoch = epoch
+        self.records: Dict[str, List] = defaultdict(list)
+        self.offsets = OffsetTracker()
+        self.size = 0
+        self.first_at: Optional[float] = None
+
+
+class PipelinedConsumer:
+    """Poll / decode / load stages with bounded buffers and partition pause/resume."""
+
+    def __init__(self, consumer, wh=None, batch_size=BATCH_SIZE, linger_sec=LINGER_SEC, decode_workers=DECODE_WORKERS,
+                 max_inflight_batches=MAX_INFLIGHT_BATCHES, max_buffered=MAX_BUFFERED, enricher=None, metrics=None,
+                 load_fn=None, clock=time.monotonic):
+        self.consumer = consumer
+        self.batch_size = batch_size
+        self.linger_sec = linger_sec
+        self.max_buffered = max(max_buffered, batch_size)
+        self.enricher = enricher
+        self.metrics = metrics
+        self.load_fn = load_fn or (lambda topic, records: load_batch(topic, records, wh=wh))
+        self.clock = clock
+        self.codec = SchemaCodec()
+
+        self._epoch = 0                     # bumped on rewind; stale work is dropped
+        self._batch = _Batch(self._epoch)
+        self._decoding = deque()            # (epoch, n messages, first offset per partition, future)
+        self._inflight = deque()            # batches handed to the loader, oldest first
+        self._load_queue = queue.Queue(maxsize=max_inflight_batches)
+        self._results = queue.Queue()
+        self._pool = ThreadPoolExecutor(decode_workers, thread_name_prefix="decode")
+        self._loader = threading.Thread(target=self._load_loop, name="loader", daemon=True)
+        self._loader.start()
+
+        self.paused = False
+        self.pauses = 0
+        self.failures = 0
+        self.records_loaded = 0
+        self.batches = 0
+
+    # ─── Decode stage (worker threads) ───────────────────────────────────────
+    def _decode(self, items):
+        out = []
+        for topic, partition, offset, value in items:
+            try:
+                record = self.codec.decode(value)
+            except Exception as e:
+                logging.error(f"Undecodable message {topic}[{partition}]@{offset}: {e}")
+                record = None
+            if record is not None and self.enricher is not None:
+                if topic == PLAYS_TOPIC:
+                    record = self.enricher.enrich(record)
+                elif topic == TOPIC_NAME:
+                    self.enricher.cache.update_tracks([record])
+            out.append((topic, partition, offset, record))
+        return out
+
+    # ─── Load stage (loader thread) ──────────────────────────────────────────
+    def _refresh_dimensions(self):
+        # On the loader thread: the cache queries the loader's warehouse connection
+        if self.enricher is not None:
+            self.enricher.cache.refresh()
+
+    def _load_loop(self):
+        while True:
+            try:
+                batch = self._load_queue.get(timeout=1.0)
+            except queue.Empty:
+                self._refresh_dimensions()
+                continue
+            if batch is None:
+                return
+            self._refresh_dimensions()
+            if batch.epoch != self._epoch:
+                self._results.put((batch, None))   # discarded by a rewind
+                continue
+            started = time.monotonic()
+            results = {}
+            for topic, records in batch.records.items():
+                try:
+                    results[topic] = bool(self.load_fn(topic, records))
+                except Exception as e:
+                    logging.error(f"Loading {len(records)} records for {topic} failed: {e}")
+                    results[topic] = False
+            if self.metrics is not None:
+                loaded = {t: len(batch.records[t]) for t, ok in results.items() if ok}
+                self.metrics.observe_flush(loaded, time.monotonic() - started, not all(results.values()))
+            self._results.put((batch, results))
+
+    # ─── Main thread ─────────────────────────────────────────────────────────
+    def buffered(self) -> int:
+        """Messages polled but not yet committed or discarded."""
+        return sum(n for _, n, _, _ in self._decoding) + self._batch.size + sum(b.size for b in self._inflight)
+
+    def poll(self, timeout: float):
+        items, firsts = [], {}
+        room = max(1, min(POLL_BATCH, self.max_buffered - self.buffered()))
+        for msg in self.consumer.consume(num_messages=room, timeout=timeout):
+            if msg.error():
+                logging.error(f"Consumer error: {msg.error()}")
+                continue
+            tp = (msg.topic(), msg.partition())
+            firsts.setdefault(tp, msg.offset())
+            items.append((msg.topic(), msg.partition(), msg.offset(), msg.value()))
+        if items:
+            self._decoding.append((self._epoch, len(items), firsts, self._pool.submit(self._decode, items)))
+
+    def _collect(self, wait: bool = False):
+        """Move finished decode chunks, in poll order, into the current batch."""
+        while self._decoding and (wait or self._decoding[0][3].done()):
+            epoch, _, _, future = self._decoding.popleft()
+            decoded = future.result()
+            if epoch != self._epoch:
+                continue
+            for topic, partition, offset, record in decoded:
+                if self._batch.size >= self.batch_size:
+                    self._dispatch()
+                batch = self._batch
+                if batch.first_at is None:
+                    batch.first_at = self.clock()
+                if record is not None:
+                    batch.records[topic].append(record)
+                batch.offsets.track(topic, partition, offset)
+                batch.size += 1
+
+    def _batch_due(self) -> bool:
+        batch = self._batch
+        return batch.size >= self.batch_size or (
+            batch.size > 0 and self.clock() - batch.first_at >= self.linger_sec)
+
+    def _dispatch(self, block: bool = False):
+        """Hand the current batch to the loader (if due, or whenever `block`)."""
+        if self._batch.size == 0 or not (block or self._batch_due()):
+            return
+        try:
+            self._load_queue.put(self._batch, block=block)
+        except queue.Full:
+            return   # loader busy: keep buffering, backpressure pauses polling if it grows
+        self._inflight.append(self._batch)
+        self._batch = _Batch(self._epoch)
+
+    def _complete(self, wait: bool = False):
+        """Commit (or rewind) the batches the loader has finished, oldest first."""
+        while self._inflight:
+            try:
+                batch, results = self._results.get(timeout=1.0) if wait else self._results.get_nowait()
+            except queue.Empty:
+                if wait:
+                    continue
+                return
+            self._inflight.popleft()
+            if results is None or batch.epoch != self._epoch:
+                continue
+            if not all(results.values()):
+                self._rewind(batch, [t for t, ok in results.items() if not ok])
+                continue
+            self._commit(batch.offsets.commit_offsets())
+            self.failures = 0
+            self.records_loaded += sum(len(r) for r in batch.records.values())
+            self.batches += 1
+
+    def _commit(self, offsets: List[TopicPartition]):
+        if not offsets:
+            return
+        started = time.monotonic()
+        ok = True
+        try:
+            self.consumer.commit(offsets=offsets, asynchronous=False)
+        except Exception as e:
+            # Data is in the warehouse; a replay is absorbed by the upsert / dbt dedupe
+            logging.error(f"Offset commit failed: {e}")
+            ok = False
+        if self.metrics is not None:
+            self.metrics.observe_commit(time.monotonic() - started, ok)
+
+    def _rewind(self, failed: _Batch, topics: List[str]):
+        """Drop everything behind the failed batch and seek back to its first uncommitted offsets."""
+        rewind: Dict[tuple, int] = {}
+
+        def note(tp, first):
+            rewind[tp] = min(rewind.get(tp, first), first)
+
+        for batch in (failed, *self._inflight, self._batch):
+            for topic, partition, first, _ in batch.offsets.ranges():
+                note((topic, partition), first)
+        for _, _, firsts, _ in self._decoding:
+            for tp, first in firsts.items():
+                note(tp, first)
+
+        self._epoch += 1
+        self._batch = _Batch(self._epoch)
+        self._decoding.clear()
+        for (topic, partition), offset in rewind.items():
+            try:
+                self.consumer.seek(TopicPartition(topic, partition, offset))
+            except Exception as e:
+                # Partition was revoked meanwhile; its new owner resumes from the last commit
+                logging.warning(f"Could not rewind {topic}[{partition}]: {e}")
+
+        self.failures += 1
+        backoff = min(30.0, 0.5 * 2 ** (self.failures - 1))
+        logging.error(f"Batch of {failed.size} messages failed for {topics}; rewound {len(rewind)} partitions, "
+                      f"retrying in {backoff:.1f}s")
+        time.sleep(backoff)
+
+    def _backpressure(self):
+        buffered = self.buffered()
+        if not self.paused and buffered >= self.max_buffered:
+            assignment = self.consumer.assignment()
+            self.consumer.pause(assignment)
+            self.paused, self.pauses = True, self.pauses + 1
+            logging.info(f"⏸️  Paused {len(assignment)} partitions ({buffered:,} messages buffered)")
+        elif self.paused and buffered <= self.max_buffered // 2:
+            self.consumer.resume(self.consumer.assignment())
+            self.paused = False
+            logging.info(f"▶️  Resumed partitions ({buffered:,} messages buffered)")
+
+    def step(self):
+        """One iteration of the main loop."""
+        self._complete()
+        self._collect()
+        self._dispatch()
+        self._backpressure()
+        busy = self._decoding or self._inflight or self._batch.size
+        self.poll(timeout=0.05 if busy else min(1.0, self.linger_sec))
+
+    def drain(self):
+        """Decode, load and commit everything polled so far (rebalance / shutdown)."""
+        self._collect(wait=True)
+        self._dispatch(block=True)
+        self._complete(wait=True)
+
+    def close(self):
+        self.drain()
+        self._load_queue.put(None)
+        self._loader.join()
+        self._pool.shutdown(wait=True)
+
+    def on_revoke(self, consumer, partitions):
+        logging.info(f"Partitions revoked: {[(p.topic, p.partition) for p in partitions]}; draining pipeline")
+        self.drain()
+
+    def on_assign(self, consumer, partitions):
+        logging.info(f"Partitions assigned: {[(p.topic, p.partition) for p in partitions]}")
+        if self.paused:
+            consumer.pause(partitions)
+
+
+def run(pipeline, should_stop=lambda: False, on_tick=None):
+    while not should_stop():
+        pipeline.step()
+        if on_tick:
+            on_tick()
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s | %(threadName)s | %(message)s")
+    logging.info("Starting pipelined Kafka consumer")
+
+    consumer = Consumer(KAFKA_CONFIG)
+    wh = load_to_snowflake._get_conn()
+    metrics = ConsumerMetrics(KAFKA_CONFIG['group.id'])
+    pipeline = PipelinedConsumer(consumer, wh, enricher=make_enricher(wh), metrics=metrics)
+    consumer.subscribe(list(TOPIC_TABLES), on_assign=pipeline.on_assign, on_revoke=pipeline.on_revoke)
+    server = start_http_server(metrics, METRICS_PORT)
+
+    try:
+        run(pipeline, on_tick=lambda: metrics.tick(consumer))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        pipeline.close()
+        consumer.close()
+        wh.close()
+        if server is not None:
+            server.shutdown()
+        logging.info(f"Pipelined consumer shut down ({pipeline.records_loaded:,} records, "
+                     f"{pipeline.pauses} pauses). {metrics.summary()}")
+
+
+if __name__ == '__main__':
+    main()
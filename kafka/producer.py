@@ -4,16 +4,31 @@ kafka/producer.py
 Fetch top-tracks data from Spotify (via ingestion.crawl)
 and publish each track record to a Kafka topic.
 
+PRODUCER_PROFILE=throughput switches on batching, compression
+and idempotence; individual knobs can be overridden with
+PRODUCER_LINGER_MS, PRODUCER_BATCH_SIZE, PRODUCER_COMPRESSION
+and PRODUCER_IDEMPOTENCE. Delivery callbacks only update
+counters and a latency histogram (DeliveryStats); a summary is
+logged every PRODUCER_SUMMARY_SEC seconds.
+
+Values are encoded with the schema-ID msgpack codec
+(kafka/codec.py) unless PRODUCER_ENCODING=json.
+
 Requires:
   • confluent-kafka
   • ingestion/crawl.py with fetch_artists_and_tracks()
   • SPOTIFY creds already handled inside crawl.py
 """
 
+import bisect
 import json
 import logging
+import os
+import time
 from confluent_kafka import Producer
 from ingestion.crawl import fetch_artists_and_tracks  # <-- your crawler wrapper
+from ingestion.payloads import strip_heavy_fields
+from kafka.codec import SchemaCodec
 
 # ─── Kafka configuration ──────────────────────────────────────────────────────
 KAFKA_BOOTSTRAP = "localhost:9092"      # use 'kafka:9092' if running inside Docker
@@ -22,15 +37,115 @@ TOPIC_NAME      = "spotify.tracks.raw"
 producer_conf = {
     "bootstrap.servers": KAFKA_BOOTSTRAP,
     "client.id": "spotify-producer",
-    # Optional: tune batch size / linger for higher throughput
 }
 
+# Tuning profiles layered on top of producer_conf
+PRODUCER_PROFILES = {
+    "default": {},
+    "throughput": {
+        "linger.ms": 50,                  # wait up to 50 ms to fill a batch
+        "batch.size": 1_000_000,          # bytes per partition batch
+        "compression.type": "lz4",
+        "enable.idempotence": True,       # implies acks=all, no duplicates on retry
+        "queue.buffering.max.messages": 500_000,
+    },
+}
+
+SUMMARY_INTERVAL_SEC = float(os.getenv("PRODUCER_SUMMARY_SEC", "5"))
+ENCODINGS = ("msgpack", "json")
+
+
+def build_producer_conf(profile=None):
+    """producer_conf + the selected profile + PRODUCER_* env overrides."""
+    profile = profile or os.getenv("PRODUCER_PROFILE", "default")
+    if profile not in PRODUCER_PROFILES:
+        raise ValueError(f"Unknown producer profile '{profile}'. Choose one of: {', '.join(PRODUCER_PROFILES)}")
+    conf = {**producer_conf, **PRODUCER_PROFILES[profile]}
+
+    overrides = {
+        "linger.ms": ("PRODUCER_LINGER_MS", int),
+        "batch.size": ("PRODUCER_BATCH_SIZE", int),
+        "compression.type": ("PRODUCER_COMPRESSION", str),
+        "enable.idempotence": ("PRODUCER_IDEMPOTENCE", lambda v: v.lower() in ("1", "true", "yes")),
+    }
+    for key, (env, cast) in overrides.items():
+        if os.getenv(env):
+            conf[key] = cast(os.getenv(env))
+    return conf
+
+
 # ─── Delivery-report callback ─────────────────────────────────────────────────
+class DeliveryStats:
+    """
+    Delivery-report callback that only counts.
+
+    Logging one line per delivered message costs more than producing it;
+    instead we keep delivered/error/byte counters and a fixed-bucket
+    latency histogram, and log a summary periodically.
+    """
+
+    # Upper bounds (ms) of the latency histogram buckets; the last bucket is open-ended
+    LATENCY_BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+    def __init__(self):
+        self.delivered = 0
+        self.errors = 0
+        self.bytes = 0
+        self.histogram = [0] * (len(self.LATENCY_BUCKETS_MS) + 1)
+        self.started = time.monotonic()
+        self._last = (self.started, 0, 0)
+
+    def __call__(self, err, msg):
+        if err is not None:
+            self.errors += 1
+            return
+        self.delivered += 1
+        self.bytes += len(msg.value() or b"")
+        latency = msg.latency()
+        if latency is not None:
+            self.histogram[bisect.bisect_left(self.LATENCY_BUCKETS_MS, latency * 1000)] += 1
+
+    def percentile(self, q):
+        """Upper bound (ms) of the bucket holding the q-th latency percentile."""
+        total = sum(self.histogram)
+        if not total:
+            return None
+        rank, seen = q / 100.0 * total, 0
+        for i, count in enumerate(self.histogram):
+            seen += count
+            if seen >= rank:
+                return self.LATENCY_BUCKETS_MS[i] if i < len(self.LATENCY_BUCKETS_MS) else float("inf")
+        return float("inf")
+
+    def summary(self):
+        """Rates since the previous summary plus cumulative counters."""
+        now = time.monotonic()
+        last_ts, last_msgs, last_bytes = self._last
+        elapsed = max(now - last_ts, 1e-9)
+        self._last = (now, self.delivered, self.bytes)
+        return {
+            "msgs_per_sec": (self.delivered - last_msgs) / elapsed,
+            "bytes_per_sec": (self.bytes - last_bytes) / elapsed,
+            "delivered": self.delivered,
+            "errors": self.errors,
+            "p50_ms": self.percentile(50),
+            "p99_ms": self.percentile(99),
+        }
+
+    def log_summary(self):
+        s = self.summary()
+        logging.info(
+            "📈 %.0f msgs/sec, %.1f KB/sec | delivered=%d errors=%d | latency p50<=%sms p99<=%sms",
+            s["msgs_per_sec"], s["bytes_per_sec"] / 1024, s["delivered"], s["errors"], s["p50_ms"], s["p99_ms"],
+        )
+
+
 def delivery_report(err, msg):
+    """Legacy per-message callback (kept for ad-hoc debugging)."""
     if err is not None:
         logging.error("❌ delivery failed: %s", err)
     else:
-        logging.info(
+        logging.debug(
             "✅ delivered key=%s to %s [%d] @ offset %d",
             msg.key(),
             msg.topic(),
@@ -38,6 +153,28 @@ def delivery_report(err, msg):
             msg.offset()
         )
 
+
+def make_serializer(encoding=None):
+    """Return value_fn(topic, record) -> bytes for the chosen encoding."""
+    encoding = (encoding or os.getenv("PRODUCER_ENCODING", "msgpack")).lower()
+    if encoding not in ENCODINGS:
+        raise ValueError(f"Unknown PRODUCER_ENCODING '{encoding}'. Choose one of: {', '.join(ENCODINGS)}")
+    if encoding == "json":
+        return lambda topic, record: json.dumps(record).encode("utf-8")
+    codec = SchemaCodec()
+    # available_markets & co. are dropped before they ever reach the broker
+    return lambda topic, record: codec.encode(topic, strip_heavy_fields(record))
+
+
+def produce(producer, topic, key, value, callback):
+    """produce() that waits for queue space instead of failing when the local queue is full."""
+    while True:
+        try:
+            producer.produce(topic, key=key, value=value, callback=callback)
+            return
+        except BufferError:
+            producer.poll(0.1)
+
 # ─── Main workflow ───────────────────────────────────────────────────────────
 def main():
     logging.basicConfig(
@@ -53,21 +190,23 @@ def main():
     logging.info("Fetched %d tracks from Spotify API", len(tracks))
 
     # 2. Produce to Kafka
-    producer = Producer(producer_conf)
+    producer = Producer(build_producer_conf())
+    stats = DeliveryStats()
+    serialize = make_serializer()
+    next_summary = time.monotonic() + SUMMARY_INTERVAL_SEC
 
     for track in tracks:
         # Use track ID as Kafka message key (helps partitioning)
         track_id = track.get("id", "")
-        producer.produce(
-            TOPIC_NAME,
-            key=track_id,
-            value=json.dumps(track).encode("utf-8"),
-            callback=delivery_report,
-        )
-        producer.poll(0)        # trigger any queued callbacks immediately
+        produce(producer, TOPIC_NAME, track_id, serialize(TOPIC_NAME, track), stats)
+        producer.poll(0)        # serve queued delivery callbacks
+        if time.monotonic() >= next_summary:
+            stats.log_summary()
+            next_summary += SUMMARY_INTERVAL_SEC
 
     # 3. Wait for all messages to be delivered
     producer.flush()
+    stats.log_summary()
     logging.info("🎉 all tracks sent; exiting")
 
 # ─── Entry-point ──────────────────────────────────────────────────────────────
@@ -0,0 +1,97 @@
+"""
+kafka/schema_registry.py
+────────────────────────────────────────────────────────
+File-backed stand-in for a schema registry.
+
+Schemas are ordered field lists registered under a subject
+("<topic>-value"). Every distinct field list gets a global
+integer ID that is written into each encoded message (see
+kafka/codec.py), so the consumer can decode messages produced
+with any earlier version. The registry lives in a JSON file
+(SCHEMA_REGISTRY_PATH, default kafka/schema_registry.json)
+that is checked in, so IDs are stable across machines.
+"""
+
+import json
+import os
+import tempfile
+from typing import Dict, List, Optional, Tuple
+
+DEFAULT_REGISTRY_PATH = os.path.join(os.path.dirname(__file__), "schema_registry.json")
+
+# Field types understood by the codec; "any" is passed through as a msgpack value
+FIELD_TYPES = ("string", "int", "float", "bool", "timestamp_ms", "any")
+
+Field = Tuple[str, str]
+
+
+def subject_for(topic: str) -> str:
+    return f"{topic}-value"
+
+
+class LocalSchemaRegistry:
+    """Subject → versioned field lists, persisted to a JSON file."""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or os.getenv("SCHEMA_REGISTRY_PATH", DEFAULT_REGISTRY_PATH)
+        self._schemas: Dict[int, Dict] = {}
+        self._subjects: Dict[str, List[int]] = {}
+        self.reload()
+
+    def reload(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        self._schemas = {int(k): v for k, v in data.get("schemas", {}).items()}
+        self._subjects = {s: list(ids) for s, ids in data.get("subjects", {}).items()}
+
+    def _save(self):
+        data = {
+            "schemas": {str(k): v for k, v in sorted(self._schemas.items())},
+            "subjects": self._subjects,
+        }
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        # Write-then-rename so a crashed writer never leaves a half-written registry
+        fd, tmp = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2)
+            f.write("\n")
+        os.replace(tmp, self.path)
+
+    def register(self, subject: str, fields: List[Field]) -> int:
+        """Register a field list under `subject`; returns the existing ID if unchanged."""
+        fields = [[name, ftype] for name, ftype in fields]
+        for name, ftype in fields:
+            if ftype not in FIELD_TYPES:
+                raise ValueError(f"Unknown field type '{ftype}' for {subject}.{name}")
+
+        self.reload()
+        for schema_id in self._subjects.get(subject, []):
+            if self._schemas[schema_id]["fields"] == fields:
+                return schema_id
+
+        schema_id = max(self._schemas, default=0) + 1
+        self._schemas[schema_id] = {"subject": subject, "fields": fields}
+        self._subjects.setdefault(subject, []).append(schema_id)
+        self._save()
+        return schema_id
+
+    def get(self, schema_id: int) -> Dict:
+        """Schema by ID; re-reads the file once for IDs registered by another process."""
+        if schema_id not in self._schemas:
+            self.reload()
+        try:
+            return self._schemas[schema_id]
+        except KeyError:
+            raise KeyError(f"Schema id {schema_id} not found in {self.path}") from None
+
+    def latest(self, subject: str) -> Tuple[int, Dict]:
+        """(ID, schema) of the newest version registered under `subject`."""
+        if subject not in self._subjects:
+            self.reload()
+        ids = self._subjects.get(subject)
+        if not ids:
+            raise KeyError(f"No schema registered for subject '{subject}'")
+        return ids[-1], self._schemas[ids[-1]]
@@ -0,0 +1,249 @@
+"""
+kafka/supervisor.py
+────────────────────────────────────────────────────────
+Run several consumer processes in `spotify-consumer-group`
+so ingest scales with cores and topic partitions.
+
+Each worker is a separate process with its own Kafka
+consumer, warehouse connection and BatchingLoader. Rebalances
+use the cooperative-sticky assignor and flush + commit on
+revoke. Workers report their counters to the supervisor, which
+logs aggregate and per-worker throughput. Worker i serves its
+Prometheus metrics on CONSUMER_METRICS_PORT + i.
+
+A worker that dies is restarted (up to CONSUMER_WORKER_RESTARTS
+times); once a worker has used up its restarts the supervisor
+stops the others and exits non-zero.
+
+Usage:
+  python -m kafka.supervisor --workers 4
+  python -m kafka.supervisor --per-partition
+"""
+
+import argparse
+import logging
+import multiprocessing as mp
+import os
+import queue
+import signal
+import sys
+import time
+
+STATS_INTERVAL_SEC = 10.0
+MAX_RESTARTS = int(os.getenv("CONSUMER_WORKER_RESTARTS", "3"))
+
+
+def _worker_config(worker_id):
+    from kafka.consumer import KAFKA_CONFIG
+
+    return {
+        **KAFKA_CONFIG,
+        'client.id': f"spotify-consumer-{worker_id}",
+        # Only the partitions that actually move are revoked on rebalance
+        'partition.assignment.strategy': 'cooperative-sticky',
+    }
+
+
+def run_worker(worker_id, stats_queue, stop_event, batch_size, linger_sec):
+    """Process entry point: consume, batch and load until stop_event is set."""
+    # Imports happen in the child so each process builds its own clients
+    from confluent_kafka import Consumer
+    from ingestion import load_to_snowflake
+    from ingestion.payloads import ensure_track_columns
+    from kafka.consumer import TOPIC_TABLES, BatchingLoader, make_enricher, run
+    from kafka.metrics import METRICS_PORT, ConsumerMetrics, start_http_server
+
+    logging.basicConfig(level=logging.INFO, format=f"%(asctime)s | worker-{worker_id} | %(message)s")
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # the supervisor coordinates shutdown
+
+    consumer = Consumer(_worker_config(worker_id))
+    wh = load_to_snowflake._get_conn()
+    ensure_track_columns(wh)
+    metrics = ConsumerMetrics()
+    loader = BatchingLoader(consumer, wh, batch_size=batch_size, linger_sec=linger_sec, enricher=make_enricher(wh),
+                            metrics=metrics)
+    consumer.subscribe(list(TOPIC_TABLES), on_assign=loader.on_assign, on_revoke=loader.on_revoke)
+    start_http_server(metrics, METRICS_PORT + worker_id if METRICS_PORT else 0)
+
+    last_report = time.monotonic()
+
+    def report():
+        nonlocal last_report
+        metrics.tick(consumer)
+        now = time.monotonic()
+        if now - last_report >= STATS_INTERVAL_SEC:
+            stats_queue.put({
+                "worker": worker_id,
+                "records": loader.records_loaded,
+                "batches": loader.batches,
+                "replays": loader.replays.replays,
+                "ts": now,
+            })
+            last_report = now
+
+    try:
+        run(consumer, loader, should_stop=stop_event.is_set, on_tick=report)
+    finally:
+        loader.close()
+        consumer.close()
+        wh.close()
+        stats_queue.put({"worker": worker_id, "records": loader.records_loaded, "batches": loader.batches,
+                         "replays": loader.replays.replays, "ts": time.monotonic(), "done": True})
+
+
+def count_partitions(topics):
+    """Number of partitions across `topics`, from broker metadata."""
+    from confluent_kafka import Consumer
+    from kafka.consumer import KAFKA_CONFIG
+
+    probe = Consumer({**KAFKA_CONFIG, 'group.id': 'spotify-consumer-supervisor-probe'})
+    try:
+        metadata = probe.list_topics(timeout=10)
+        return sum(len(metadata.topics[t].partitions) for t in topics if t in metadata.topics)
+    finally:
+        probe.close()
+
+
+class ThroughputAggregator:
+    """Turns cumulative per-worker counters into per-worker and total rates."""
+
+    def __init__(self):
+        self.last = {}
+        self.rates = {}
+        self.totals = {}
+        self._restarted = {}  # records loaded by earlier incarnations of a worker
+
+    def update(self, stats):
+        worker = stats["worker"]
+        prev = self.last.get(worker)
+        if prev and stats["records"] < prev["records"]:
+            # A restarted worker counts from zero again
+            self._restarted[worker] = self._restarted.get(worker, 0) + prev["records"]
+            self.rates.pop(worker, None)
+        elif prev and stats["ts"] > prev["ts"]:
+            self.rates[worker] = (stats["records"] - prev["records"]) / (stats["ts"] - prev["ts"])
+        self.last[worker] = stats
+        self.totals[worker] = self._restarted.get(worker, 0) + stats["records"]
+
+    def summary(self):
+        per_worker = ", ".join(f"w{w}={r:,.0f}/s" for w, r in sorted(self.rates.items()))
+        return (f"total {sum(self.rates.values()):,.0f} records/sec, "
+                f"{sum(self.totals.values()):,} loaded [{per_worker}]")
+
+
+class WorkerPool:
+    """
+    Starts one process per worker id and restarts the ones that die.
+
+    A worker that exits while the pool is not stopping counts as crashed;
+    after `max_restarts` restarts it is marked failed instead.
+    """
+
+    def __init__(self, ctx, target, n_workers, args=(), max_restarts=MAX_RESTARTS):
+        self.ctx = ctx
+        self.target = target
+        self.n_workers = n_workers
+        self.args = args
+        self.max_restarts = max_restarts
+        self.processes = {}
+        self.restarts = {i: 0 for i in range(n_workers)}
+        self.failed = set()
+
+    def _spawn(self, worker_id):
+        process = self.ctx.Process(target=self.target, args=(worker_id, *self.args), name=f"consumer-worker-{worker_id}")
+        process.start()
+        self.processes[worker_id] = process
+
+    def start(self):
+        for worker_id in range(self.n_workers):
+            self._spawn(worker_id)
+
+    def check(self):
+        """Restart or fail workers that died; returns the ids restarted."""
+        restarted = []
+        for worker_id, process in list(self.processes.items()):
+            if process.is_alive() or worker_id in self.failed:
+                continue
+            if self.restarts[worker_id] >= self.max_restarts:
+                logging.error(f"Worker {worker_id} died (exit code {process.exitcode}) "
+                              f"after {self.restarts[worker_id]} restarts; giving up")
+                self.failed.add(worker_id)
+                continue
+            self.restarts[worker_id] += 1
+            logging.warning(f"Worker {worker_id} died (exit code {process.exitcode}); "
+                            f"restart {self.restarts[worker_id]}/{self.max_restarts}")
+            self._spawn(worker_id)
+            restarted.append(worker_id)
+        return restarted
+
+    def alive(self):
+        return any(p.is_alive() for p in self.processes.values())
+
+    def join(self, timeout=60):
+        for process in self.processes.values():
+            process.join(timeout=timeout)
+
+    @property
+    def exit_code(self):
+        """0 when every worker shut down cleanly, 1 otherwise."""
+        if self.failed or any(p.exitcode != 0 for p in self.processes.values()):
+            return 1
+        return 0
+
+
+def main(argv=None):
+    from kafka.consumer import BATCH_SIZE, LINGER_SEC, TOPIC_TABLES
+
+    parser = argparse.ArgumentParser(description="Run N consumer workers in spotify-consumer-group")
+    parser.add_argument("--workers", type=int, default=int(os.getenv("CONSUMER_WORKERS", os.cpu_count() or 1)))
+    parser.add_argument("--per-partition", action="store_true", help="one worker per topic partition")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--linger-ms", type=int, default=int(LINGER_SEC * 1000))
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s | supervisor | %(message)s")
+
+    n_workers = count_partitions(list(TOPIC_TABLES)) if args.per_partition else args.workers
+    n_workers = max(1, n_workers)
+    logging.info(f"Starting {n_workers} consumer workers")
+
+    ctx = mp.get_context("spawn")
+    stats_queue = ctx.Queue()
+    stop_event = ctx.Event()
+    pool = WorkerPool(ctx, run_worker, n_workers, args=(stats_queue, stop_event, args.batch_size,
+                                                        args.linger_ms / 1000.0))
+    pool.start()
+
+    aggregator = ThroughputAggregator()
+    next_summary = time.monotonic() + STATS_INTERVAL_SEC
+    try:
+        while pool.alive() or not stop_event.is_set():
+            try:
+                aggregator.update(stats_queue.get(timeout=1.0))
+            except queue.Empty:
+                pass
+            if not stop_event.is_set():
+                pool.check()
+                if pool.failed:
+                    logging.error(f"Workers {sorted(pool.failed)} failed; stopping the others")
+                    stop_event.set()
+            if time.monotonic() >= next_summary:
+                logging.info(aggregator.summary())
+                next_summary += STATS_INTERVAL_SEC
+    except KeyboardInterrupt:
+        logging.info("Stopping workers (flushing and committing)...")
+        stop_event.set()
+    finally:
+        stop_event.set()
+        pool.join(timeout=60)
+        while True:
+            try:
+                aggregator.update(stats_queue.get_nowait())
+            except queue.Empty:
+                break
+        logging.info(f"Supervisor done: {aggregator.summary()}")
+    return pool.exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,118 @@
+# kafka/tests/test_aggregator.py
+"""
+Tests for the windowed play-event aggregator and its checkpointing
+"""
+
+import json
+import os
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+from unittest import mock
+from .. import aggregator as agg_mod
+from ..aggregator import AggregatorRunner, Checkpoint, WindowSpec, WindowedAggregator, window_starts
+
+T0 = datetime(2024, 5, 1, 12, 0, 0)
+WINDOWS = (WindowSpec("1m", 60, 60), WindowSpec("3m_by_1m", 180, 60))
+
+
+def _play(seconds, track="t1", user="u1", skipped=False, listened=100):
+    return {"play_id": f"p{seconds}{track}{user}", "user_id": user, "track_id": track, "artist_id": "a1",
+            "play_ts": T0 + timedelta(seconds=seconds), "play_duration_seconds": listened, "skipped": skipped}
+
+
+class FakeMessage:
+    def __init__(self, offset, play):
+        self._o, self._play = offset, play
+
+    def error(self): return None
+    def topic(self): return agg_mod.PLAYS_TOPIC
+    def partition(self): return 0
+    def offset(self): return self._o
+    def value(self): return json.dumps({**self._play, "play_ts": self._play["play_ts"].isoformat()}).encode("utf-8")
+
+
+class FakeConsumer:
+    def __init__(self):
+        self.commits = []
+
+    def commit(self, offsets=None, asynchronous=True):
+        self.commits.append([(tp.partition, tp.offset) for tp in offsets])
+
+
+class TestWindowedAggregator(unittest.TestCase):
+
+    def test_window_starts(self):
+        self.assertEqual(list(window_starts(WindowSpec("t", 60, 60), 125)), [120])
+        self.assertEqual(list(window_starts(WindowSpec("s", 180, 60), 125)), [120, 60, 0])
+
+    def test_emits_closed_tumbling_window(self):
+        agg = WindowedAggregator(windows=WINDOWS[:1], allowed_lateness_sec=0)
+        agg.add(_play(5, user="u1", listened=100))
+        agg.add(_play(30, user="u2", skipped=True, listened=50))
+        self.assertEqual(agg.close_due(), [])
+
+        agg.add(_play(61))
+        rows = {r["dimension"]: r for r in agg.close_due()}
+        self.assertEqual(set(rows), {"track", "artist", "user"})
+        track = rows["track"]
+        self.assertEqual((track["plays"], track["skips"], track["listeners"]), (2, 1, 2))
+        self.assertEqual(track["avg_listen_seconds"], 75.0)
+
+    def test_late_event_is_dropped(self):
+        agg = WindowedAggregator(windows=WINDOWS[:1], allowed_lateness_sec=10)
+        agg.add(_play(200))
+        self.assertFalse(agg.add(_play(5)))
+        self.assertEqual(agg.late_events, 1)
+
+    def test_snapshot_round_trip(self):
+        agg = WindowedAggregator(windows=WINDOWS)
+        for s in (1, 70, 130):
+            agg.add(_play(s, user=f"u{s}"))
+        restored = WindowedAggregator(windows=WINDOWS)
+        restored.restore(json.loads(json.dumps(agg.snapshot())))
+        self.assertEqual(sorted(map(str, agg.close_due(force=True))), sorted(map(str, restored.close_due(force=True))))
+
+
+class TestAggregatorRunner(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.checkpoint = Checkpoint(os.path.join(self.tmp.name, "cp.json"))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _runner(self, consumer):
+        return AggregatorRunner(consumer, WindowedAggregator(windows=WINDOWS[:1], allowed_lateness_sec=0),
+                                wh=None, checkpoint=self.checkpoint)
+
+    def test_restart_skips_checkpointed_offsets(self):
+        consumer = FakeConsumer()
+        runner = self._runner(consumer)
+        runner.handle(FakeMessage(0, _play(5)))
+        runner.handle(FakeMessage(1, _play(10)))
+        runner.checkpoint()
+        self.assertEqual(consumer.commits, [[(0, 2)]])
+
+        restarted = self._runner(FakeConsumer())
+        restarted.handle(FakeMessage(1, _play(10)))   # replay
+        restarted.handle(FakeMessage(2, _play(70)))
+
+        with mock.patch.object(agg_mod, "load_df_to_snowflake", return_value=True) as load:
+            self.assertTrue(restarted.emit())
+        df = load.call_args[0][0]
+        self.assertEqual(df.loc[df["dimension"] == "track", "plays"].tolist(), [2])
+
+    def test_failed_emit_keeps_rows_pending(self):
+        runner = self._runner(FakeConsumer())
+        runner.handle(FakeMessage(0, _play(5)))
+        runner.handle(FakeMessage(1, _play(70)))
+        with mock.patch.object(agg_mod, "load_df_to_snowflake", return_value=False):
+            self.assertFalse(runner.emit())
+        runner.checkpoint()
+        self.assertEqual(len(self._runner(FakeConsumer()).pending), 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,69 @@
+# kafka/tests/test_codec.py
+"""
+Tests for the schema-ID msgpack codec and the local schema registry
+"""
+
+import json
+import os
+import tempfile
+import unittest
+from datetime import datetime
+from ..codec import PLAY_FIELDS, SchemaCodec
+from ..schema_registry import LocalSchemaRegistry
+
+TRACK = {
+    "id": "t1",
+    "name": "Song",
+    "artists": [{"id": "a1", "name": "Artist"}],
+    "popularity": 70,
+    "duration_ms": 201000,
+    "explicit": False,
+    "external_ids": {"isrc": "USABC1234567"},
+    "album": {"id": "al1", "release_date": "2020-01-01"},
+    "track_number": 3,
+    "available_markets": ["US", "GB", "DE"] * 60,
+}
+
+
+class TestSchemaCodec(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "registry.json")
+        self.codec = SchemaCodec(LocalSchemaRegistry(self.path))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_track_round_trip_drops_unknown_fields(self):
+        data = self.codec.encode("spotify.tracks.raw", TRACK)
+        self.assertLess(len(data), len(json.dumps(TRACK)) / 5)
+
+        decoded = SchemaCodec(LocalSchemaRegistry(self.path)).decode(data)
+        self.assertEqual(decoded["external_ids"], TRACK["external_ids"])
+        self.assertEqual(decoded["track_number"], 3)
+        self.assertIsNone(decoded["language"])
+        self.assertNotIn("available_markets", decoded)
+
+    def test_play_timestamp_round_trip(self):
+        play = {"play_id": "p1", "user_id": "xp", "track_id": "t1", "play_ts": datetime(2024, 5, 1, 12, 30, 5)}
+        decoded = self.codec.decode(self.codec.encode("spotify.plays.raw", play))
+        self.assertEqual(decoded["play_ts"], datetime(2024, 5, 1, 12, 30, 5))
+        self.assertIsNone(decoded["skipped"])
+
+    def test_json_fallback(self):
+        self.assertEqual(self.codec.decode(json.dumps(TRACK).encode("utf-8"))["id"], "t1")
+
+    def test_registry_ids_are_stable(self):
+        registry = LocalSchemaRegistry(self.path)
+        first = registry.register("spotify.plays.raw-value", PLAY_FIELDS)
+        self.assertEqual(registry.register("spotify.plays.raw-value", PLAY_FIELDS), first)
+        second = registry.register("spotify.plays.raw-value", PLAY_FIELDS + [("ms_played", "int")])
+        self.assertNotEqual(second, first)
+        self.assertEqual(LocalSchemaRegistry(self.path).latest("spotify.plays.raw-value")[0], second)
+        with self.assertRaises(ValueError):
+            registry.register("x-value", [("a", "decimal")])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,87 @@
+# kafka/tests/test_commit_protocol.py
+"""
+Tests for the consumer's at-least-once commit protocol
+"""
+
+import json
+import unittest
+from unittest import mock
+from .. import consumer as consumer_mod
+from ..offsets import ReplayFilter
+
+
+class FakeMessage:
+    def __init__(self, topic, partition, offset, key, value):
+        self._t, self._p, self._o, self._k, self._v = topic, partition, offset, key, value
+
+    def error(self): return None
+    def topic(self): return self._t
+    def partition(self): return self._p
+    def offset(self): return self._o
+    def key(self): return self._k
+    def value(self): return json.dumps(self._v).encode("utf-8")
+
+
+class FakeConsumer:
+    def __init__(self):
+        self.commits, self.seeks = [], []
+
+    def commit(self, offsets=None, asynchronous=True):
+        self.commits.append([(tp.topic, tp.partition, tp.offset) for tp in offsets])
+
+    def seek(self, tp):
+        self.seeks.append((tp.topic, tp.partition, tp.offset))
+
+
+def _msg(partition, offset, key):
+    return FakeMessage(consumer_mod.TOPIC_NAME, partition, offset, key, {"id": key.decode()})
+
+
+class TestBatchingLoader(unittest.TestCase):
+    """Offsets are committed only after a successful warehouse write"""
+
+    def setUp(self):
+        self.consumer = FakeConsumer()
+        self.loader = consumer_mod.BatchingLoader(self.consumer, wh=None, batch_size=10, linger_sec=60)
+
+    def _feed(self, msgs):
+        for m in msgs:
+            self.loader.handle(m)
+
+    def test_commit_after_successful_flush(self):
+        self._feed([_msg(0, 5, b"a"), _msg(0, 6, b"b"), _msg(1, 3, b"c")])
+        with mock.patch.object(consumer_mod, "load_batch", return_value=True) as load:
+            self.assertTrue(self.loader.flush())
+        self.assertEqual(len(load.call_args[0][1]), 3)
+        self.assertEqual(sorted(self.consumer.commits[0]),
+                         [(consumer_mod.TOPIC_NAME, 0, 7), (consumer_mod.TOPIC_NAME, 1, 4)])
+        self.assertEqual(self.consumer.seeks, [])
+
+    def test_failed_flush_rewinds_without_commit(self):
+        self._feed([_msg(0, 5, b"a"), _msg(0, 6, b"b")])
+        with mock.patch.object(consumer_mod, "load_batch", return_value=False), \
+                mock.patch.object(consumer_mod.time, "sleep"):
+            self.assertFalse(self.loader.flush())
+        self.assertEqual(self.consumer.commits, [])
+        self.assertEqual(self.consumer.seeks, [(consumer_mod.TOPIC_NAME, 0, 5)])
+
+    def test_replays_are_dropped(self):
+        self._feed([_msg(0, 5, b"a")])
+        with mock.patch.object(consumer_mod, "load_batch", return_value=True):
+            self.loader.flush()
+        # Same key/offset re-delivered → skipped; newer offset for the key → kept
+        self._feed([_msg(0, 5, b"a"), _msg(0, 9, b"a")])
+        self.assertEqual(len(self.loader.batcher), 1)
+        self.assertEqual(self.loader.replays.replays, 1)
+
+
+class TestReplayFilter(unittest.TestCase):
+    def test_bounded(self):
+        rf = ReplayFilter(max_keys=2)
+        rf.mark_loaded([("t", 0, b"a", 1), ("t", 0, b"b", 2), ("t", 0, b"c", 3)])
+        self.assertFalse(rf.is_replay("t", 0, b"a", 1))  # evicted
+        self.assertTrue(rf.is_replay("t", 0, b"c", 3))
+
+
+if __name__ == "__main__":
+    unittest.main()
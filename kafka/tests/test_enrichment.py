@@ -0,0 +1,89 @@
+# kafka/tests/test_enrichment.py
+"""
+Tests for in-stream enrichment of play events
+"""
+
+import unittest
+import pandas as pd
+from ingestion.warehouse import DuckDBWarehouse
+from ..enrichment import ENRICHED_COLUMNS, DimensionCache, PlayEnricher
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestDimensionCache(unittest.TestCase):
+
+    def setUp(self):
+        self.wh = DuckDBWarehouse(path=":memory:", database="DBT_SPOTIFY", schema="RAW")
+        self.wh.connect()
+        self._write("RAW_TOP_TRACKS", {"ID": ["t1"], "NAME": ["Song"], "ARTIST_ID": ["a1"], "POPULARITY": [50],
+                                       "DURATION_MS": [200400]}, "2024-01-01")
+        self._write("RAW_TOP_ARTISTS", {"ID": ["a1"], "NAME": ["Artist"], "POPULARITY": [80],
+                                        "GENRES": ['["pop"]']}, "2024-01-01")
+        self._write("RAW_TRACK_ALIASES", {"ALIAS_ID": ["t1-single"], "CANONICAL_ID": ["t1"]}, "2024-01-01")
+        self.clock = FakeClock()
+        self.cache = DimensionCache(self.wh, refresh_sec=60, clock=self.clock)
+        self.cache.refresh()
+
+    def tearDown(self):
+        self.wh.close()
+
+    def _write(self, table, columns, ingested_at):
+        df = pd.DataFrame({**columns, "INGESTED_AT": pd.Timestamp(ingested_at)})
+        self.wh.ensure_table(table, df)
+        self.wh.write(df, table)
+
+    def test_enriches_through_alias(self):
+        event = PlayEnricher(self.cache).enrich({"play_id": "p1", "track_id": "t1-single", "artist_id": None})
+        self.assertEqual(event["track_name"], "Song")
+        self.assertEqual(event["artist_id"], "a1")
+        self.assertEqual(event["artist_name"], "Artist")
+        self.assertEqual(event["duration_seconds"], 200.4)
+        self.assertTrue(set(c.lower() for c in ENRICHED_COLUMNS) <= set(event))
+
+    def test_incremental_refresh(self):
+        self._write("RAW_TOP_TRACKS", {"ID": ["t2"], "NAME": ["New"], "ARTIST_ID": ["a1"], "POPULARITY": [1],
+                                       "DURATION_MS": [1000]}, "2024-01-02")
+        self.assertEqual(self.cache.refresh(), 0)   # not due yet
+        self.clock.now = 61
+        self.assertEqual(self.cache.refresh(), 1)   # only the newer row
+        self.assertEqual(self.cache.track("t2")["name"], "New")
+
+    def test_refresh_swaps_in_new_dicts(self):
+        """A refresh never mutates the dictionaries readers on other threads may hold"""
+        self._write("RAW_TOP_TRACKS", {"ID": ["t2"], "NAME": ["New"], "ARTIST_ID": ["a1"], "POPULARITY": [1],
+                                       "DURATION_MS": [1000]}, "2024-01-02")
+        before = self.cache.tracks
+        self.assertEqual(self.cache.refresh(force=True), 1)
+        self.assertIsNot(self.cache.tracks, before)
+        self.assertNotIn("t2", before)
+        self.assertEqual(set(self.cache.tracks), {"t1", "t2"})
+
+    def test_unknown_track_counts_miss(self):
+        enricher = PlayEnricher(self.cache)
+        event = enricher.enrich({"play_id": "p2", "track_id": "nope", "artist_id": "a1"})
+        self.assertIsNone(event["track_name"])
+        self.assertEqual(event["artist_name"], "Artist")
+        self.assertEqual((enricher.hits, enricher.misses), (0, 1))
+
+    def test_ensure_columns_adds_missing(self):
+        self._write("RAW_LISTENING_HISTORY", {"PLAY_ID": ["p1"]}, "2024-01-01")
+        PlayEnricher(self.cache).ensure_columns(self.wh)
+        columns = dict(self.wh.describe_table("RAW_LISTENING_HISTORY"))
+        self.assertIn("ARTIST_GENRES", columns)
+        self.assertEqual(columns["DURATION_SECONDS"], "FLOAT")
+
+    def test_ensure_columns_warns_on_integer_duration(self):
+        self._write("RAW_LISTENING_HISTORY", {"PLAY_ID": ["p1"], "DURATION_SECONDS": [200]}, "2024-01-01")
+        with self.assertLogs(level="WARNING"):
+            PlayEnricher(self.cache).ensure_columns(self.wh)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,110 @@
+# kafka/tests/test_lake_sink.py
+"""
+Tests for the Kafka → Parquet lake sink
+"""
+
+import glob
+import os
+import tempfile
+import unittest
+import pandas as pd
+import pyarrow.parquet as pq
+from .. import consumer as consumer_mod
+from ..lake_sink import LakeSink
+from .test_commit_protocol import FakeConsumer, _msg
+
+TOPIC = consumer_mod.TOPIC_NAME
+T0 = 1714564800.0  # 2024-05-01 12:00:00 UTC
+
+
+class FakeClock:
+    def __init__(self, now=T0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def _frame(ids):
+    return pd.DataFrame({"id": ids, "name": [f"Song {i}" for i in ids], "json_data": [None] * len(ids)})
+
+
+class TestLakeSink(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.clock = FakeClock()
+        self.sink = LakeSink([TOPIC], self.tmp.name, roll_bytes=10 ** 9, roll_sec=60, clock=self.clock)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _parquet_files(self):
+        return glob.glob(os.path.join(self.tmp.name, "**", "*.parquet"), recursive=True)
+
+    def test_time_roll_finalizes_and_records_manifest(self):
+        self.sink.write(TOPIC, _frame(["a", "b"]), [(TOPIC, 0, 0, 1)])
+        self.sink.write(TOPIC, _frame(["c"]), [(TOPIC, 0, 2, 2), (TOPIC, 1, 7, 7)])
+        self.assertEqual(self._parquet_files(), [])
+        self.assertEqual(self.sink.take_committable(), [])
+
+        self.clock.now += 61
+        self.assertTrue(self.sink.roll_due())
+        files = self._parquet_files()
+        self.assertEqual(len(files), 1)
+        self.assertIn(os.path.join(TOPIC, "date=2024-05-01", "hour=12"), files[0])
+
+        table = pq.read_table(files[0])
+        self.assertEqual(table.num_rows, 3)
+        self.assertIn("INGESTED_AT", table.column_names)
+        entry = self.sink.manifest()[0]
+        self.assertEqual(entry["rows"], 3)
+        self.assertEqual(sorted((tp.partition, tp.offset) for tp in self.sink.take_committable()), [(0, 3), (1, 8)])
+
+    def test_open_file_caps_committable_offset(self):
+        self.sink.write(TOPIC, _frame(["a"]), [(TOPIC, 0, 0, 0)])
+        self.clock.now += 3600  # next hour: the old file rolls, a new one opens
+        self.sink.roll_due()
+        self.sink.write(TOPIC, _frame(["b"]), [(TOPIC, 0, 1, 1)])
+        self.assertEqual([(tp.partition, tp.offset) for tp in self.sink.take_committable()], [(0, 1)])
+
+    def test_recovery_drops_unfinished_files(self):
+        self.sink.write(TOPIC, _frame(["a"]), [(TOPIC, 0, 0, 0)])
+        self.sink.finalize_all()
+        self.sink.write(TOPIC, _frame(["b"]), [(TOPIC, 0, 1, 1)])
+        orphan = os.path.join(self.tmp.name, TOPIC, "part-1714564800000-1-0009.parquet")
+        open(orphan, "wb").close()
+
+        LakeSink([TOPIC], self.tmp.name, clock=self.clock)
+        self.assertEqual(len(self._parquet_files()), 1)
+        self.assertEqual(glob.glob(os.path.join(self.tmp.name, "**", "*.inprogress"), recursive=True), [])
+
+    def test_recovery_leaves_other_files_alone(self):
+        foreign = [
+            os.path.join(self.tmp.name, "other_topic", "part-1714564800000-1-0001.parquet.inprogress"),
+            os.path.join(self.tmp.name, "other_topic", "part-1714564800000-1-0002.parquet"),
+            os.path.join(self.tmp.name, TOPIC, "exports", "backfill.parquet"),
+            os.path.join(self.tmp.name, "user_upload.parquet"),
+        ]
+        for path in foreign:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            open(path, "wb").close()
+
+        LakeSink([TOPIC], self.tmp.name, clock=self.clock)
+        self.assertTrue(all(os.path.exists(path) for path in foreign))
+
+    def test_loader_commits_only_finalized_offsets(self):
+        consumer = FakeConsumer()
+        loader = consumer_mod.BatchingLoader(consumer, wh=None, batch_size=10, linger_sec=60, sink=self.sink)
+        for offset, key in enumerate([b"a", b"b"]):
+            loader.handle(_msg(0, offset, key))
+        self.assertTrue(loader.flush())
+        self.assertEqual(consumer.commits, [])
+
+        loader.close()
+        self.assertEqual(consumer.commits, [[(TOPIC, 0, 2)]])
+        self.assertEqual(pq.read_table(self._parquet_files()[0]).column("ID").to_pylist(), ["a", "b"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,84 @@
+# kafka/tests/test_metrics.py
+"""
+Tests for the consumer metrics and the /metrics endpoint
+"""
+
+import socket
+import unittest
+import urllib.request
+from unittest import mock
+from confluent_kafka import TopicPartition
+from .. import consumer as consumer_mod
+from ..metrics import ConsumerMetrics, Histogram, start_http_server
+from .test_commit_protocol import FakeConsumer, _msg
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+class LaggingConsumer:
+    def assignment(self):
+        return [TopicPartition("t", 0), TopicPartition("t", 1)]
+
+    def position(self, partitions):
+        return [TopicPartition("t", 0, 40), TopicPartition("t", 1, -1001)]  # partition 1: no position yet
+
+    def get_watermark_offsets(self, tp, cached=False):
+        return (0, 100)
+
+
+class TestConsumerMetrics(unittest.TestCase):
+
+    def test_histogram_is_cumulative(self):
+        h = Histogram((1, 10))
+        for v in (0.5, 5, 50):
+            h.observe(v)
+        self.assertEqual(list(h.lines("x"))[:3], ['x_bucket{le="1"} 1', 'x_bucket{le="10"} 2', 'x_bucket{le="+Inf"} 3'])
+
+    def test_rate_lag_and_render(self):
+        clock = FakeClock()
+        metrics = ConsumerMetrics(clock=clock)
+        metrics.tick(LaggingConsumer())
+        metrics.observe_flush({"t": 500}, 0.2)
+        clock.now += 10
+        metrics.tick(LaggingConsumer())
+
+        text = metrics.render()
+        self.assertIn('spotify_consumer_lag{group="spotify-consumer-group",topic="t",partition="0"} 60', text)
+        self.assertNotIn('partition="1"', text)
+        self.assertIn("spotify_consumer_records_per_second{group=\"spotify-consumer-group\"} 50.000", text)
+        self.assertIn("lag 60", metrics.summary())
+
+    def test_loader_reports_flushes_and_commits(self):
+        metrics = ConsumerMetrics()
+        loader = consumer_mod.BatchingLoader(FakeConsumer(), wh=None, batch_size=10, linger_sec=60, metrics=metrics)
+        loader.handle(_msg(0, 1, b"a"))
+        with mock.patch.object(consumer_mod, "load_batch", return_value=True):
+            loader.flush()
+        self.assertEqual(metrics.records, {consumer_mod.TOPIC_NAME: 1})
+        self.assertEqual((metrics.flush_seconds.count, metrics.commit_seconds.count), (1, 1))
+
+    def test_http_endpoint(self):
+        metrics = ConsumerMetrics()
+        self.assertIsNone(start_http_server(metrics, port=0))
+        server = start_http_server(metrics, port=_free_port())
+        try:
+            body = urllib.request.urlopen(f"http://127.0.0.1:{server.server_port}/metrics").read().decode()
+        finally:
+            server.shutdown()
+        self.assertIn("# TYPE spotify_consumer_batch_size histogram", body)
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+if __name__ == "__main__":
+    unittest.main()
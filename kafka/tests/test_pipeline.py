@@ -0,0 +1,139 @@
+# kafka/tests/test_pipeline.py
+"""
+Tests for the pipelined consumer: ordering, backpressure and rewind
+"""
+
+import threading
+import time
+import unittest
+from unittest import mock
+from .. import pipeline as pipeline_mod
+from ..pipeline import PipelinedConsumer
+from .test_commit_protocol import FakeConsumer, _msg
+
+TOPIC = pipeline_mod.TOPIC_NAME
+
+
+class QueueConsumer(FakeConsumer):
+    """FakeConsumer that hands out queued messages and records pause/resume."""
+
+    def __init__(self, messages):
+        super().__init__()
+        self.messages = list(messages)
+        self.paused = False
+        self.pause_calls = 0
+
+    def consume(self, num_messages=1, timeout=-1):
+        if self.paused or not self.messages:
+            time.sleep(min(timeout, 0.01))
+            return []
+        out, self.messages = self.messages[:num_messages], self.messages[num_messages:]
+        return out
+
+    def assignment(self):
+        return []
+
+    def pause(self, partitions):
+        self.paused = True
+        self.pause_calls += 1
+
+    def resume(self, partitions):
+        self.paused = False
+
+
+class ThreadRecordingCache:
+    """DimensionCache stand-in that records which threads refresh it."""
+
+    def __init__(self):
+        self.threads = set()
+
+    def refresh(self):
+        self.threads.add(threading.current_thread().name)
+
+    def update_tracks(self, tracks):
+        pass
+
+
+class PassThroughEnricher:
+    def __init__(self):
+        self.cache = ThreadRecordingCache()
+
+    def enrich(self, record):
+        return record
+
+
+def _msgs(n, partition=0):
+    return [_msg(partition, i, f"k{i}".encode()) for i in range(n)]
+
+
+class TestPipelinedConsumer(unittest.TestCase):
+
+    def _pipeline(self, consumer, load_fn, **kwargs):
+        kwargs.setdefault("batch_size", 10)
+        kwargs.setdefault("linger_sec", 0.01)
+        p = PipelinedConsumer(consumer, load_fn=load_fn, decode_workers=2, **kwargs)
+        self.addCleanup(p._pool.shutdown)
+        return p
+
+    def test_loads_and_commits_in_order(self):
+        loaded = []
+        consumer = QueueConsumer(_msgs(25))
+        p = self._pipeline(consumer, lambda topic, records: loaded.extend(r["id"] for r in records) or True)
+        for _ in range(20):
+            p.step()
+        p.close()
+
+        self.assertEqual(loaded, [f"k{i}" for i in range(25)])
+        committed = [c[0][2] for c in consumer.commits]
+        self.assertEqual(committed, sorted(committed))
+        self.assertEqual(committed[-1], 25)
+
+    def test_pauses_while_loader_is_blocked(self):
+        release = threading.Event()
+        consumer = QueueConsumer(_msgs(200))
+        p = self._pipeline(consumer, lambda topic, records: release.wait(5), max_inflight_batches=1, max_buffered=40)
+        for _ in range(30):
+            p.step()
+        self.assertTrue(p.paused)
+        self.assertLessEqual(p.buffered(), 40)
+
+        release.set()
+        for _ in range(200):
+            p.step()
+            if not consumer.messages and not p.buffered():
+                break
+        p.close()
+        self.assertFalse(p.paused)
+        self.assertEqual(consumer.commits[-1][0][2], 200)
+
+    def test_failed_batch_rewinds_everything_behind_it(self):
+        calls = []
+
+        def load(topic, records):
+            calls.append(records[0]["id"])
+            return len(calls) > 1   # first batch fails
+
+        consumer = QueueConsumer(_msgs(10))
+        p = self._pipeline(consumer, load)
+        with mock.patch.object(pipeline_mod.time, "sleep"):
+            for _ in range(10):
+                p.step()
+            p.close()
+        self.assertIn((TOPIC, 0, 0), consumer.seeks)
+        self.assertEqual(consumer.commits, [])
+        self.assertEqual(p.failures, 1)
+
+    def test_dimension_refresh_runs_on_loader_thread(self):
+        """The cache shares the loader's warehouse connection, so only the loader thread refreshes it"""
+        enricher = PassThroughEnricher()
+        consumer = QueueConsumer(_msgs(25))
+        p = self._pipeline(consumer, lambda topic, records: True, enricher=enricher)
+        for _ in range(20):
+            p.step()
+        p.close()
+        self.assertEqual(enricher.cache.threads, {"loader"})
+        self.assertEqual(consumer.commits[-1][0][2], 25)
+
+
+if __name__ == "__main__":
+    unittest.main()
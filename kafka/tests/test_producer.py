@@ -0,0 +1,52 @@
+# kafka/tests/test_producer.py
+"""
+Tests for the producer's throughput profile and delivery stats
+"""
+
+import os
+import unittest
+from unittest import mock
+from ..producer import DeliveryStats, build_producer_conf
+
+
+class FakeDelivered:
+    def __init__(self, size, latency):
+        self._size, self._latency = size, latency
+
+    def value(self): return b"x" * self._size
+    def latency(self): return self._latency
+
+
+class TestProducerConf(unittest.TestCase):
+
+    def test_throughput_profile_with_env_override(self):
+        with mock.patch.dict(os.environ, {"PRODUCER_LINGER_MS": "5", "PRODUCER_IDEMPOTENCE": "false"}):
+            conf = build_producer_conf("throughput")
+        self.assertEqual(conf["linger.ms"], 5)
+        self.assertFalse(conf["enable.idempotence"])
+        self.assertEqual(conf["compression.type"], "lz4")
+
+    def test_unknown_profile(self):
+        with self.assertRaises(ValueError):
+            build_producer_conf("nope")
+
+
+class TestDeliveryStats(unittest.TestCase):
+
+    def test_counts_and_percentiles(self):
+        stats = DeliveryStats()
+        for _ in range(98):
+            stats(None, FakeDelivered(100, 0.003))
+        stats(None, FakeDelivered(100, 0.8))
+        stats("timed out", None)
+
+        summary = stats.summary()
+        self.assertEqual(summary["delivered"], 99)
+        self.assertEqual(summary["errors"], 1)
+        self.assertEqual(stats.bytes, 9900)
+        self.assertEqual(summary["p50_ms"], 5)
+        self.assertEqual(summary["p99_ms"], 1000)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,108 @@
+# kafka/tests/test_supervisor.py
+"""
+Tests for the consumer supervisor (throughput aggregation, worker restarts)
+"""
+
+import unittest
+from ..supervisor import ThroughputAggregator, WorkerPool
+
+
+class FakeProcess:
+    def __init__(self, target, args, name):
+        self.args = args
+        self.name = name
+        self.started = False
+        self.exitcode = None
+
+    def start(self):
+        self.started = True
+
+    def is_alive(self):
+        return self.started and self.exitcode is None
+
+    def join(self, timeout=None):
+        if self.exitcode is None:
+            self.exitcode = 0
+
+    def die(self, exitcode=1):
+        self.exitcode = exitcode
+
+
+class FakeContext:
+    def __init__(self):
+        self.spawned = []
+
+    def Process(self, target, args, name):
+        process = FakeProcess(target, args, name)
+        self.spawned.append(process)
+        return process
+
+
+class TestThroughputAggregator(unittest.TestCase):
+
+    def test_rates_and_totals(self):
+        agg = ThroughputAggregator()
+        agg.update({"worker": 0, "records": 100, "ts": 10.0})
+        agg.update({"worker": 0, "records": 600, "ts": 20.0})
+        agg.update({"worker": 1, "records": 50, "ts": 10.0})
+        agg.update({"worker": 1, "records": 250, "ts": 20.0})
+
+        self.assertEqual(agg.rates, {0: 50.0, 1: 20.0})
+        self.assertEqual(agg.totals, {0: 600, 1: 250})
+        self.assertEqual(agg.summary(), "total 70 records/sec, 850 loaded [w0=50/s, w1=20/s]")
+
+    def test_same_timestamp_keeps_rate(self):
+        agg = ThroughputAggregator()
+        agg.update({"worker": 0, "records": 100, "ts": 10.0})
+        agg.update({"worker": 0, "records": 200, "ts": 20.0})
+        agg.update({"worker": 0, "records": 200, "ts": 20.0, "done": True})
+        self.assertEqual(agg.rates, {0: 10.0})
+
+    def test_restarted_worker_keeps_its_total(self):
+        agg = ThroughputAggregator()
+        agg.update({"worker": 0, "records": 100, "ts": 10.0})
+        agg.update({"worker": 0, "records": 300, "ts": 20.0})
+        # The restarted process counts from zero; no negative rate, loaded records carry over
+        agg.update({"worker": 0, "records": 10, "ts": 25.0})
+        self.assertNotIn(0, agg.rates)
+        agg.update({"worker": 0, "records": 60, "ts": 30.0})
+        self.assertEqual(agg.rates, {0: 10.0})
+        self.assertEqual(agg.totals, {0: 360})
+
+
+class TestWorkerPool(unittest.TestCase):
+
+    def setUp(self):
+        self.ctx = FakeContext()
+        self.pool = WorkerPool(self.ctx, target=None, n_workers=2, args=("queue", "stop"), max_restarts=1)
+        self.pool.start()
+
+    def test_start_passes_worker_ids(self):
+        self.assertEqual([p.args for p in self.ctx.spawned], [(0, "queue", "stop"), (1, "queue", "stop")])
+        self.assertTrue(self.pool.alive())
+
+    def test_dead_worker_is_restarted(self):
+        self.ctx.spawned[1].die()
+        self.assertEqual(self.pool.check(), [1])
+        self.assertEqual(len(self.ctx.spawned), 3)
+        self.assertEqual(self.ctx.spawned[2].args[0], 1)
+        self.assertEqual(self.pool.check(), [])
+        self.assertFalse(self.pool.failed)
+
+    def test_worker_fails_after_max_restarts(self):
+        self.ctx.spawned[0].die()
+        self.pool.check()
+        self.ctx.spawned[2].die()
+        self.assertEqual(self.pool.check(), [])
+        self.assertEqual(self.pool.failed, {0})
+        self.pool.join()
+        self.assertEqual(self.pool.exit_code, 1)
+
+    def test_clean_shutdown_exits_zero(self):
+        self.pool.join()
+        self.assertFalse(self.pool.alive())
+        self.assertEqual(self.pool.exit_code, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()